@@ -30,7 +30,7 @@ experiment = ExperimentBuilder.build(data_dir, "experiment.yml", exp_name, resul
 results = experiment.load()
 
 #%% print demographics
-data = pd.read_excel(result_dir / f'prepared_data_{exp_name}.xlsx')
+data = results.data
 
 print(f"Subjects: {len(data['pet_id'].unique())}")
 print(f"Age min/max: {data['chron_age'].min()} / {data['chron_age'].max()}")
@@ -12,7 +12,9 @@ import warnings
 RESULTDIR = Path(__file__).parent.parent / "results"
 DATADIR= Path(__file__).parent.parent / "data" 
 
-def run(data_dir: Path, result_dir: Path, exp_name: str, n_jobs: int = 1):
+def run(data_dir: Path, result_dir: Path, exp_name: str, n_jobs: int = 1, fold_jobs: int = 1, resume: bool = False,
+        cache_dir: Path = None, use_cache: bool = True, n_cores: int = None, threads_per_job: int = None,
+        batched: bool = False):
     if not sys.warnoptions:
         warnings.simplefilter("ignore")
         os.environ["PYTHONWARNINGS"] = "ignore"
@@ -22,22 +24,40 @@ def run(data_dir: Path, result_dir: Path, exp_name: str, n_jobs: int = 1):
         experiment = ExperimentBuilder.build(data_dir, "experiment.yml", exp_name, result_dir)
             
         # run experiment 
-        results = experiment.run(n_jobs)
+        results = experiment.run(n_jobs, fold_jobs=fold_jobs, resume=resume, cache_dir=cache_dir, use_cache=use_cache,
+                                 n_cores=n_cores, threads_per_job=threads_per_job, batched=batched)
 
 if __name__ == '__main__':
     # Parse arguments
     # nice python run_experiment.py --exp_name experiment-I --n_jobs 40
+    # nice python run_experiment.py --exp_name experiment-I --fold_jobs 40
     parser = argparse.ArgumentParser(description='Run experiment')
     parser.add_argument('--exp_name', type=str, default='experiment-I', help='Name of experiment')
     parser.add_argument('--data_dir', type=str, default=DATADIR, help='Path to data directory')
     parser.add_argument('--result_dir', type=str, default=RESULTDIR, help='Path to result directory')
     parser.add_argument('--n_jobs', type=int, default=1, help='Number of jobs to run in parallel')
+    parser.add_argument('--fold_jobs', type=int, default=1, help='Number of processes to spread the outer folds over')
+    parser.add_argument('--resume', action='store_true', help='Only compute folds missing from the checkpoints of a previous run')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Result cache shared by experiments (default: <result_dir>/cache/results)')
+    parser.add_argument('--no_cache', action='store_true', help='Recompute all workflows and do not store results in the cache')
+    parser.add_argument('--n_cores', type=int, default=None, help='Total core budget (default: all available cores)')
+    parser.add_argument('--threads_per_job', '--threads-per-job', type=int, default=None,
+                        help='Native (BLAS) threads per worker (default: n_cores split over n_jobs x fold_jobs workers)')
+    parser.add_argument('--batched', action='store_true', help='Fit all outer folds of single candidate linear models in one batch')
 
     args = parser.parse_args()
     exp_name = args.exp_name
     data_dir = Path(args.data_dir)
     result_dir = Path(args.result_dir)
     n_jobs = args.n_jobs
+    fold_jobs = args.fold_jobs
+    resume = args.resume
+    cache_dir = Path(args.cache_dir) if args.cache_dir is not None else None
+    use_cache = not args.no_cache
+    n_cores = args.n_cores
+    threads_per_job = args.threads_per_job
+    batched = args.batched
 
-    run(data_dir, result_dir, exp_name, n_jobs=n_jobs) 
+    run(data_dir, result_dir, exp_name, n_jobs=n_jobs, fold_jobs=fold_jobs, resume=resume, cache_dir=cache_dir, use_cache=use_cache,
+        n_cores=n_cores, threads_per_job=threads_per_job, batched=batched) 
 # %%
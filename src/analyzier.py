@@ -1,9 +1,64 @@
 from src.workflow import WorkflowResults
-from src.statistics import CorrelatedTTest
+from src.statistics import pairwise_correlated_ttest
 from src.experiment import ExperimentResults
 
+import numpy as np
 import pandas as pd
-from sklearn.metrics import mean_absolute_error, r2_score
+
+SCORE_NAMES = ['mae', 'r2', 'corr', 'corr_pad']
+
+
+def compute_fold_metrics(fold: np.ndarray, true: np.ndarray, pred: np.ndarray) -> dict:
+    """ Compute MAE, R2, Pearson r and PAD correlation of all workflows and folds at once with
+    grouped reductions over the prediction matrix.
+    Args:
+        fold (np.ndarray): fold of each prediction (n)
+        true (np.ndarray): true values (n)
+        pred (np.ndarray): predictions of each workflow (n x n_workflows)
+    Returns:
+        metrics (dict): folds (in order of appearance), count per fold and an array
+            (n_folds x n_workflows) per score name
+    """
+    folds, first, codes, count = np.unique(fold, return_index=True, return_inverse=True, return_counts=True)
+    # keep folds in order of appearance
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    codes, folds, count = rank[codes], folds[order], count[order]
+
+    true = np.asarray(true, dtype=float)
+    pred = np.asarray(pred, dtype=float)
+
+    # rows sorted by fold, so every fold is a contiguous segment
+    sort = np.argsort(codes, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(count)[:-1]])
+
+    def group_sum(values):
+        # sums per fold of each column (n_folds x n_columns)
+        return np.add.reduceat(values[sort], starts, axis=0)
+
+    true_c = true - (group_sum(true) / count)[codes]
+    pred_c = pred - (group_sum(pred) / count[:, None])[codes]
+    pad_c = pred_c - true_c[:, None]
+
+    ss_true = group_sum(true_c ** 2)[:, None]
+    ss_res = group_sum((pred - true[:, None]) ** 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = 1 - ss_res / ss_true
+        # as sklearn's r2_score for constant true values
+        r2 = np.where(ss_true == 0, np.where(ss_res == 0, 1.0, 0.0), r2)
+        corr = group_sum(pred_c * true_c[:, None]) / np.sqrt(group_sum(pred_c ** 2) * ss_true)
+        corr_pad = group_sum(pad_c * true_c[:, None]) / np.sqrt(group_sum(pad_c ** 2) * ss_true)
+
+    return {
+        'folds': folds,
+        'count': count,
+        'mae': group_sum(np.abs(pred - true[:, None])) / count[:, None],
+        'r2': r2,
+        'corr': corr,
+        'corr_pad': corr_pad,
+    }
+
 
 class Analyzer():
     """ """
@@ -33,36 +88,26 @@ class StatsAnalyzer(Analyzer):
             self.predictions[f'pad_{pipe}'] = self.predictions[pipe] - self.predictions.true
 
     def _compute_scores(self):
-        # init dataframe for scores per fold
-        folds = self.predictions.fold.unique()
-        scores = pd.DataFrame(index=folds)
-
-        # compute scores for each fold
-        for fold in folds:
-            # select data for fold
-            df_fold = self.predictions[self.predictions.fold == fold]
-            # compute scores (mean absolute error, r2, corr and corr_pad)
-            for pipe in self.workflow_names:
-                # compute MAE
-                scores.loc[fold, f'{pipe}_mae'] = mean_absolute_error(df_fold.true, df_fold[pipe])
-                # compute R2
-                scores.loc[fold, f'{pipe}_r2'] = r2_score(df_fold.true, df_fold[pipe])
-                # compute correlation with true
-                scores.loc[fold, f'{pipe}_corr'] = df_fold[pipe].corr(df_fold.true)
-                # compute correlation with pad and true
-                scores.loc[fold, f'{pipe}_corr_pad'] = df_fold[f'pad_{pipe}'].corr(df_fold.true)
-            # cound elements
-            scores.loc[fold, f'count'] = len(df_fold)
-
-        self.scores = scores
+        # compute scores (mean absolute error, r2, corr and corr_pad) for all folds and workflows at once
+        metrics = compute_fold_metrics(self.predictions.fold.to_numpy(),
+                                       self.predictions.true.to_numpy(),
+                                       self.predictions[self.workflow_names].to_numpy())
+
+        # one column per workflow and score (grouped by workflow) and the number of elements per fold
+        columns = {}
+        for i, pipe in enumerate(self.workflow_names):
+            for score in SCORE_NAMES:
+                columns[f'{pipe}_{score}'] = metrics[score][:, i]
+        columns['count'] = metrics['count'].astype(float)
+
+        self.scores = pd.DataFrame(columns, index=metrics['folds'])
 
     def _average_scores(self):
         # average scores over folds
                 # average scores over folds
         result_table = pd.DataFrame(index=self.workflow_names)
 
-        score_names = ['mae', 'r2', 'corr', 'corr_pad']
-        for score in score_names:
+        for score in SCORE_NAMES:
             temp_mean = self.scores[[f'{pipe}_{score}' for pipe in self.workflow_names]].mean()
             temp_std = self.scores[[f'{pipe}_{score}' for pipe in self.workflow_names]].std()
             temp_mean.rename(index=lambda s: s.removesuffix(f'_{score}'), inplace=True)
@@ -79,18 +124,15 @@ class StatsAnalyzer(Analyzer):
 
     def _stat_test(self, reference: str):
         nruns = int(len(self.predictions.subject_id) / self.predictions.subject_id.nunique()) 
-        for pipe in self.workflow_names:
-            if pipe == reference:
-                continue
-            a = self.scores[f'{reference}_mae'].to_numpy()
-            b = self.scores[f'{pipe}_mae'].to_numpy()
-            ttest = CorrelatedTTest(a, b, nruns)
-            tstat, p, cil, ciu = ttest.ttest()
-            pl, pr = ttest.probabilities()
-            self.result_table.loc[pipe, 'tstat'] = round(tstat,2)
-            self.result_table.loc[pipe, 'p'] = round(p,2)
-            self.result_table.loc[pipe, 'ci'] = f"({cil:.2f}, {ciu:.2f})"
-            self.result_table.loc[pipe, 'plr'] = f"({pl:.2f}, {pr:.2f})"
+        scores = self.scores[[f'{pipe}_mae' for pipe in self.workflow_names]].to_numpy()
+        self.comparisons = pairwise_correlated_ttest(scores, self.workflow_names, nruns)
+
+        # compare all workflows with the reference
+        for row in self.comparisons[self.comparisons.a == reference].itertuples():
+            self.result_table.loc[row.b, 'tstat'] = round(row.tstat,2)
+            self.result_table.loc[row.b, 'p'] = round(row.p,2)
+            self.result_table.loc[row.b, 'ci'] = f"({row.ci_lower:.2f}, {row.ci_upper:.2f})"
+            self.result_table.loc[row.b, 'plr'] = f"({row.p_l:.2f}, {row.p_u:.2f})"
 
     def save(self):
         # split first column
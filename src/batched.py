@@ -0,0 +1,264 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid
+
+# final steps the batched engine can fit (ARDRegression prunes a different set of features in every
+# fold and LinearSVR has no closed form, so they are fit fold by fold)
+BATCHED_REG = ['BayesianRidge', 'LinearRegression']
+
+
+def supports_batched(workflow) -> bool:
+    """
+    Whether the outer folds of a workflow can be fit in one batch: its model is a supported linear
+    model with the default options of the batched solvers and it has a single candidate (no inner CV).
+
+    Parameters:
+    -----------
+    workflow : WorkflowRepresentation
+        The workflow.
+
+    Returns:
+    --------
+    supported : bool
+    """
+    candidates = ParameterGrid(workflow.paramgrid)
+    if len(candidates) != 1:
+        return False
+    model = clone(workflow.pipeline[-1]).set_params(**{key[len('model__'):]: value for key, value in candidates[0].items()
+                                                       if key.startswith('model__')})
+    name = type(model).__name__
+    if name not in BATCHED_REG:
+        return False
+    if name == 'BayesianRidge':
+        return not model.compute_score
+    return not model.positive
+
+
+def stack_folds(matrices: list, targets: list = None):
+    """
+    Stacks per-fold matrices (n_i x p) into one zero-padded array (folds x max n_i x p).
+
+    Parameters:
+    -----------
+    matrices : list of np.ndarray
+        The design matrix of each fold (same number of columns).
+    targets : list of np.ndarray, optional
+        The target of each fold. Default is None.
+
+    Returns:
+    --------
+    X : np.ndarray
+        The padded design matrices (folds x n x p).
+    y : np.ndarray
+        The padded targets (folds x n), None without targets.
+    mask : np.ndarray
+        True for the rows of each fold, False for padding (folds x n).
+    """
+    n_rows = max(len(matrix) for matrix in matrices)
+    X = np.zeros((len(matrices), n_rows, matrices[0].shape[1]))
+    mask = np.zeros((len(matrices), n_rows), dtype=bool)
+    y = np.zeros((len(matrices), n_rows)) if targets is not None else None
+    for b, matrix in enumerate(matrices):
+        X[b, :len(matrix)] = matrix
+        mask[b, :len(matrix)] = True
+        if targets is not None:
+            y[b, :len(matrix)] = targets[b]
+    return X, y, mask
+
+
+def _center(X, y, mask, fit_intercept: bool):
+    """Center the rows of every fold on its own mean (padding stays zero)."""
+    weights = mask.astype(float)
+    n_samples = weights.sum(axis=1)
+    if fit_intercept:
+        X_offset = np.einsum('bnp,bn->bp', X, weights) / n_samples[:, None]
+        y_offset = (y * weights).sum(axis=1) / n_samples
+    else:
+        X_offset = np.zeros((X.shape[0], X.shape[2]))
+        y_offset = np.zeros(X.shape[0])
+    X = (X - X_offset[:, None, :]) * weights[:, :, None]
+    y = (y - y_offset[:, None]) * weights
+    return X, y, X_offset, y_offset, n_samples
+
+
+def fit_bayesian_ridge(X, y, mask, model) -> dict:
+    """
+    Fits BayesianRidge on every fold of a padded batch, with the updates of
+    sklearn.linear_model.BayesianRidge.fit run on all folds at once. A fold stops updating alpha and
+    lambda once its coefficients converged, so every fold ends as if it was fit on its own.
+
+    Parameters:
+    -----------
+    X : np.ndarray
+        The padded design matrices (folds x n x p).
+    y : np.ndarray
+        The padded targets (folds x n).
+    mask : np.ndarray
+        The rows of each fold (folds x n).
+    model : BayesianRidge
+        The (unfitted) model with the hyperparameters.
+
+    Returns:
+    --------
+    fit : dict
+        coef (folds x p), intercept, alpha, lambda, n_iter (folds) and sigma (folds x p x p).
+    """
+    X, y, X_offset, y_offset, n_samples = _center(X, y, mask, model.fit_intercept)
+    eps = np.finfo(np.float64).eps
+    n_folds = X.shape[0]
+
+    # as sklearn, the initial alpha is the inverse variance of y (not centered without intercept)
+    y_mean = y.sum(axis=1) / n_samples
+    alpha = np.full(n_folds, model.alpha_init, dtype=float) if model.alpha_init is not None \
+        else 1.0 / ((y ** 2).sum(axis=1) / n_samples - y_mean ** 2 + eps)
+    lambda_ = np.full(n_folds, model.lambda_init if model.lambda_init is not None else 1.0, dtype=float)
+
+    # one batched SVD, padded (zero) rows do not change the singular values
+    XT_y = np.einsum('bnp,bn->bp', X, y)
+    _, S, Vh = np.linalg.svd(X, full_matrices=False)
+    eigen_vals = S ** 2
+    Vh_XT_y = np.einsum('bkp,bp->bk', Vh, XT_y)
+
+    def update_coef(alpha, lambda_):
+        coef = np.einsum('bkp,bk->bp', Vh, Vh_XT_y / (eigen_vals + (lambda_ / alpha)[:, None]))
+        rmse = ((y - np.einsum('bnp,bp->bn', X, coef)) ** 2).sum(axis=1)
+        return coef, rmse
+
+    active = np.ones(n_folds, dtype=bool)
+    n_iter = np.zeros(n_folds, dtype=int)
+    coef_old = None
+    for iter_ in range(model.n_iter):
+        coef, rmse = update_coef(alpha, lambda_)
+
+        # update alpha and lambda of the folds that did not converge yet (MacKay, 1992)
+        gamma = ((alpha[:, None] * eigen_vals) / (lambda_[:, None] + alpha[:, None] * eigen_vals)).sum(axis=1)
+        lambda_ = np.where(active, (gamma + 2 * model.lambda_1) / ((coef ** 2).sum(axis=1) + 2 * model.lambda_2), lambda_)
+        alpha = np.where(active, (n_samples - gamma + 2 * model.alpha_1) / (rmse + 2 * model.alpha_2), alpha)
+        n_iter[active] = iter_ + 1
+
+        if iter_ != 0:
+            active &= np.abs(coef_old - coef).sum(axis=1) >= model.tol
+            if not active.any():
+                break
+        coef_old = coef.copy()
+
+    coef, _ = update_coef(alpha, lambda_)
+    sigma = np.einsum('bkp,bk,bkq->bpq', Vh, 1.0 / (eigen_vals + (lambda_ / alpha)[:, None]), Vh) / alpha[:, None, None]
+    intercept = y_offset - np.einsum('bp,bp->b', X_offset, coef)
+    return {'coef': coef, 'intercept': intercept, 'alpha': alpha, 'lambda': lambda_, 'n_iter': n_iter, 'sigma': sigma}
+
+
+def fit_linear_regression(X, y, mask, model) -> dict:
+    """
+    Fits LinearRegression (least squares) on every fold of a padded batch with one batched SVD.
+
+    Parameters:
+    -----------
+    X : np.ndarray
+        The padded design matrices (folds x n x p).
+    y : np.ndarray
+        The padded targets (folds x n).
+    mask : np.ndarray
+        The rows of each fold (folds x n).
+    model : LinearRegression
+        The (unfitted) model.
+
+    Returns:
+    --------
+    fit : dict
+        coef (folds x p) and intercept (folds).
+    """
+    X, y, X_offset, y_offset, n_samples = _center(X, y, mask, model.fit_intercept)
+    U, S, Vh = np.linalg.svd(X, full_matrices=False)
+    # minimum norm solution, singular values below a relative cutoff are dropped (rank deficient folds)
+    cutoff = S[:, :1] * np.finfo(np.float64).eps * max(X.shape[1], X.shape[2])
+    S_inv = np.divide(1.0, S, out=np.zeros_like(S), where=S > cutoff)
+    coef = np.einsum('bkp,bk->bp', Vh, S_inv * np.einsum('bnk,bn->bk', U, y))
+    intercept = y_offset - np.einsum('bp,bp->b', X_offset, coef)
+    return {'coef': coef, 'intercept': intercept}
+
+
+def predict_batched(fit: dict, X, mask) -> tuple:
+    """
+    Predicts every fold of a padded batch of test sets.
+
+    Parameters:
+    -----------
+    fit : dict
+        The result of fit_bayesian_ridge or fit_linear_regression.
+    X : np.ndarray
+        The padded test design matrices (folds x n x p).
+    mask : np.ndarray
+        The rows of each fold (folds x n).
+
+    Returns:
+    --------
+    pred : list of np.ndarray
+        The predictions of each fold.
+    std : list of np.ndarray
+        The standard deviation of the predictions of each fold (zeros without posterior).
+    """
+    pred = np.einsum('bnp,bp->bn', X, fit['coef']) + fit['intercept'][:, None]
+    if 'sigma' in fit:
+        std = np.sqrt(np.einsum('bnp,bpq,bnq->bn', X, fit['sigma'], X) + 1.0 / fit['alpha'][:, None])
+    else:
+        std = np.zeros(pred.shape)
+    return [pred[b, mask[b]] for b in range(len(pred))], [std[b, mask[b]] for b in range(len(std))]
+
+
+def fit_batched(workflow, data: pd.DataFrame, label_col: str, splits: list):
+    """
+    Fits the model of a workflow on all outer folds in one batch. The preprocessing is fit per fold
+    (through the preprocessing cache of the pipeline), the model on the stacked, preprocessed folds.
+
+    Parameters:
+    -----------
+    workflow : WorkflowRepresentation
+        The workflow (see supports_batched).
+    data : pd.DataFrame
+        The data.
+    label_col : str
+        The name of the label column.
+    splits : list
+        (train_idx, test_idx) per outer fold.
+
+    Returns:
+    --------
+    pred : list of np.ndarray
+        The predictions on the test set of each fold.
+    std : list of np.ndarray
+        The standard deviation of the predictions of each fold.
+    weights : pd.DataFrame
+        The coefficients (one row per fold, one column per feature), None if the folds have different
+        features (then the batch cannot be formed).
+    params : dict
+        The parameters of the model (the single candidate of the workflow).
+    """
+    params = ParameterGrid(workflow.paramgrid)[0]
+    preprocessing = clone(workflow.pipeline).set_params(**params).set_params(model='passthrough')
+    model = clone(workflow.pipeline).set_params(**params)[-1]
+    y = data[label_col].to_numpy(dtype=float)
+
+    train_sets, test_sets, targets, features = [], [], [], None
+    for train_idx, test_idx in splits:
+        X_train = preprocessing.fit_transform(data.iloc[train_idx], data[label_col].iloc[train_idx])
+        X_test = preprocessing.transform(data.iloc[test_idx])
+        columns = list(getattr(X_train, 'columns', range(X_train.shape[1])))
+        if features is None:
+            features = columns
+        elif columns != features:
+            return None, None, None, params
+        train_sets.append(np.asarray(X_train, dtype=float))
+        test_sets.append(np.asarray(X_test, dtype=float))
+        targets.append(y[train_idx])
+
+    X, y_train, mask = stack_folds(train_sets, targets)
+    if type(model).__name__ == 'BayesianRidge':
+        fit = fit_bayesian_ridge(X, y_train, mask, model)
+    else:
+        fit = fit_linear_regression(X, y_train, mask, model)
+    X_test, _, mask_test = stack_folds(test_sets)
+    pred, std = predict_batched(fit, X_test, mask_test)
+    weights = pd.DataFrame(fit['coef'], columns=features)
+    return pred, std, weights, params
@@ -0,0 +1,89 @@
+import os
+import pickle
+from pathlib import Path
+
+
+class FoldStore():
+    """
+    Append-only on-disk store of the finished outer folds of one workflow.
+
+    The file starts with a header holding the key of the run (a fingerprint of data, splits and
+    workflow) followed by one pickled record per finished fold. Records of a run with a different
+    key are never reused, and a record that was cut off when the job died is dropped on reading.
+
+    Attributes:
+    -----------
+    path : Path
+        The file the folds are appended to.
+    key : str
+        The fingerprint of the run.
+    """
+    def __init__(self, path: Path, key: str, resume: bool = True):
+        """
+        Parameters:
+        -----------
+        path : Path
+            The file the folds are appended to.
+        key : str
+            The fingerprint of the run.
+        resume : bool, optional
+            If True, reuse the folds already in the store. Otherwise start empty. Default is True.
+        """
+        self.path = Path(path)
+        self.key = key
+        self._records = {}
+        if resume:
+            self._records = self._read()
+        self._rewrite()
+
+    def __contains__(self, fold) -> bool:
+        return fold in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, fold):
+        """Get the stored record of a fold (None if missing)."""
+        return self._records.get(fold)
+
+    def append(self, fold, record):
+        """Append the record of a finished fold and flush it to disk."""
+        with open(self.path, 'ab') as f:
+            pickle.dump((fold, record), f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        self._records[fold] = record
+
+    def _read(self) -> dict:
+        """Read all complete records of a store with a matching key."""
+        records = {}
+        if not self.path.exists():
+            return records
+        with open(self.path, 'rb') as f:
+            try:
+                header = pickle.load(f)
+            except Exception:
+                return records
+            if header != {'key': self.key}:
+                print(f"Checkpoint {self.path.name} belongs to another run, starting over")
+                return records
+            while True:
+                try:
+                    fold, record = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception:
+                    # incomplete record of an interrupted run
+                    break
+                records[fold] = record
+        return records
+
+    def _rewrite(self):
+        """Write header and complete records, dropping anything that could not be read."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'key': self.key}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            for fold, record in self._records.items():
+                pickle.dump((fold, record), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
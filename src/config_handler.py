@@ -1,6 +1,11 @@
 #%%
+import copy
 import json
+import os
 import yaml
+
+# parsed (and validated) yaml files of this process, keyed on path and validator
+_CONFIG_CACHE = {}
 #%%
 def read_json(json_file):
     """
@@ -34,6 +39,34 @@ def read_yaml(yaml_file):
         paths = yaml.safe_load(f)
     return paths
 
+def read_config(yaml_file, validate=None):
+    """
+    Reads a yaml config file through a process-wide cache. A file is parsed (and validated) once
+    and parsed again only when its modification time or size changed. Every call returns its own
+    copy, so callers can modify it.
+    args:
+        yaml_file: yaml file to read from
+        validate: function that checks the parsed config and raises ValueError (default: None)
+    returns: dictionary of the config
+    """
+    path = os.path.abspath(yaml_file)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _CONFIG_CACHE.get((path, validate))
+    if cached is None or cached[0] != version:
+        config = read_yaml(path)
+        if validate is not None:
+            validate(config, path)
+        cached = (version, config)
+        _CONFIG_CACHE[(path, validate)] = cached
+    return copy.deepcopy(cached[1])
+
+def clear_config_cache():
+    """
+    Clears the config cache of read_config.
+    """
+    _CONFIG_CACHE.clear()
+
 def write_yaml(yaml_file, dict_to_write):
     """
     Writes the paths to a yaml file.
@@ -1,4 +1,9 @@
-from sklearn.model_selection import KFold, RepeatedStratifiedKFold, GridSearchCV
+from sklearn.model_selection import KFold, RepeatedStratifiedKFold, GridSearchCV, PredefinedSplit
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from src.fingerprint import hash_object, hash_frame
 
 
 class CVSpec():
@@ -53,6 +58,9 @@ class CVGenerator:
     generate_outer(X, y):
         Generates an outer CV object.
 
+    materialize(data, strat_col, directory):
+        Generates all outer and nested inner splits once and stores them.
+
     """
     def __init__(self, cv_spec: CVSpec):
         self.n_splits = cv_spec.n_splits
@@ -99,4 +107,140 @@ class CVGenerator:
         grid_search : scikit-learn GridSearchCV object
             The grid search object.
         """
-        return GridSearchCV(pipeline, param_grid, cv=self.generate_inner(), scoring="neg_mean_absolute_error", n_jobs=n_jobs)
\ No newline at end of file
+        return GridSearchCV(pipeline, param_grid, cv=self.generate_inner(), scoring="neg_mean_absolute_error", n_jobs=n_jobs)
+
+    def materialize(self, data: pd.DataFrame, strat_col: str, directory: Path = None) -> "SplitStore":
+        """
+        Generates all outer and nested inner splits once. If a directory is given, the splits are
+        stored there, keyed by a fingerprint of the data and the CV specification, and loaded
+        (memory-mapped) instead of recomputed when they already exist.
+
+        Parameters:
+        -----------
+        data : pd.DataFrame
+            The data to split.
+        strat_col : str
+            The name of the column to stratify the outer splits on.
+        directory : Path, optional
+            The directory to store the splits in. Default is None (not stored).
+
+        Returns:
+        --------
+        split_store : SplitStore
+            The outer and nested inner splits.
+        """
+        key = hash_object({
+            "data": hash_frame(data[[strat_col]]),
+            "n_splits": self.n_splits,
+            "n_repeats": self.n_repeats,
+            "random_state": self.random_state,
+            "shuffle": self.shuffle,
+        })
+        if directory is not None and SplitStore.exists(Path(directory) / f"splits_{key[:16]}"):
+            return SplitStore.load(Path(directory) / f"splits_{key[:16]}")
+
+        n_samples = data.shape[0]
+        outer_fold = np.empty((self.n_repeats, n_samples), dtype=np.int32)
+        inner_fold = np.empty((self.n_repeats * self.n_splits, n_samples), dtype=np.int32)
+
+        cv_outer = self.generate_outer()
+        cv_inner = self.generate_inner()
+        for k, (train_idx, test_idx) in enumerate(cv_outer.split(data, data[strat_col])):
+            outer_fold[k // self.n_splits, test_idx] = k % self.n_splits
+            # inner folds are generated on the training set, as GridSearchCV does
+            inner_fold[k, test_idx] = -1
+            for j, (_, inner_test_idx) in enumerate(cv_inner.split(train_idx)):
+                inner_fold[k, train_idx[inner_test_idx]] = j
+
+        split_store = SplitStore(outer_fold, inner_fold, self.n_splits, key)
+        if directory is not None:
+            split_store.save(Path(directory) / f"splits_{key[:16]}")
+        return split_store
+
+
+class SplitStore:
+    """
+    A class that holds materialized outer and nested inner splits as compact int32 fold assignments.
+    It can be used as outer CV object (split, get_n_splits) and provides the inner CV object of each
+    outer fold.
+
+    Attributes:
+    -----------
+    outer_fold : np.ndarray
+        The outer test fold of each sample per repeat (n_repeats x n_samples).
+    inner_fold : np.ndarray
+        The inner test fold of each sample per outer fold, -1 for the outer test samples (n_outer x n_samples).
+    n_splits : int
+        The number of folds per repeat.
+    key : str
+        The fingerprint of the data and CV specification the splits were generated from.
+
+    Methods:
+    --------
+    split(X, y, groups):
+        Generates the outer train and test indices.
+
+    inner_cv(fold):
+        Returns the inner CV object of an outer fold.
+    """
+    def __init__(self, outer_fold: np.ndarray, inner_fold: np.ndarray, n_splits: int, key: str = None):
+        self.outer_fold = outer_fold
+        self.inner_fold = inner_fold
+        self.n_splits = n_splits
+        self.key = key
+
+    def get_n_splits(self, X=None, y=None, groups=None) -> int:
+        return self.inner_fold.shape[0]
+
+    def split(self, X=None, y=None, groups=None):
+        """
+        Generates the outer train and test indices (in the order of RepeatedStratifiedKFold).
+        """
+        indices = np.arange(self.outer_fold.shape[1])
+        for repeat in self.outer_fold:
+            for fold in range(self.n_splits):
+                test_mask = repeat == fold
+                yield indices[~test_mask], indices[test_mask]
+
+    def inner_cv(self, fold: int) -> PredefinedSplit:
+        """
+        Returns the inner CV object of an outer fold.
+
+        Parameters:
+        -----------
+        fold : int
+            The number of the outer fold (starting at 1).
+
+        Returns:
+        --------
+        inner_cv : PredefinedSplit
+            The inner CV object, indexing the training set of the outer fold.
+        """
+        inner_fold = self.inner_fold[fold - 1]
+        return PredefinedSplit(inner_fold[inner_fold >= 0])
+
+    def save(self, directory: Path):
+        """
+        Saves the splits as .npy files (outer.npy, inner.npy) and the key to a directory.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "outer.npy", self.outer_fold)
+        np.save(directory / "inner.npy", self.inner_fold)
+        (directory / "key.txt").write_text(f"{self.key}\n{self.n_splits}\n")
+
+    @staticmethod
+    def exists(directory: Path) -> bool:
+        directory = Path(directory)
+        return all((directory / name).exists() for name in ["outer.npy", "inner.npy", "key.txt"])
+
+    @staticmethod
+    def load(directory: Path) -> "SplitStore":
+        """
+        Loads splits saved with save. The arrays are memory-mapped (read-only).
+        """
+        directory = Path(directory)
+        key, n_splits = (directory / "key.txt").read_text().split()
+        outer_fold = np.load(directory / "outer.npy", mmap_mode="r")
+        inner_fold = np.load(directory / "inner.npy", mmap_mode="r")
+        return SplitStore(outer_fold, inner_fold, int(n_splits), key)
@@ -1,19 +1,92 @@
+import hashlib
+import json
+import os
+import numpy as np
 import pandas as pd
+import pyarrow.dataset as ds
 from pathlib import Path
 from src.transform import OneHotPD
 from src.prep import bin_data
 
 
+class WorklistCache():
+    """
+    Columnar (parquet) cache of a worklist file (xlsx), stored in a .cache directory next to it.
+
+    The cache is rebuilt when the size or content of the worklist changed: the modification time
+    and size are checked first, and the sha256 of the file only when the modification time
+    differs (a touched but unchanged file keeps its cache). Reads can push row filters
+    (pyarrow.dataset expressions) into the scan.
+    """
+    def __init__(self, worklist_file: Path, index_col: str = "pet_id"):
+        self.worklist_file = Path(worklist_file)
+        self.index_col = index_col
+        cache_dir = self.worklist_file.parent / ".cache"
+        self.cache_file = cache_dir / f"{self.worklist_file.stem}.parquet"
+        self.meta_file = cache_dir / f"{self.worklist_file.stem}.meta.json"
+
+    def read(self, filter=None, columns: list = None) -> pd.DataFrame:
+        """Read the rows matching filter (all rows if None), in worklist order."""
+        self._update()
+        if columns is not None and self.index_col not in columns:
+            columns = [self.index_col] + list(columns)
+        table = ds.dataset(self.cache_file, format="parquet").to_table(columns=columns, filter=filter)
+        return table.to_pandas().set_index(self.index_col)
+
+    def count(self, filter=None) -> int:
+        """Count the rows matching filter."""
+        self._update()
+        return ds.dataset(self.cache_file, format="parquet").count_rows(filter=filter)
+
+    def _update(self):
+        """Rebuild the cache if the worklist changed."""
+        stat = os.stat(self.worklist_file)
+        meta = self._read_meta()
+        if meta is not None and self.cache_file.exists() and meta["size"] == stat.st_size:
+            if meta["mtime_ns"] == stat.st_mtime_ns:
+                return
+            if meta["sha256"] == self._hash():
+                self._write_meta(stat, meta["sha256"])
+                return
+        self._build(stat)
+
+    def _build(self, stat):
+        print(f"Caching {self.worklist_file.name} as parquet")
+        data = pd.read_excel(self.worklist_file).reset_index(drop=True)
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+        data.to_parquet(tmp_file, index=False)
+        os.replace(tmp_file, self.cache_file)
+        self._write_meta(stat, self._hash())
+
+    def _hash(self) -> str:
+        sha = hashlib.sha256()
+        with open(self.worklist_file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def _read_meta(self):
+        try:
+            return json.loads(self.meta_file.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, stat, sha256: str):
+        self.meta_file.write_text(json.dumps({"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256}))
+
+
 class DataSpec():
-    def __init__(self, data_file: Path, covarities: list, exclude: list, tracer: str, type: list):
+    def __init__(self, data_file: Path, covarities: list, exclude: list, tracer: str, type: list, compact: bool = False):
         self.data_file = data_file
         self.covarities = covarities
         self.exclude = exclude
         self.tracer = tracer
         self.type = type
+        self.compact = compact
 
     def __str__(self):
-        return f"\n\tFile: {self.data_file}\n\tCovarities: {self.covarities}\n\tExclude: {self.exclude}\n\tTracer: {self.tracer}"
+        return f"\n\tFile: {self.data_file}\n\tCovarities: {self.covarities}\n\tExclude: {self.exclude}\n\tTracer: {self.tracer}\n\tCompact: {self.compact}"
     
 class DataWrangler:
     def __init__(self, data_spec: DataSpec):
@@ -23,6 +96,7 @@ class DataWrangler:
         self.tracer = data_spec.tracer
         self.data_file = data_spec.data_file
         self.type = data_spec.type
+        self.compact = data_spec.compact
         self.data = None
 
     def _print_config(self):
@@ -32,10 +106,11 @@ class DataWrangler:
 
     def prepare_data(self):
         """Prepare data for experiment"""
-        self._load_data(self.data_file)
-        self._select_tracer(self.tracer)
-        nscans = len(self.data["subject_id"])
-        self._remove_hrrt_altanserin()
+        # tracer selection and HRRT altanserin removal are pushed into the scan of the cached worklist,
+        # the other filters depend on the order of removal (follow-up scans first) and run in memory
+        worklist = WorklistCache(self.data_file)
+        nscans = worklist.count(self._tracer_filter(self.tracer))
+        self.data = worklist.read(self._tracer_filter(self.tracer) & self._camera_filter())
         nscans_after = len(self.data["subject_id"])
         print(f"Removed {nscans - nscans_after} HRRT altanserin scans")
         self._remove_second_scan()
@@ -49,7 +124,9 @@ class DataWrangler:
         print(f"Removed {nscans_after3 - nscans_after4} scans that were not type {self.type}")
         self._remove_columns(self.exclude)
         self._dummify(self.covarities)
-        self.data = bin_data(self.data, 'chron_age', min_val=0.0, max_val=100.0, step=2.5)
+        self.data = bin_data(self.data, 'chron_age', min_val=0.0, max_val=100.0, step=2.5, categorical=self.compact)
+        if self.compact:
+            self._compact_features(label_col='chron_age')
     
     def rename_columns(self, rename:list, prefix:str):
         """Rename columns in data by adding prefix"""
@@ -65,6 +142,16 @@ class DataWrangler:
         """Load data from worklist file"""
         self.data = pd.read_excel(worklist_file, index_col="pet_id")
 
+    def _tracer_filter(self, tracer):
+        """Scan filter of _select_tracer"""
+        if tracer is None:
+            return ds.scalar(True)
+        return ds.field("tracer") == tracer
+
+    def _camera_filter(self):
+        """Scan filter of _remove_hrrt_altanserin"""
+        return ((ds.field("tracer") == "a") & (ds.field("camera") == "GE")) | (ds.field("tracer") == "C")
+
     def _select_tracer(self,tracer):
         """Select data for tracer"""
         if tracer is not None:
@@ -86,7 +173,13 @@ class DataWrangler:
     def _dummify(self, covarities):
         """dummify data"""
         # one-hot encode categoricals (_dummify)
-        self.data = OneHotPD(covarities).fit_transform(self.data)
+        dtype = np.uint8 if self.compact else None
+        self.data = OneHotPD(covarities, dtype=dtype).fit_transform(self.data)
+
+    def _compact_features(self, label_col: str):
+        """Store float features as float32 (the label keeps its precision)"""
+        features = [col for col in self.data.select_dtypes(include="float64").columns if col != label_col]
+        self.data = self.data.astype({col: np.float32 for col in features})
 
     def _remove_second_scan(self):
         """Remove second scan of same subject"""
@@ -1,9 +1,21 @@
-from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.linear_model import Ridge, RidgeCV
 from sklearn.gaussian_process import GaussianProcessRegressor
 from sklearn.gaussian_process.kernels import Kernel, RBF, ConstantKernel, DotProduct
+from sklearn.model_selection import ParameterGrid, check_cv
+from sklearn.metrics import mean_absolute_error
+from sklearn.utils import _safe_indexing, Bunch
+from sklearn.utils.metaestimators import _BaseComposition
+from sklearn.utils.validation import check_memory, check_is_fitted
+from joblib import Parallel, delayed
+import numpy as np
+from scipy import linalg
 
 import sys
 
+# this module is imported when a step or search strategy needs it (see src.step_factory and
+# src.search), so its estimator imports do not slow down importing the experiment modules
+
 class GPR(GaussianProcessRegressor):
     """ interface to sklearn GaussianProcessRegression"""
     def __init__(self, kernel = None, alpha=1e-10, kernel_wargs = {}) -> None:
@@ -46,3 +58,328 @@ class Pyment(RegressorMixin, BaseEstimator):
         return X
 
 
+
+
+class GPRGridSearchCV(BaseEstimator):
+    """ Grid search for pipelines ending in a GaussianProcessRegressor with fixed kernel hyperparameters.
+    The kernel matrix of each inner training set is computed and eigendecomposed once per kernel
+    candidate (e.g. length scale), and all alpha candidates are scored from that decomposition:
+    (K + alpha * I)^-1 = Q diag(1 / (eigvals + alpha)) Q^T.
+    The scores are the same as with GridSearchCV, which refits (and factorizes) the model for every
+    candidate. Requires optimizer=None, otherwise the kernel hyperparameters change during fitting."""
+    def __init__(self, estimator, param_grid, cv=5, refit=True) -> None:
+        """ Initialize the grid search.
+        Args:
+            estimator (sklearn.pipeline.Pipeline): pipeline with a GaussianProcessRegressor as last step
+            param_grid (dict): parameter grid, as for GridSearchCV
+            cv (int or sklearn.model_selection._split): inner cross-validation
+            refit (bool): refit the best candidate on all data, default True"""
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.refit = refit
+
+    def fit(self, X, y):
+        """ Score all candidates with neg. mean absolute error and refit the best one.
+        Args:
+            X (pd.DataFrame): training data
+            y (pd.Series): target variable"""
+        model_name, model = self.estimator.steps[-1]
+        if not isinstance(model, GaussianProcessRegressor):
+            raise ValueError(f"Last step must be a GaussianProcessRegressor, got {type(model).__name__}.")
+        if model.optimizer is not None:
+            raise ValueError("GPRGridSearchCV requires a GaussianProcessRegressor with optimizer=None.")
+
+        candidates = list(ParameterGrid(self.param_grid))
+        alpha_key = f"{model_name}__alpha"
+        kernel_groups = {}
+        for i, params in enumerate(candidates):
+            kernel_params = tuple((key, value) for key, value in params.items() if key != alpha_key)
+            kernel_groups.setdefault(kernel_params, []).append(i)
+
+        splits = list(check_cv(self.cv).split(X, y))
+        y = np.asarray(y, dtype=float)
+        scores = np.zeros((len(candidates), len(splits)))
+        for j, (train_idx, test_idx) in enumerate(splits):
+            X_train, X_test = self._preprocess(_safe_indexing(X, train_idx), y[train_idx], _safe_indexing(X, test_idx))
+            y_train, y_test = y[train_idx], y[test_idx]
+
+            for kernel_params, members in kernel_groups.items():
+                gpr = clone(model).set_params(**{key[len(model_name) + 2:]: value for key, value in kernel_params})
+                pred = self._predict_alphas(gpr, X_train, y_train, X_test, [candidates[i].get(alpha_key, gpr.alpha) for i in members])
+                for i, pred_alpha in zip(members, pred):
+                    scores[i, j] = -mean_absolute_error(y_test, pred_alpha)
+
+        mean_scores = scores.mean(axis=1)
+        self.best_index_ = int(np.argmax(mean_scores))
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = mean_scores[self.best_index_]
+        self.cv_results_ = {"params": candidates, "mean_test_score": mean_scores}
+        for j in range(len(splits)):
+            self.cv_results_[f"split{j}_test_score"] = scores[:, j]
+        self.n_splits_ = len(splits)
+        self.n_fits_ = len(splits) * len(kernel_groups) + int(self.refit)
+
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+            self.best_estimator_.fit(X, y)
+        return self
+
+    def _preprocess(self, X_train, y_train, X_test):
+        """ Fit all steps but the model on the training set and transform both sets."""
+        if len(self.estimator.steps) == 1:
+            return X_train, X_test
+        preprocessing = clone(self.estimator[:-1])
+        return preprocessing.fit_transform(X_train, y_train), preprocessing.transform(X_test)
+
+    def _predict_alphas(self, gpr, X_train, y_train, X_test, alphas):
+        """ Predict the test set for several alphas from one eigendecomposition of the kernel matrix."""
+        kernel = gpr.kernel
+        if kernel is None:
+            kernel = ConstantKernel(1.0, constant_value_bounds="fixed") * RBF(1.0, length_scale_bounds="fixed")
+        X_train = np.asarray(X_train, dtype=float)
+        X_test = np.asarray(X_test, dtype=float)
+
+        # normalize target as GaussianProcessRegressor does
+        y_mean, y_std = 0.0, 1.0
+        if gpr.normalize_y:
+            y_mean, y_std = np.mean(y_train), np.std(y_train)
+            y_std = y_std if y_std != 0 else 1.0
+        y_train = (y_train - y_mean) / y_std
+
+        eigvals, eigvecs = np.linalg.eigh(kernel(X_train))
+        K_test = kernel(X_test, X_train) @ eigvecs
+        y_rot = eigvecs.T @ y_train
+        return [(K_test @ (y_rot / (eigvals + alpha))) * y_std + y_mean for alpha in alphas]
+
+
+class RidgePathSearchCV(BaseEstimator):
+    """ Search over the regularization path of pipelines ending in a Ridge model, with the same scores as
+    GridSearchCV. The held-out predictions of all alpha candidates follow from one SVD (X = U S V^T) per
+    candidate of the other parameters and split, coef = V diag(s / (s^2 + alpha)) U^T y (centered).
+    For pipelines of only the Ridge model, one SVD of the whole training data per candidate of the other
+    parameters gives all splits through the hat matrix H = 1/n + U diag(s^2 / (s^2 + alpha)) U^T
+    (intercept unpenalized): the residuals of refitting without a fold T are e_T = (I - H_TT)^-1 (y_T - yhat_T),
+    or e_i = (y_i - yhat_i) / (1 - H_ii) for leave-one-out. With preprocessing steps, these are fit on every
+    inner training set as in GridSearchCV, so each split needs its own SVD and leave-one-out is not offered."""
+    def __init__(self, estimator, param_grid, cv=5, loo=False, refit=True) -> None:
+        """ Initialize the search.
+        Args:
+            estimator (sklearn.pipeline.Pipeline): pipeline with a Ridge model as last step
+            param_grid (dict): parameter grid, as for GridSearchCV
+            cv (int or sklearn.model_selection._split): inner cross-validation (ignored with loo)
+            loo (bool): score with leave-one-out residuals instead of the inner CV (only for pipelines
+                without preprocessing steps), default False
+            refit (bool): refit the best candidate on all data, default True"""
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.loo = loo
+        self.refit = refit
+
+    def fit(self, X, y):
+        """ Score all candidates with neg. mean absolute error and refit the best one.
+        Args:
+            X (pd.DataFrame): training data
+            y (pd.Series): target variable"""
+        model_name, model = self.estimator.steps[-1]
+        if not isinstance(model, Ridge):
+            raise ValueError(f"Last step must be a Ridge model, got {type(model).__name__}.")
+        if model.positive:
+            raise ValueError("RidgePathSearchCV requires a Ridge model with positive=False.")
+        preprocessing = len(self.estimator.steps) > 1
+        if self.loo and preprocessing:
+            raise ValueError("RidgePathSearchCV with loo=True requires a pipeline without preprocessing steps.")
+
+        candidates = list(ParameterGrid(self.param_grid))
+        alpha_key = f"{model_name}__alpha"
+        path_groups = {}
+        for i, params in enumerate(candidates):
+            other_params = tuple((key, value) for key, value in params.items() if key != alpha_key)
+            path_groups.setdefault(other_params, []).append(i)
+
+        y = np.asarray(y, dtype=float)
+        if self.loo:
+            splits = [(None, np.array([i])) for i in range(len(y))]
+        else:
+            splits = list(check_cv(self.cv).split(X, y))
+        scores = np.zeros((len(candidates), len(splits)))
+        for other_params, members in path_groups.items():
+            pipe = clone(self.estimator).set_params(**dict(other_params))
+            alphas = [candidates[i].get(alpha_key, pipe[-1].alpha) for i in members]
+            if preprocessing:
+                residuals = self._split_residuals(pipe, X, y, alphas, splits)
+            else:
+                residuals = self._hat_residuals(pipe[-1], X, y, alphas, splits)
+            for i, residual in zip(members, residuals):
+                scores[i] = [-np.mean(np.abs(residual[test_idx])) for _, test_idx in splits]
+
+        mean_scores = scores.mean(axis=1)
+        self.best_index_ = int(np.argmax(mean_scores))
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = mean_scores[self.best_index_]
+        self.cv_results_ = {"params": candidates, "mean_test_score": mean_scores}
+        if not self.loo:
+            for j in range(len(splits)):
+                self.cv_results_[f"split{j}_test_score"] = scores[:, j]
+        self.n_splits_ = len(splits)
+        # one decomposition per group of candidates (and split, with preprocessing) instead of a fit per
+        # candidate and split
+        self.n_fits_ = len(path_groups) * (len(splits) if preprocessing else 1) + int(self.refit)
+
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+            self.best_estimator_.fit(X, y)
+        return self
+
+    @staticmethod
+    def _center(model, X, y):
+        """ Column means (zero without intercept) of X and y."""
+        if model.fit_intercept:
+            return X.mean(axis=0), y.mean()
+        return np.zeros(X.shape[1]), 0.0
+
+    def _hat_residuals(self, model, X, y, alphas, splits):
+        """ Held-out residuals (n_samples) of every split for each alpha, from one SVD of all data."""
+        X = np.asarray(X, dtype=float)
+        X_mean, y_mean = self._center(model, X, y)
+        offset = 1.0 / len(y) if model.fit_intercept else 0.0
+        y_centered = y - y_mean
+
+        U, s, _ = linalg.svd(X - X_mean, full_matrices=False)
+        U_y = U.T @ y_centered
+        residuals = []
+        for alpha in alphas:
+            shrinkage = s ** 2 / (s ** 2 + alpha)
+            fitted_residual = y_centered - U @ (shrinkage * U_y)
+            if self.loo:
+                residual = fitted_residual / (1.0 - offset - (U ** 2) @ shrinkage)
+            else:
+                residual = np.empty(len(y))
+                for _, test_idx in splits:
+                    U_test = U[test_idx]
+                    H_test = offset + (U_test * shrinkage) @ U_test.T
+                    residual[test_idx] = linalg.solve(np.eye(len(test_idx)) - H_test, fitted_residual[test_idx])
+            residuals.append(residual)
+        return residuals
+
+    def _split_residuals(self, pipe, X, y, alphas, splits):
+        """ Held-out residuals (n_samples) of every split for each alpha, with the preprocessing fit and
+        one SVD per inner training set."""
+        residuals = [np.empty(len(y)) for _ in alphas]
+        for train_idx, test_idx in splits:
+            preprocessing = clone(pipe[:-1])
+            X_train = np.asarray(preprocessing.fit_transform(_safe_indexing(X, train_idx), y[train_idx]), dtype=float)
+            X_test = np.asarray(preprocessing.transform(_safe_indexing(X, test_idx)), dtype=float)
+            X_mean, y_mean = self._center(pipe[-1], X_train, y[train_idx])
+
+            U, s, Vt = linalg.svd(X_train - X_mean, full_matrices=False)
+            U_y = U.T @ (y[train_idx] - y_mean)
+            test_rotated = (X_test - X_mean) @ Vt.T
+            for residual, alpha in zip(residuals, alphas):
+                pred = test_rotated @ (s / (s ** 2 + alpha) * U_y) + y_mean
+                residual[test_idx] = y[test_idx] - pred
+        return residuals
+
+
+def _fit_base_learner(estimator, X, y):
+    """ Fit a clone of a base learner (cached by CachedStackingRegressor)."""
+    return clone(estimator).fit(X, y)
+
+
+def _oof_predictions(estimator, X, y, splits):
+    """ Out-of-fold predictions of a base learner (cached by CachedStackingRegressor)."""
+    pred = np.zeros(len(y))
+    for train_idx, test_idx in splits:
+        model = clone(estimator).fit(_safe_indexing(X, train_idx), _safe_indexing(y, train_idx))
+        pred[test_idx] = model.predict(_safe_indexing(X, test_idx))
+    return pred
+
+
+class CachedStackingRegressor(RegressorMixin, _BaseComposition):
+    """ Stacking ensemble (as sklearn.ensemble.StackingRegressor, with the same parameters) whose base
+    learner out-of-fold predictions and fits are cached on disk.
+    The cache is keyed on the content of the base learner (class and parameters), the training data and
+    the stacking splits, so a base learner is fit once per fold however often it is stacked: by every
+    grid candidate that only changes the other base learner, and by other ensembles (of other workflows)
+    with the same base learner on the same data. Only the final estimator is always fit fresh.
+    Without memory, it fits like StackingRegressor."""
+    def __init__(self, estimators, final_estimator=None, *, cv=None, n_jobs=None, passthrough=False, verbose=0,
+                 memory=None) -> None:
+        """ Initialize the ensemble.
+        Args:
+            estimators (list): (name, estimator) of the base learners ('drop' to leave one out)
+            final_estimator (sklearn estimator): regressor fit on the out-of-fold predictions, default RidgeCV
+            cv (int or sklearn.model_selection._split): splits of the out-of-fold predictions, default 5-fold
+            n_jobs (int): number of jobs to fit the base learners in parallel, default None (1)
+            passthrough (bool): also fit the final estimator on the original features, default False
+            verbose (int): verbosity of the parallel fits, default 0
+            memory (str or joblib.Memory): cache of the base learners, default None (no caching)"""
+        self.estimators = estimators
+        self.final_estimator = final_estimator
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.passthrough = passthrough
+        self.verbose = verbose
+        self.memory = memory
+
+    def get_params(self, deep=True):
+        """ Parameters of the ensemble, with the parameters of the base learners (name__param) if deep."""
+        return self._get_params("estimators", deep=deep)
+
+    def set_params(self, **params):
+        """ Set the parameters of the ensemble and its base learners (name__param)."""
+        self._set_params("estimators", **params)
+        return self
+
+    def fit(self, X, y):
+        """ Fit the base learners (or get them from the cache) and the final estimator.
+        Args:
+            X (pd.DataFrame): training data
+            y (pd.Series): target variable"""
+        names, _ = zip(*self.estimators)
+        self._validate_names(names)
+        estimators = [(name, est) for name, est in self.estimators if est != "drop"]
+        if not estimators:
+            raise ValueError("All base learners of the ensemble are dropped.")
+        self.final_estimator_ = clone(self.final_estimator) if self.final_estimator is not None else RidgeCV()
+
+        memory = check_memory(self.memory)
+        fit_base_learner = memory.cache(_fit_base_learner)
+        oof_predictions = memory.cache(_oof_predictions)
+
+        # materialized splits, so the cache key does not depend on the state of the cv object
+        splits = [(np.asarray(train_idx), np.asarray(test_idx)) for train_idx, test_idx in check_cv(self.cv, y).split(X, y)]
+        parallel = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)
+        predictions = parallel(delayed(oof_predictions)(est, X, y, splits) for _, est in estimators)
+        self.estimators_ = parallel(delayed(fit_base_learner)(est, X, y) for _, est in estimators)
+
+        self.named_estimators_ = Bunch()
+        for (name, _), fitted in zip(estimators, self.estimators_):
+            self.named_estimators_[name] = fitted
+            if hasattr(fitted, "feature_names_in_"):
+                self.feature_names_in_ = fitted.feature_names_in_
+
+        self.final_estimator_.fit(self._stack(X, predictions), y)
+        return self
+
+    def transform(self, X):
+        """ Predictions of the base learners (and the original features with passthrough).
+        Args:
+            X (pd.DataFrame): data"""
+        check_is_fitted(self, "estimators_")
+        return self._stack(X, [est.predict(X) for est in self.estimators_])
+
+    def predict(self, X, **predict_params):
+        """ Predict with the final estimator on the predictions of the base learners.
+        Args:
+            X (pd.DataFrame): data
+            predict_params: passed to the final estimator (e.g. return_std=True)"""
+        return self.final_estimator_.predict(self.transform(X), **predict_params)
+
+    def _stack(self, X, predictions):
+        """ Stack the predictions of the base learners as meta features."""
+        meta = np.column_stack(predictions)
+        if self.passthrough:
+            meta = np.hstack([meta, np.asarray(X, dtype=float)])
+        return meta
@@ -1,12 +1,17 @@
 #%%
 from pathlib import Path
+import numpy as np
 import pandas as pd
-from src.config_handler import read_yaml, get_entry
+from src.config_handler import read_config, get_entry
 from src.data_wrangler import DataWrangler, DataSpec
 from src.cv import CVGenerator, CVSpec
 from src.fs_roi_lut import read_roi_names
 from src.trainer import Trainer
-from src.workflow import WorkFlowSpecs, WorkflowBuilder, WorkflowResults
+from src.workflow import WorkFlowSpecs, WorkflowBuilder, WorkflowResults, prune_cache
+from src.result_cache import ResultCache
+from src.result_store import ResultStore
+from src.scheduler import TaskTimings
+from src.threads import ThreadBudget
 
 class ExperimentSpec():
     def __init__(self, data_dir: Path, exp_file_name: str, name: str, result_dir: Path) -> None:
@@ -14,7 +19,7 @@ class ExperimentSpec():
         self.resultdir = result_dir
         self.datadir = data_dir
 
-        config = read_yaml(self.datadir / exp_file_name)
+        config = read_config(self.datadir / exp_file_name)
         exp_config = get_entry(config, name)
         self.description = get_entry(exp_config,'description')
         
@@ -51,7 +56,8 @@ class ExperimentSpec():
                                  data_config['covarities'], 
                                  data_config['exclude'],
                                  data_config['tracer'],
-                                 data_config['type'])
+                                 data_config['type'],
+                                 data_config.get('compact', False))
 
     def _print_config(self):
         print(f"Experiment: {self.name}")
@@ -78,7 +84,8 @@ class ExperimentSpec():
         self.workflows = []
         for pipeline in pipelines:
             for model in pipeline['models']:
-                workflow = WorkFlowSpecs(self.pipeline_file, self.model_file, pipeline['name'], model, self.rois)
+                workflow = WorkFlowSpecs(self.pipeline_file, self.model_file, pipeline['name'], model, self.rois,
+                                         cache_dir=self.resultdir / "cache" / "preprocessing")
                 self.workflows.append(workflow)
         return
     
@@ -93,34 +100,97 @@ class ExperimentRunner():
         self.cv = CVGenerator(exp_spec.cv)
         self.workflows = WorkflowBuilder.build(exp_spec.workflows)
 
-    def run(self, n_jobs: int = 1):
+    def run(self, n_jobs: int = 1, fold_jobs: int = 1, resume: bool = False, cache_dir: Path = None, use_cache: bool = True,
+            n_cores: int = None, threads_per_job: int = None, batched: bool = False):
+        """ Run all workflows of the experiment. Workflows whose results (same data, CV, workflow
+        configuration, batched flag and source code of src) are already in the result cache are not
+        recomputed. Fitted preprocessing steps are cached in resultdir/cache/preprocessing, in a
+        subdirectory per version of the source code (joblib does not detect changes of the step code);
+        the fits of other versions are removed at the start of the run.
+        Args:
+            n_jobs (int): number of jobs for the inner CV (default: 1)
+            fold_jobs (int): number of processes to spread the outer folds over (default: 1)
+            resume (bool): reuse folds of an interrupted run (default: False)
+            cache_dir (Path): result cache shared by experiments (default: None, resultdir/cache/results)
+            use_cache (bool): look up and store results in the result cache (default: True)
+            n_cores (int): total core budget (default: None, all available cores)
+            threads_per_job (int): native (BLAS) threads per worker (default: None, n_cores split over the workers)
+            batched (bool): fit all outer folds of single candidate linear models in one batch (default: False)
+        Returns:
+            results (ExperimentResults): results of the experiment
+        """
         self.data_wrangler.prepare_data()
-        self.data_wrangler.save_data(self.resultdir, self.name)
-
         data = self.data_wrangler.get_data()
 
+        for path in prune_cache(self.resultdir / "cache" / "preprocessing"):
+            print(f"Removed preprocessing cache of other code version {path.name}")
+
+        store = ResultStore(self.resultdir, self.name)
+        store.save_data(data)
+
+        # generate all splits once, every workflow uses the same outer and inner folds
         cv_inner = self.cv.generate_inner()
-        cv_outer = self.cv.generate_outer()
-        trainer = Trainer()
+        cv_outer = self.cv.materialize(data, "chron_age_group", self.resultdir / "splits")
+        cache = ResultCache(cache_dir if cache_dir is not None else self.resultdir / "cache" / "results")
+        results = {}
+        keys = {}
+        for workflow in self.workflows:
+            keys[workflow.name] = ResultCache.key(data, cv_outer.key, workflow, "chron_age_group", "chron_age", batched=batched)
+            cached = cache.get(keys[workflow.name], workflow.name) if use_cache else None
+            if cached is not None:
+                print(f"Workflow {workflow.name}: using cached results {keys[workflow.name][:16]}")
+                results[workflow.name] = cached
+
+        # all (workflow, outer fold) tasks of the remaining workflows share one pool
+        pending = [workflow for workflow in self.workflows if workflow.name not in results]
+        if pending:
+            timings = TaskTimings(self.resultdir / "timings.json")
+            trainer = Trainer()
+            trained = trainer.train_many(data=data,
+                                         strat_col="chron_age_group",
+                                         label_col="chron_age",
+                                         cv_inner=cv_inner,
+                                         cv_outer=cv_outer,
+                                         workflows=pending,
+                                         n_jobs=n_jobs,
+                                         fold_jobs=fold_jobs,
+                                         checkpoint_dir=self.resultdir / "checkpoints" / self.name,
+                                         resume=resume,
+                                         timings=timings,
+                                         budget=ThreadBudget(n_jobs, fold_jobs, n_cores, threads_per_job),
+                                         batched=batched)
+            timings.save()
+            for workflow, workflow_results in zip(pending, trained):
+                if use_cache:
+                    cache.put(keys[workflow.name], workflow_results)
+                results[workflow.name] = workflow_results
+
         self.results = []
         for workflow in self.workflows:
-            workflow_results = trainer.train(data=data,
-                                             strat_col="chron_age_group",
-                                             label_col="chron_age",
-                                             cv_inner=cv_inner,
-                                             cv_outer=cv_outer,
-                                             workflow=workflow,
-                                             n_jobs=n_jobs)   
-            workflow_results.save(self.resultdir,self.name)
-            self.results.append(workflow_results)
+            store.save(results[workflow.name])
+            self.results.append(results[workflow.name])
         return ExperimentResults(self.name, data, self.results, self.resultdir)
     
     def load(self):
+        """ Load the results of a previous run from the result store (or from the csv/xlsx files
+        of runs before the result store existed)."""
+        store = ResultStore(self.resultdir, self.name)
+        stored = set(store.workflows())
         self.results = []
         for workflow in self.workflows:
-            workflow_results = WorkflowResults.load(self.resultdir, self.name, workflow.name)
+            if workflow.name in stored:
+                workflow_results = store.load(workflow.name)
+            elif (self.resultdir / f"{self.name}_{workflow.name}_results.csv").exists():
+                workflow_results = WorkflowResults.load(self.resultdir, self.name, workflow.name)
+            else:
+                raise FileNotFoundError(f"No results of workflow '{workflow.name}' in {self.resultdir} "
+                                        f"(neither in the result store nor as csv files), run the experiment first.")
             self.results.append(workflow_results)
-        data = pd.read_excel(self.resultdir / f"prepared_data_{self.name}.xlsx")
+        if store.data_file.exists():
+            # index (pet_id) as column, as in the xlsx files
+            data = store.load_data().reset_index()
+        else:
+            data = pd.read_excel(self.resultdir / f"prepared_data_{self.name}.xlsx")
         return ExperimentResults(self.name, data, self.results, self.resultdir)
         
 
@@ -139,19 +209,36 @@ class ExperimentResults():
         self.model_names = [workflow.model_name for workflow in self.results]
         
     def _compress_predictions(self,results: list[WorkflowResults]):
-        pipeline_predictions = [result.results for result in results]
-        
-        for i, pipeline in enumerate(pipeline_predictions):
-            # rename columns [pred] to [pred_pipeline]
-            pipeline_predictions[i] = pipeline.rename(columns={'pred': f'{self.workflow_names[i]}', 'index':'subject_id', 'true':'true'})
-            # drop column [std]
-            pipeline_predictions[i] = pipeline_predictions[i].drop(columns=['std'])
-
-        merged = pipeline_predictions[0] # start with the first dataframe in the list
-        for i in range(1, len(pipeline_predictions)):
-            merged = pd.merge(merged, pipeline_predictions[i], on=['true', 'subject_id', 'fold'])
-        
-        self.predictions = merged
+        """ Build the wide prediction matrix (one row per subject and fold, one column per workflow)
+        in one aligned operation on an integer (subject, fold) key. Rows missing in any workflow
+        are dropped. self.prediction_matrix holds the workflow columns as a float array (n_rows x
+        n_workflows), which self.predictions is built on without a copy."""
+        # integer keys shared by all workflows
+        subject_codes, subjects = pd.factorize(np.concatenate([result.results['index'].to_numpy() for result in results]))
+        folds = [result.results['fold'].to_numpy().astype(np.int64) for result in results]
+        n_folds = max(fold.max() for fold in folds) + 1
+        offsets = np.cumsum([0] + [len(result.results) for result in results])
+        keys = [subject_codes[offsets[i]:offsets[i + 1]] * n_folds + folds[i] for i in range(len(results))]
+
+        # rows in the order of the first workflow, each workflow scattered into its column
+        row_keys = pd.Index(keys[0])
+        matrix = np.full((len(row_keys), len(results)), np.nan)
+        present = np.zeros(matrix.shape, dtype=bool)
+        for i, result in enumerate(results):
+            rows = row_keys.get_indexer(keys[i])
+            found = rows >= 0
+            matrix[rows[found], i] = result.results['pred'].to_numpy()[found]
+            present[rows[found], i] = True
+        keep = present.all(axis=1)
+        if not keep.all():
+            matrix = matrix[keep]
+
+        first = results[0].results[keep] if not keep.all() else results[0].results
+        self.prediction_matrix = matrix
+        self.predictions = pd.DataFrame(matrix, columns=self.workflow_names, copy=False)
+        self.predictions.insert(0, 'subject_id', subjects.take(subject_codes[:offsets[1]][keep]))
+        self.predictions.insert(1, 'fold', first['fold'].to_numpy())
+        self.predictions.insert(2, 'true', first['true'].to_numpy())
 
     def get_workflow_results(self, result_type: str, worflow_name: str = None):
         if result_type == 'predictions':
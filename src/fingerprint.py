@@ -0,0 +1,93 @@
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from joblib import Memory
+
+
+def describe(obj):
+    """Describe an object (estimators, configs, arrays) by plain, json-serializable values.
+    Estimators are described by their class and (recursively) their parameters, so two
+    unfitted estimators with the same parameters get the same description.
+    Args:
+        obj: object to describe
+    Returns:
+        description (dict, list, str, int, float, bool or None)
+    """
+    if obj is None or isinstance(obj, (str, bool, int, float)):
+        return obj
+    if isinstance(obj, Memory):
+        # caches (of pipelines and ensembles) do not change results
+        return None
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (list, tuple)):
+        return [describe(item) for item in obj]
+    if isinstance(obj, dict):
+        return {str(key): describe(value) for key, value in sorted(obj.items(), key=lambda item: str(item[0]))}
+    if isinstance(obj, type) or (callable(obj) and hasattr(obj, '__qualname__')):
+        return f"{obj.__module__}.{obj.__qualname__}"
+    if hasattr(obj, 'get_params'):
+        return {'class': type(obj).__name__, 'params': describe(obj.get_params(deep=False))}
+    if hasattr(obj, '__dict__'):
+        return {'class': type(obj).__name__, 'attrs': describe(vars(obj))}
+    return repr(obj)
+
+
+def hash_object(obj) -> str:
+    """Get a stable hash of an object from its description.
+    Args:
+        obj: object to hash
+    Returns:
+        hash (str): hex digest
+    """
+    description = json.dumps(describe(obj), sort_keys=True)
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+
+def hash_frame(df: pd.DataFrame) -> str:
+    """Get a stable hash of the content (values, index, columns and dtypes) of a dataframe.
+    Args:
+        df (pd.DataFrame): dataframe to hash
+    Returns:
+        hash (str): hex digest
+    """
+    sha = hashlib.sha1()
+    sha.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    sha.update(json.dumps([str(col) for col in df.columns]).encode('utf-8'))
+    sha.update(json.dumps([str(dtype) for dtype in df.dtypes]).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def hash_arrays(arrays: list) -> str:
+    """Get a stable hash of a list of numpy arrays (e.g. split indices).
+    Args:
+        arrays (list[np.ndarray]): arrays to hash
+    Returns:
+        hash (str): hex digest
+    """
+    sha = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        sha.update(str((array.dtype.str, array.shape)).encode('utf-8'))
+        sha.update(array.tobytes())
+    return sha.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_version() -> str:
+    """Get a hash of the source files of the src package, so caches keyed on it are invalidated
+    when the code that computes the cached results changes.
+    Returns:
+        hash (str): hex digest
+    """
+    sha = hashlib.sha1()
+    package = Path(__file__).parent
+    for path in sorted(package.rglob('*.py')):
+        sha.update(path.relative_to(package).as_posix().encode('utf-8'))
+        sha.update(path.read_bytes())
+    return sha.hexdigest()
@@ -1,11 +1,6 @@
-from sklearn.linear_model import BayesianRidge, ARDRegression
-from sklearn.gaussian_process import GaussianProcessRegressor
-from sklearn.svm import LinearSVR
-from xgboost import XGBRegressor
-from sklearn.dummy import DummyRegressor
-
-from src.config_handler import read_yaml, get_entry
+from src.config_handler import read_config, get_entry
 from src.step_factory import StepFactory
+from src.search import SUPPORTED_SEARCH, get_strategy
 
 class ModelRepresentation():
     """
@@ -23,15 +18,44 @@ class ModelRepresentation():
         An instance of the model.
     paramgrid : dict
         A dictionary of hyperparameters to be tuned during GridSearchCV.
+    search : str
+        The search strategy used to tune the hyperparameters (see src.search). Default is 'grid'.
     """
-    def __init__(self, name, model, paramgrid):
+    def __init__(self, name, model, paramgrid, search='grid'):
         self.name = name
         self.model = model
         self.paramgrid = paramgrid
+        self.search = search
 
     def __call__(self) -> tuple:
         return ('model', self.model)
     
+def validate_model_config(config: dict, config_file: str = None):
+    """
+    Checks that every model of a model configuration has a step name, a paramgrid mapping (and
+    kwargs as mapping and a supported search strategy, if given).
+
+    Parameters:
+    -----------
+    config : dict
+        The parsed configuration.
+    config_file : str, optional
+        The path of the configuration file (for error messages).
+    """
+    if not isinstance(config, dict):
+        raise ValueError(f"Model configuration {config_file} is not a mapping of models.")
+    for name, model_config in config.items():
+        if not isinstance(model_config, dict) or 'name' not in model_config or 'paramgrid' not in model_config:
+            raise ValueError(f"Model '{name}' in {config_file} needs 'name' and 'paramgrid'.")
+        if not isinstance(model_config['paramgrid'], dict):
+            raise ValueError(f"Paramgrid of model '{name}' in {config_file} is not a mapping.")
+        if not isinstance(model_config.get('kwargs') or {}, dict):
+            raise ValueError(f"Kwargs of model '{name}' in {config_file} are not a mapping.")
+        strategy, _ = get_strategy(model_config.get('search', 'grid'))
+        if strategy not in SUPPORTED_SEARCH:
+            raise ValueError(f"Search strategy '{strategy}' of model '{name}' in {config_file} not recognized. Use one of {SUPPORTED_SEARCH}.")
+
+
 class ModelBuilder(): 
     """
     Class for building machine learning models.
@@ -53,8 +77,9 @@ class ModelBuilder():
         model : ModelRepresentation
             A ModelRepresentation object.
         """
-        config = read_yaml(config_file)
+        config = read_config(config_file, validate=validate_model_config)
         model_config = get_entry(config, name)
         (_, model) = StepFactory.create_step(model_config)
         paramgrid = get_entry(model_config, 'paramgrid')
-        return ModelRepresentation(name, model, paramgrid)
+        search = model_config.get('search', 'grid')
+        return ModelRepresentation(name, model, paramgrid, search)
@@ -1,17 +1,19 @@
 import numpy as np
 from scipy.stats import norm
 from scipy import interpolate
-from statsmodels.distributions.empirical_distribution import ECDF
 
 def estimate_params(values):
     """
-    Estimate parameters of a gaussian distribution from values.
+    Estimate parameters of a gaussian distribution from values (maximum likelihood, as norm.fit).
+    For a 2-D array (rows x columns) the parameters of all columns are estimated at once.
     args:
         values: values to estimate parameters from
     returns:
-        dict of (mu,std) of the distribution
+        dict of (mu,std) of the distribution (arrays with one entry per column for 2-D values)
     """
-    mu, std = norm.fit(values)
+    values = np.asarray(values, dtype=float)
+    mu = values.mean(axis=0)
+    std = np.sqrt(((values - mu) ** 2).mean(axis=0))
     return {"mu": mu, "std": std}
 
 def estimate_ecdf(values):
@@ -22,6 +24,8 @@ def estimate_ecdf(values):
     returns:
         dict of (x,y) of the empirical distribution
     """
+    # statsmodels is slow to import and only needed here
+    from statsmodels.distributions.empirical_distribution import ECDF
     ecdf = ECDF(values)
     return {"x": ecdf.x, "y": ecdf.y}
 
@@ -96,3 +100,22 @@ def transform_nodim(param1, param2, values):
 
     # apply nodim to values
     return nodim(values)
+
+def transform_nodim_analytic(param1, param2, values):
+    """
+    Apply Nonlinear Distritbution Mapping (NODIM) between two gaussian distributions in closed form.
+    For gaussians the quantile mapping reduces to mu2 + std2 * (x - mu1) / std1, which is exact and
+    defined on the full real line. Parameters can be arrays with one entry per column, so all columns
+    of a 2-D array (rows x columns) are mapped at once.
+    args:
+        param1: dict of (mu,std) of the first distribution (from), scalars or arrays of length n_columns
+        param2: dict of (mu,std) of the second distribution (to), scalars or arrays of length n_columns
+        values: values to be transformed (from), 1-D array or 2-D array (rows x columns)
+    returns:
+        transformed values
+    """
+    mu1 = np.asarray(param1["mu"], dtype=float)
+    std1 = np.asarray(param1["std"], dtype=float)
+    mu2 = np.asarray(param2["mu"], dtype=float)
+    std2 = np.asarray(param2["std"], dtype=float)
+    return mu2 + std2 * (np.asarray(values, dtype=float) - mu1) / std1
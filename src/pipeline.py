@@ -1,5 +1,5 @@
 #%%
-from src.config_handler import read_yaml, get_entry
+from src.config_handler import read_config, get_entry
 from src.step_factory import StepFactory          
 
 
@@ -39,6 +39,32 @@ class PipelineRepresentation():
         self.description = description
         self.steps = steps
     
+def validate_pipeline_config(config: dict, config_file: str = None):
+    """
+    Checks that every pipeline of a pipeline configuration has a description and a list of steps
+    with a name (and kwargs as mapping, if given).
+
+    Parameters:
+    -----------
+    config : dict
+        The parsed configuration.
+    config_file : str, optional
+        The path of the configuration file (for error messages).
+    """
+    if not isinstance(config, dict):
+        raise ValueError(f"Pipeline configuration {config_file} is not a mapping of pipelines.")
+    for name, pipeline_config in config.items():
+        if not isinstance(pipeline_config, dict) or 'descr' not in pipeline_config or 'steps' not in pipeline_config:
+            raise ValueError(f"Pipeline '{name}' in {config_file} needs 'descr' and 'steps'.")
+        if not isinstance(pipeline_config['steps'], list):
+            raise ValueError(f"Steps of pipeline '{name}' in {config_file} are not a list.")
+        for step_config in pipeline_config['steps']:
+            if not isinstance(step_config, dict) or 'name' not in step_config:
+                raise ValueError(f"Step {step_config} of pipeline '{name}' in {config_file} has no name.")
+            if not isinstance(step_config.get('kwargs', {}), dict):
+                raise ValueError(f"Kwargs of step '{step_config['name']}' of pipeline '{name}' in {config_file} are not a mapping.")
+
+
 class PipelineBuilder:
     """
     A class that builds a PipelineRepresentation based on a configuration file.
@@ -60,7 +86,7 @@ class PipelineBuilder:
         pipeline : PipelineRepresentation object
             The built pipeline object.
         """
-        config = read_yaml(config_file)
+        config = read_config(config_file, validate=validate_pipeline_config)
         pipeline_config = get_entry(config, name)
         description = get_entry(pipeline_config, 'descr')
         step_configs = get_entry(pipeline_config, 'steps')
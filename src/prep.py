@@ -6,7 +6,7 @@ from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import logging
 
 # %% binning
-def bin_data(df, col_name, min_val=0.0, max_val=100.0, step=2.5):
+def bin_data(df, col_name, min_val=0.0, max_val=100.0, step=2.5, categorical=False):
     """Bin data into bins of size step from min_val to max_val.
     Args:
         df (pd.DataFrame): dataframe to bin
@@ -14,12 +14,22 @@ def bin_data(df, col_name, min_val=0.0, max_val=100.0, step=2.5):
         min_val (float): minimum value of bins
         max_val (float): maximum value of bins
         step (float): size of bins
+        categorical (bool): if True, the binned column is categorical (same labels, values outside
+            of the bins are missing instead of 'nan'), default False
     Returns:
         df (pd.DataFrame): dataframe with binned column
     """
     # define bins from min_val to max_val in steps of step
     bins = np.arange(min_val, max_val + 2 * step, step)
 
+    if categorical:
+        # bins are left-closed as for pd.cut(right=False), -1 marks values outside of the bins
+        codes = np.digitize(df[col_name].to_numpy(dtype=float), bins) - 1
+        codes[(codes < 0) | (codes >= len(bins) - 1)] = -1
+        categories = [str(label) for label in bins[:-1]]
+        df[col_name + "_group"] = pd.Categorical.from_codes(codes, categories=categories)
+        return df
+
     # divide into bins
     df[col_name + "_group"] = pd.cut(
         df[col_name], bins=list(bins), labels=bins[:-1], right=False
@@ -28,43 +38,51 @@ def bin_data(df, col_name, min_val=0.0, max_val=100.0, step=2.5):
     return df
 
 
-def get_subsample(df, cat_col, sample_col, match_nsamples=True):
-    """Get subsample of df with cat_col==cat_val and sample_col==sample_val.
+def get_subsample_index(df, cat_col, sample_col, match_nsamples=True, random_state=None):
+    """Get row positions of a subsample of df where the bins of sample_col are matched between the categories.
+    All bins are drawn in one pass: every candidate row of the other category gets a random key and the
+    rows with the lowest keys per bin are kept, up to the number of samples of cat_col in that bin.
     Args:
         df (pd.DataFrame): dataframe to subsample
         cat_col (str): name of categorical column
         sample_col (str): name of column to sample
         match_nsamples (bool): if True, match number of samples in each bin, default True
+        random_state (int, np.random.Generator or None): seed or generator for the draw, default None
     Returns:
-        df (pd.DataFrame): subsampled dataframe
+        index (np.ndarray): sorted positional row index of the subsample
     """
+    is_cat = df[cat_col].to_numpy(dtype=bool)
+    groups = df[sample_col].to_numpy()
+
     # get age range values
-    sample_vals = df[df[cat_col] == True][sample_col].unique()
+    samples_count = pd.Series(groups[is_cat]).value_counts()
+    in_range = pd.Series(groups).isin(samples_count.index).to_numpy()
 
     # match number of samples
-    if match_nsamples:
-        # get number of samples per age range
-        samples_count = df[df[cat_col] == True][sample_col].value_counts()
+    if not match_nsamples:
+        return np.flatnonzero(in_range)
 
-        # subsample from each age range to match the number of samples in the coresponding group
-        matched = pd.DataFrame()
-        for group in sample_vals:
-            n_samples = samples_count.loc[group]
-            # get subsample from other group
-            df_sub = df[(df[cat_col] == False) & (df[sample_col] == group)]
+    # subsample from each age range to match the number of samples in the coresponding group
+    rng = np.random.default_rng(random_state)
+    other = np.flatnonzero(~is_cat & in_range)
+    keys = pd.Series(rng.random(len(other)))
+    rank = keys.groupby(groups[other]).rank(method="first").to_numpy()
+    keep = rank <= samples_count.reindex(groups[other]).to_numpy()
 
-            if len(df_sub) < n_samples:
-                subsample = df_sub
-            else:
-                subsample = df_sub.sample(n_samples)
-            # append to matched
-            matched = pd.concat([matched, subsample])
+    # append original group
+    return np.sort(np.concatenate([other[keep], np.flatnonzero(is_cat)]))
 
-        # append original group
-        df_sampled = pd.concat([matched, df[df[cat_col] == True]])
-
-    else:
-        df_sampled = df[df[sample_col].isin(sample_vals)]
-
-    return df_sampled
 
+def get_subsample(df, cat_col, sample_col, match_nsamples=True, random_state=None):
+    """Get subsample of df with cat_col==cat_val and sample_col==sample_val.
+    Args:
+        df (pd.DataFrame): dataframe to subsample
+        cat_col (str): name of categorical column
+        sample_col (str): name of column to sample
+        match_nsamples (bool): if True, match number of samples in each bin, default True
+        random_state (int, np.random.Generator or None): seed or generator for the draw, default None
+    Returns:
+        df (pd.DataFrame): subsampled dataframe
+    """
+    index = get_subsample_index(df, cat_col, sample_col, match_nsamples=match_nsamples, random_state=random_state)
+    return df.iloc[index]
@@ -0,0 +1,128 @@
+import os
+import pickle
+from pathlib import Path
+
+import pandas as pd
+from sklearn.base import clone
+
+from src.fingerprint import hash_object, hash_frame, code_version
+from src.batched import supports_batched
+from src.workflow import WorkflowResults, WorkflowRepresentation
+
+
+class ResultCache():
+    """
+    Content-addressed on-disk cache of WorkflowResults, shared by all experiments.
+
+    A result is stored under a key computed from the prepared data, the CV specification (the key of
+    the materialized splits), the configuration of the workflow (fitted steps, model, paramgrid
+    and search), whether its folds are fit in one batch and the source code of the package
+    (src.fingerprint.code_version), so identical workflows of different experiments are computed
+    once, a changed model only invalidates its own results and a change of the code invalidates all.
+
+    Attributes:
+    -----------
+    directory : Path
+        The directory the results are stored in.
+    """
+    def __init__(self, directory: Path):
+        """
+        Parameters:
+        -----------
+        directory : Path
+            The directory the results are stored in.
+        """
+        self.directory = Path(directory)
+
+    @staticmethod
+    def key(data: pd.DataFrame, cv_key: str, workflow: WorkflowRepresentation, strat_col: str, label_col: str,
+            batched: bool = False) -> str:
+        """
+        Computes the key of the results of a workflow.
+
+        Parameters:
+        -----------
+        data : pd.DataFrame
+            The prepared data.
+        cv_key : str
+            The fingerprint of the CV specification (SplitStore.key).
+        workflow : WorkflowRepresentation
+            The workflow.
+        strat_col : str
+            The name of the column the outer splits are stratified on.
+        label_col : str
+            The name of the label column.
+        batched : bool, optional
+            Whether the run fits single candidate linear models on all outer folds in one batch.
+            Default is False.
+
+        Returns:
+        --------
+        key : str
+            The key of the results.
+        """
+        return hash_object({
+            "data": hash_frame(data),
+            "cv": cv_key,
+            "strat_col": strat_col,
+            "label_col": label_col,
+            # the preprocessing cache does not change results
+            "pipeline": clone(workflow.pipeline).set_params(memory=None),
+            "paramgrid": workflow.paramgrid,
+            "search": workflow.search,
+            # only workflows the batched engine supports are fit differently
+            "batched": bool(batched and supports_batched(workflow)),
+            "code": code_version(),
+        })
+
+    def get(self, key: str, workflow_name: str) -> WorkflowResults:
+        """
+        Gets cached results (None if missing or unreadable).
+
+        Parameters:
+        -----------
+        key : str
+            The key of the results.
+        workflow_name : str
+            The name the results are returned under.
+
+        Returns:
+        --------
+        results : WorkflowResults or None
+            The cached results.
+        """
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'rb') as f:
+                cached = pickle.load(f)
+        except Exception:
+            print(f"Cached result {path.name} could not be read, recomputing")
+            return None
+        return WorkflowResults(workflow_name, cached.scores, cached.results, cached.best_params, cached.weights,
+                               n_fits=cached.n_fits)
+
+    def put(self, key: str, results: WorkflowResults):
+        """
+        Stores results (written to a temporary file first, so readers never see partial results).
+
+        Parameters:
+        -----------
+        key : str
+            The key of the results.
+        results : WorkflowResults
+            The results to store.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pkl"
@@ -0,0 +1,176 @@
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.workflow import WorkflowResults
+
+TABLES = ['predictions', 'scores', 'best_params', 'weights']
+
+
+class ResultStore():
+    """
+    Columnar (parquet) store of the results of one experiment.
+
+    Each result table (predictions, scores, best_params, weights) is a hive-partitioned dataset with
+    one partition per workflow (<table>/workflow=<name>/part-0.parquet), so reading the predictions of
+    one workflow only touches that partition and the requested columns. Best params are stored as
+    json strings and weights in long format (row, feature, weight), as their columns differ between
+    workflows. The prepared data is stored next to it as a single parquet file.
+
+    Attributes:
+    -----------
+    directory : Path
+        The directory of the store.
+    """
+    def __init__(self, result_dir: Path, experiment: str):
+        """
+        Parameters:
+        -----------
+        result_dir : Path
+            The result directory.
+        experiment : str
+            The name of the experiment.
+        """
+        self.directory = Path(result_dir) / f"{experiment}_results"
+        self.data_file = Path(result_dir) / f"prepared_data_{experiment}.parquet"
+
+    def exists(self) -> bool:
+        return (self.directory / 'predictions').exists()
+
+    def workflows(self) -> list:
+        """The names of the stored workflows."""
+        directory = self.directory / 'predictions'
+        if not directory.exists():
+            return []
+        return sorted(path.name.split('=', 1)[1] for path in directory.glob('workflow=*'))
+
+    def save(self, results: WorkflowResults):
+        """
+        Saves (replaces) the results of a workflow.
+
+        Parameters:
+        -----------
+        results : WorkflowResults
+            The results to save.
+        """
+        tables = {
+            'predictions': results.results.reset_index(drop=True),
+            'scores': results.scores.rename_axis('row').reset_index(),
+            'best_params': self._encode_params(results.best_params),
+            'weights': self._encode_weights(results.weights),
+        }
+        for table, df in tables.items():
+            partition = self._partition(table, results.name)
+            if partition.exists():
+                shutil.rmtree(partition)
+            partition.mkdir(parents=True)
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), partition / 'part-0.parquet')
+
+    def read(self, table: str, columns: list = None, workflows: list = None, filter=None) -> pd.DataFrame:
+        """
+        Reads a result table with column projection and predicate pushdown.
+
+        Parameters:
+        -----------
+        table : str
+            The name of the table (predictions, scores, best_params or weights).
+        columns : list, optional
+            The columns to read. Default is None (all columns).
+        workflows : list, optional
+            The workflows to read. Default is None (all workflows).
+        filter : pyarrow.dataset.Expression, optional
+            An additional row filter, e.g. ds.field('fold') <= 5. Default is None.
+
+        Returns:
+        --------
+        df : pd.DataFrame
+            The table, with a 'workflow' column.
+        """
+        if table not in TABLES:
+            raise ValueError(f"Table '{table}' not recognized. Use one of {TABLES}.")
+        dataset = ds.dataset(
+            self.directory / table, format='parquet',
+            partitioning=ds.partitioning(pa.schema([('workflow', pa.string())]), flavor='hive'),
+        )
+        expression = filter
+        if workflows is not None:
+            selection = ds.field('workflow').isin(list(workflows))
+            expression = selection if expression is None else expression & selection
+        if columns is not None and 'workflow' not in columns:
+            columns = list(columns) + ['workflow']
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+    def load(self, workflow_name: str) -> WorkflowResults:
+        """
+        Loads the results of a workflow.
+
+        Parameters:
+        -----------
+        workflow_name : str
+            The name of the workflow.
+
+        Returns:
+        --------
+        results : WorkflowResults
+            The results of the workflow.
+        """
+        tables = {}
+        for table in TABLES:
+            df = pq.read_table(self._partition(table, workflow_name) / 'part-0.parquet').to_pandas()
+            tables[table] = df
+        scores = tables['scores'].set_index('row').rename_axis(None)
+        best_params = self._decode_params(tables['best_params'])
+        weights = self._decode_weights(tables['weights'])
+        return WorkflowResults(workflow_name, scores, tables['predictions'], best_params, weights)
+
+    def save_data(self, data: pd.DataFrame):
+        """Saves the prepared data (with its index)."""
+        self.data_file.parent.mkdir(parents=True, exist_ok=True)
+        data.to_parquet(self.data_file)
+
+    def load_data(self, columns: list = None) -> pd.DataFrame:
+        """Loads the prepared data, optionally only some columns."""
+        return pd.read_parquet(self.data_file, columns=columns)
+
+    def _partition(self, table: str, workflow_name: str) -> Path:
+        return self.directory / table / f"workflow={workflow_name}"
+
+    @staticmethod
+    def _encode_params(best_params: pd.DataFrame) -> pd.DataFrame:
+        """One json string of the parameters per row (a column of parameter dicts, as returned by the
+        Trainer, or one column per parameter)."""
+        params = []
+        for _, row in best_params.iterrows():
+            value = row.iloc[0] if len(row) == 1 and isinstance(row.iloc[0], dict) else row.to_dict()
+            params.append(json.dumps(value, sort_keys=True, default=repr))
+        return pd.DataFrame({'row': np.arange(len(best_params)), 'params': params})
+
+    @staticmethod
+    def _decode_params(df: pd.DataFrame) -> pd.DataFrame:
+        """Best params as in Trainer results (one column of parameter dicts)."""
+        params = np.empty(len(df), dtype=object)
+        params[:] = [json.loads(value) for value in df.sort_values('row')['params']]
+        return pd.DataFrame(params)
+
+    @staticmethod
+    def _encode_weights(weights: pd.DataFrame) -> pd.DataFrame:
+        """Weights in long format (row, feature, weight), keeping the feature order."""
+        n_rows, n_features = weights.shape
+        return pd.DataFrame({
+            'row': np.repeat(np.arange(n_rows), n_features),
+            'feature': np.tile(np.asarray(weights.columns, dtype=str), n_rows),
+            'weight': weights.to_numpy(dtype=float).ravel(),
+        })
+
+    @staticmethod
+    def _decode_weights(df: pd.DataFrame) -> pd.DataFrame:
+        """Weights in wide format (one row per fold, one column per feature)."""
+        features = pd.unique(df['feature'])
+        n_rows = df['row'].max() + 1 if len(df) else 0
+        return pd.DataFrame(df['weight'].to_numpy().reshape(n_rows, len(features)), columns=features)
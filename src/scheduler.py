@@ -0,0 +1,127 @@
+import json
+import os
+from pathlib import Path
+
+from sklearn.model_selection import ParameterGrid
+
+from src.search import get_strategy
+
+# rough seconds per fit of each model family (final step of the pipeline) for a few hundred
+# scans, used for workflows without recorded timings
+FAMILY_COST = {
+    'DummyRegressor': 0.001,
+    'Pyment': 0.001,
+    'BayesianRidge': 0.01,
+    'Ridge': 0.005,
+    'ARDRegression': 0.05,
+    'LinearSVR': 0.01,
+    'XGBRegressor': 0.2,
+    'GaussianProcessRegressor': 0.1,
+    'StackingRegressor': 0.2,
+    'CachedStackingRegressor': 0.2,
+}
+
+
+class TaskTimings():
+    """
+    Seconds per model fit of each workflow, recorded on previous runs and stored as json.
+
+    Attributes:
+    -----------
+    path : Path
+        The json file the timings are stored in.
+    """
+    def __init__(self, path: Path):
+        """
+        Parameters:
+        -----------
+        path : Path
+            The json file the timings are stored in (read if it exists).
+        """
+        self.path = Path(path)
+        self._seconds_per_fit = {}
+        if self.path.exists():
+            try:
+                self._seconds_per_fit = json.loads(self.path.read_text())
+            except ValueError:
+                print(f"Timings {self.path.name} could not be read, starting over")
+
+    def get(self, workflow_name: str) -> float:
+        """Seconds per fit of a workflow (None if never recorded)."""
+        return self._seconds_per_fit.get(workflow_name)
+
+    def record(self, workflow_name: str, seconds: float, n_fits: int):
+        """Record the time a workflow spent on n_fits fits."""
+        if n_fits > 0:
+            self._seconds_per_fit[workflow_name] = seconds / n_fits
+
+    def save(self):
+        """Write the timings (through a temporary file)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(self._seconds_per_fit, indent=4, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+
+def expected_fits(workflow, cv_inner) -> int:
+    """
+    Expected number of model fits of a workflow on one outer fold (see src.search.count_fits).
+
+    Parameters:
+    -----------
+    workflow : WorkflowRepresentation
+        The workflow.
+    cv_inner : scikit-learn CV object
+        The inner CV of the outer fold.
+
+    Returns:
+    --------
+    n_fits : int
+        The expected number of fits.
+    """
+    candidates = ParameterGrid(workflow.paramgrid)
+    if len(candidates) == 1:
+        return 1
+    n_splits = cv_inner.get_n_splits()
+    strategy, kwargs = get_strategy(workflow.search)
+    if strategy == 'sequential':
+        return min(kwargs.get('n_iter', 20), len(candidates)) * n_splits + 1
+    elif strategy == 'halving':
+        # the candidates are cut by factor per iteration on growing resources, roughly half the grid cost
+        return len(candidates) * n_splits // 2 + 1
+    elif strategy == 'ridgepath':
+        # one decomposition per candidate of the parameters other than alpha, per split with preprocessing
+        paths = {tuple(sorted((k, repr(v)) for k, v in params.items() if not k.endswith('alpha'))) for params in candidates}
+        if len(workflow.pipeline.steps) > 1:
+            return len(paths) * n_splits + 1
+        return len(paths) + 1
+    elif strategy == 'gpr':
+        # one eigendecomposition per kernel candidate, alpha is free
+        kernels = {tuple(sorted((k, repr(v)) for k, v in params.items() if not k.endswith('alpha'))) for params in candidates}
+        return len(kernels) * n_splits + 1
+    return len(candidates) * n_splits + 1
+
+
+def estimate_cost(workflow, cv_inner, timings: TaskTimings = None) -> float:
+    """
+    Expected cost (seconds) of one outer fold of a workflow: the expected number of fits times the
+    seconds per fit recorded on previous runs, or else the rough cost of the model family.
+
+    Parameters:
+    -----------
+    workflow : WorkflowRepresentation
+        The workflow.
+    cv_inner : scikit-learn CV object
+        The inner CV of the outer fold.
+    timings : TaskTimings, optional
+        Timings of previous runs. Default is None.
+
+    Returns:
+    --------
+    cost : float
+        The expected cost in seconds.
+    """
+    seconds_per_fit = timings.get(workflow.name) if timings is not None else None
+    if seconds_per_fit is None:
+        seconds_per_fit = FAMILY_COST.get(type(workflow.pipeline[-1]).__name__, 0.1)
+    return expected_fits(workflow, cv_inner) * seconds_per_fit
@@ -0,0 +1,208 @@
+import warnings
+import numpy as np
+from scipy.stats import norm
+from sklearn.base import BaseEstimator, clone
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.model_selection import GridSearchCV, ParameterGrid, check_cv, cross_val_score
+
+# the search objects of the other strategies (and the gaussian process surrogate) are imported when
+# they are used, so importing this module (and src.model_builder) stays cheap
+
+SUPPORTED_SEARCH = ['grid', 'gpr', 'halving', 'sequential', 'ridgepath']
+
+
+class SequentialSearchCV(BaseEstimator):
+    """ Sequential model-based search over a parameter grid with a fixed evaluation budget.
+    After n_initial random candidates, a gaussian process surrogate is fitted to the scores seen so
+    far and the candidate with the highest expected improvement is evaluated next, until n_iter
+    candidates have been scored with the inner CV."""
+    def __init__(self, estimator, param_grid, cv=5, n_iter=20, n_initial=5, random_state=None, n_jobs=1, refit=True):
+        """ Initialize the search.
+        Args:
+            estimator (sklearn.pipeline.Pipeline): pipeline to tune
+            param_grid (dict): parameter grid, as for GridSearchCV
+            cv (int or sklearn.model_selection._split): inner cross-validation
+            n_iter (int): number of candidates to evaluate (budget), default 20
+            n_initial (int): number of random candidates before using the surrogate, default 5
+            random_state (int): seed for the initial candidates, default None
+            n_jobs (int): number of jobs for cross-validation, default 1
+            refit (bool): refit the best candidate on all data, default True"""
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.n_iter = n_iter
+        self.n_initial = n_initial
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        self.refit = refit
+
+    def fit(self, X, y):
+        """ Evaluate candidates with neg. mean absolute error and refit the best one.
+        Args:
+            X (pd.DataFrame): training data
+            y (pd.Series): target variable"""
+        from sklearn.gaussian_process import GaussianProcessRegressor
+        from sklearn.gaussian_process.kernels import ConstantKernel, Matern, WhiteKernel
+        candidates = list(ParameterGrid(self.param_grid))
+        encoded = self._encode(candidates)
+        budget = min(self.n_iter, len(candidates))
+        rng = np.random.default_rng(self.random_state)
+        cv = check_cv(self.cv)
+
+        evaluated = list(rng.choice(len(candidates), size=min(self.n_initial, budget), replace=False))
+        scores = [self._score(candidates[i], X, y, cv) for i in evaluated]
+        while len(evaluated) < budget:
+            remaining = np.setdiff1d(np.arange(len(candidates)), evaluated)
+            surrogate = GaussianProcessRegressor(
+                kernel=ConstantKernel() * Matern(nu=2.5) + WhiteKernel(), normalize_y=True, random_state=0
+            )
+            with warnings.catch_warnings():
+                # few and noisy scores often push kernel parameters to their bounds
+                warnings.simplefilter("ignore", ConvergenceWarning)
+                surrogate.fit(encoded[evaluated], scores)
+            mu, std = surrogate.predict(encoded[remaining], return_std=True)
+            next_candidate = remaining[np.argmax(self._expected_improvement(mu, std, np.max(scores)))]
+            evaluated.append(next_candidate)
+            scores.append(self._score(candidates[next_candidate], X, y, cv))
+
+        best = int(np.argmax(scores))
+        self.best_index_ = best
+        self.best_params_ = candidates[evaluated[best]]
+        self.best_score_ = scores[best]
+        self.cv_results_ = {"params": [candidates[i] for i in evaluated], "mean_test_score": np.array(scores)}
+        self.n_splits_ = cv.get_n_splits(X, y)
+        self.n_fits_ = len(evaluated) * self.n_splits_ + int(self.refit)
+
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+            self.best_estimator_.fit(X, y)
+        return self
+
+    def _score(self, params, X, y, cv):
+        """ Mean inner CV score of a candidate."""
+        estimator = clone(self.estimator).set_params(**params)
+        return cross_val_score(estimator, X, y, cv=cv, scoring="neg_mean_absolute_error", n_jobs=self.n_jobs).mean()
+
+    def _encode(self, candidates):
+        """ Encode candidates in [0, 1] per parameter (log scale for positive numbers, rank otherwise)."""
+        keys = sorted({key for params in candidates for key in params})
+        encoded = np.zeros((len(candidates), len(keys)))
+        for j, key in enumerate(keys):
+            values = [params.get(key) for params in candidates]
+            if all(isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0 for value in values):
+                position = np.log(np.asarray(values, dtype=float))
+            else:
+                unique = list(dict.fromkeys(map(repr, values)))
+                position = np.array([unique.index(repr(value)) for value in values], dtype=float)
+            span = position.max() - position.min()
+            encoded[:, j] = (position - position.min()) / span if span > 0 else 0.0
+        return encoded
+
+    @staticmethod
+    def _expected_improvement(mu, std, best):
+        """ Expected improvement over the best score (maximization)."""
+        std = np.maximum(std, 1e-12)
+        z = (mu - best) / std
+        return (mu - best) * norm.cdf(z) + std * norm.pdf(z)
+
+
+class SearchBuilder():
+    """
+    A class for building the hyperparameter search of a workflow (inner CV).
+
+    The strategy is set with the 'search' key of a model in the model configuration file, either as
+    name (search: halving) or as mapping with the name under 'strategy' and keyword arguments for
+    the search object (search: {strategy: sequential, n_iter: 20}):
+        grid : exhaustive GridSearchCV (default)
+        gpr : GPRGridSearchCV, scores all alpha values of a GaussianProcessRegressor from one
+              eigendecomposition per kernel candidate (requires optimizer: null)
+        halving : HalvingGridSearchCV, successive halving of the candidates (kwargs: factor,
+                  resource, min_resources, ...)
+        sequential : SequentialSearchCV, model-based search with a fixed budget (kwargs: n_iter,
+                     n_initial, random_state)
+        ridgepath : RidgePathSearchCV, scores all alpha values of a Ridge model from one SVD per
+                    candidate of the other parameters (and inner split, with preprocessing)
+                    (kwargs: loo, only without preprocessing)
+    """
+    @staticmethod
+    def build(search, pipeline, paramgrid: dict, cv, n_jobs: int = 1):
+        """
+        Builds the search object.
+
+        Parameters:
+        -----------
+        search : str or dict
+            The name of the search strategy, or a dict with the name under 'strategy' and kwargs.
+        pipeline : sklearn.pipeline.Pipeline
+            The pipeline to tune.
+        paramgrid : dict
+            The parameter grid.
+        cv : scikit-learn CV object
+            The inner CV object.
+        n_jobs : int, optional
+            The number of jobs for the inner CV. Default is 1.
+
+        Returns:
+        --------
+        search : object
+            A search object with fit, best_params_ and best_estimator_.
+        """
+        strategy, kwargs = get_strategy(search)
+        if strategy == 'grid':
+            return GridSearchCV(pipeline, paramgrid, cv=cv, scoring="neg_mean_absolute_error", n_jobs=n_jobs, refit=True, **kwargs)
+        elif strategy == 'gpr':
+            from src.estimator import GPRGridSearchCV
+            return GPRGridSearchCV(pipeline, paramgrid, cv=cv, **kwargs)
+        elif strategy == 'halving':
+            from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+            from sklearn.model_selection import HalvingGridSearchCV
+            kwargs.setdefault('min_resources', 'smallest')
+            return HalvingGridSearchCV(pipeline, paramgrid, cv=cv, scoring="neg_mean_absolute_error", n_jobs=n_jobs, refit=True, **kwargs)
+        elif strategy == 'sequential':
+            return SequentialSearchCV(pipeline, paramgrid, cv=cv, n_jobs=n_jobs, **kwargs)
+        elif strategy == 'ridgepath':
+            from src.estimator import RidgePathSearchCV
+            return RidgePathSearchCV(pipeline, paramgrid, cv=cv, **kwargs)
+        else:
+            raise ValueError(f"Search strategy '{strategy}' not recognized. Use one of {SUPPORTED_SEARCH}.")
+
+
+def get_strategy(search) -> tuple:
+    """
+    Splits a search configuration into the strategy name and its keyword arguments.
+
+    Parameters:
+    -----------
+    search : str or dict
+        The name of the search strategy, or a dict with the name under 'strategy' and kwargs.
+
+    Returns:
+    --------
+    strategy : str
+        The name of the search strategy.
+    kwargs : dict
+        The keyword arguments for the search object.
+    """
+    if isinstance(search, dict):
+        kwargs = dict(search)
+        return kwargs.pop('strategy', 'grid'), kwargs
+    return search, {}
+
+
+def count_fits(search) -> int:
+    """
+    Counts the model fits a fitted search object spent (inner CV fits and refit).
+
+    Parameters:
+    -----------
+    search : object
+        The fitted search object.
+
+    Returns:
+    --------
+    n_fits : int
+        The number of fits.
+    """
+    if hasattr(search, 'n_fits_'):
+        return search.n_fits_
+    return len(search.cv_results_["params"]) * search.n_splits_ + int(bool(search.refit))
@@ -1,6 +1,7 @@
 #%%
 from scipy import stats
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 
 class CorrelatedTTest:
@@ -115,3 +116,52 @@ class CorrelatedTTest:
 
 
 
+
+
+def pairwise_correlated_ttest(scores, names, nruns, alpha=0.05, rope=None):
+    """Correlated t-test (see CorrelatedTTest) of all pairs of models at once
+    Args:
+        scores (np.array): fold scores, one column per model (n_folds x n_models)
+        names (list): names of the models
+        nruns (int): number of repetions of the cross-validation
+        alpha (float): significance level default=0.05
+        rope (float): range of plausible effect default=None
+    Returns:
+        table (pd.DataFrame): one row per ordered pair (a, b) with a != b, with the mean (mu) and
+            corrected variance (var) of the difference a - b, tstat, p, the confidence interval
+            (ci_lower, ci_upper) and the probabilities p_l, p_u (and p_rope if rope is given)
+    """
+    scores = np.asarray(scores, dtype=float)
+    J, n_models = scores.shape
+    df = J - 1
+    k = J // nruns
+    rho = 1/k
+
+    # all pairwise differences (n_folds x n_models x n_models)
+    r = scores[:, :, None] - scores[:, None, :]
+    mu = r.mean(axis=0)
+    var = (1/J + rho / (1-rho)) * r.var(axis=0, ddof=1)
+
+    # ordered pairs without the diagonal
+    a, b = np.nonzero(~np.eye(n_models, dtype=bool))
+    mu, scale = mu[a, b], np.sqrt(var[a, b])
+
+    tstat = mu / scale
+    table = {
+        'a': np.asarray(names)[a],
+        'b': np.asarray(names)[b],
+        'mu': mu,
+        'var': var[a, b],
+        'tstat': tstat,
+        'p': 2 * stats.t.cdf(-np.abs(tstat), df),
+        'ci_lower': stats.t.ppf(alpha/2, df, loc=mu, scale=scale),
+        'ci_upper': stats.t.ppf(1-alpha/2, df, loc=mu, scale=scale),
+    }
+    if rope is None:
+        table['p_l'] = stats.t.cdf(0, df, loc=mu, scale=scale)
+        table['p_u'] = 1 - table['p_l']
+    else:
+        table['p_l'] = stats.t.cdf(-rope, df, loc=mu, scale=scale)
+        table['p_u'] = 1 - stats.t.cdf(rope, df, loc=mu, scale=scale)
+        table['p_rope'] = 1 - table['p_u'] - table['p_l']
+    return pd.DataFrame(table)
@@ -1,17 +1,12 @@
-from sklearn.linear_model import BayesianRidge, ARDRegression
-from sklearn.gaussian_process import GaussianProcessRegressor
-from sklearn.gaussian_process.kernels import DotProduct, RBF
-from sklearn.compose import ColumnTransformer, make_column_selector, make_column_transformer
-from sklearn.svm import LinearSVR
-from sklearn.ensemble import StackingRegressor
-from xgboost import XGBRegressor
-from sklearn.dummy import DummyRegressor
+from sklearn.compose import make_column_selector, make_column_transformer
 from src.transform import DiMap, SelectCols, get_column_transformer, NormEITV
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from src.estimator import Pyment
 from sklearn.pipeline import Pipeline
 import numpy as np
 
+# Estimators are imported when their step is created (see STEP_REGISTRY), so importing this
+# module does not load xgboost, the gaussian process or ensemble machinery of unused models.
+
 class Step():
     """
     A class representing a step in a data processing pipeline.
@@ -93,62 +88,121 @@ class StepColPattern(Step):
 class StepBayesianRidge(Step):
     def __init__(self, step_config): 
         super().__init__(step_config)
+        from sklearn.linear_model import BayesianRidge
         self.object = BayesianRidge(**self.kwargs)
 
+class StepRidge(Step):
+    def __init__(self, step_config): 
+        super().__init__(step_config)
+        from sklearn.linear_model import Ridge
+        self.object = Ridge(**self.kwargs)
+
 class StepARDRegression(Step):
     def __init__(self, step_config): 
         super().__init__(step_config)
+        from sklearn.linear_model import ARDRegression
         self.object = ARDRegression(**self.kwargs)
 
 class StepLinGPR(Step):
     def __init__(self, step_config): 
         super().__init__(step_config)
+        from sklearn.gaussian_process import GaussianProcessRegressor
+        from sklearn.gaussian_process.kernels import DotProduct
         self.object = GaussianProcessRegressor(kernel=DotProduct(),**self.kwargs)
 
 class StepRBFGPR(Step):
     def __init__(self, step_config): 
         super().__init__(step_config)
+        from sklearn.gaussian_process import GaussianProcessRegressor
+        from sklearn.gaussian_process.kernels import RBF
         self.object = GaussianProcessRegressor(kernel=RBF(),**self.kwargs)
 
 class StepLinearSVR(Step):
     def __init__(self, step_config): 
         super().__init__(step_config)
+        from sklearn.svm import LinearSVR
         self.object = LinearSVR(**self.kwargs)
 
 class StepXGBRegressor(Step):
     def __init__(self, step_config): 
         super().__init__(step_config)
+        from xgboost import XGBRegressor
         self.object = XGBRegressor(**self.kwargs)
 
 class StepDummyRegressor(Step):
     def __init__(self, step_config): 
         super().__init__(step_config)
+        from sklearn.dummy import DummyRegressor
         self.object = DummyRegressor(**self.kwargs)
 
 class StepPyment(Step):
     def __init__(self, step_config): 
         super().__init__(step_config)
+        from src.estimator import Pyment
         self.object = Pyment(**self.kwargs)
 
 class StepEnsemble(Step):
     def __init__(self, step_config: dict, model: Step):
         super().__init__(step_config)
+        from sklearn.linear_model import BayesianRidge
+        from src.estimator import CachedStackingRegressor
         ct_mri = get_column_transformer('mri')
         ct_pet = get_column_transformer('pet')
         model = model.object
         pipe_mri = Pipeline([('ct', ct_mri), ('model', model)])
         pipe_pet = Pipeline([('ct', ct_pet), ('model',model)])
-        self.object = StackingRegressor([('mri', pipe_mri), ('pet', pipe_pet)], BayesianRidge())
+        self.object = CachedStackingRegressor([('mri', pipe_mri), ('pet', pipe_pet)], BayesianRidge())
 
 class StepPyEnsemble(Step):
     def __init__(self, step_config: dict, model: Step):
         super().__init__(step_config)
+        from sklearn.linear_model import BayesianRidge
+        from src.estimator import Pyment, CachedStackingRegressor
         ct_mri = get_column_transformer('pyment')
         ct_pet = get_column_transformer('pet')
         model = model.object
         pipe_mri = Pipeline([('ct', ct_mri), ('model', Pyment())])
         pipe_pet = Pipeline([('ct', ct_pet), ('model', model)])
-        self.object = StackingRegressor([('mri', pipe_mri), ('pet', pipe_pet)], BayesianRidge())
+        self.object = CachedStackingRegressor([('mri', pipe_mri), ('pet', pipe_pet)], BayesianRidge())
+
+# step name -> Step class (preprocessing and model steps)
+STEP_REGISTRY = {
+    # Preproc Steps
+    'dimap': StepDiMap,
+    'colselector': StepColSelector,
+    'scaler': StepScaler,
+    'columnscaler': StepColumnScaler,
+    'normeitv': StepNormEITV,
+    'colpattern': StepColPattern,
+    # Model Steps
+    'bayesianridge': StepBayesianRidge,
+    'ridge': StepRidge,
+    'ardregression': StepARDRegression,
+    'lingpr': StepLinGPR,
+    'rbfgpr': StepRBFGPR,
+    'linearsvr': StepLinearSVR,
+    'xgbregressor': StepXGBRegressor,
+    'dummyregressor': StepDummyRegressor,
+    'pyment': StepPyment,
+}
+
+# ensemble step name -> (ensemble Step class, Step class of the base model)
+ENSEMBLE_REGISTRY = {
+    # Ensemble Steps
+    'ens_bridge': (StepEnsemble, StepBayesianRidge),
+    'ens_rvm': (StepEnsemble, StepARDRegression),
+    'ens_lingpr': (StepEnsemble, StepLinGPR),
+    'ens_rbfgpr': (StepEnsemble, StepRBFGPR),
+    'ens_lsvr': (StepEnsemble, StepLinearSVR),
+    'ens_xgb': (StepEnsemble, StepXGBRegressor),
+    # Ensemble Py Steps
+    'ens_py_bridge': (StepPyEnsemble, StepBayesianRidge),
+    'ens_py_rvm': (StepPyEnsemble, StepARDRegression),
+    'ens_py_lingpr': (StepPyEnsemble, StepLinGPR),
+    'ens_py_rbfgpr': (StepPyEnsemble, StepRBFGPR),
+    'ens_py_lsvr': (StepPyEnsemble, StepLinearSVR),
+    'ens_py_xgb': (StepPyEnsemble, StepXGBRegressor),
+}
 
 class StepFactory():
     """
@@ -161,104 +215,12 @@ class StepFactory():
     """
     @staticmethod
     def create_step(step_config):
-        # Preproc Steps
-        if step_config['name'] == 'dimap':
-            step = StepDiMap(step_config)
-            return step()
-        elif step_config['name'] == 'colselector':
-            step = StepColSelector(step_config)
-            return step()
-        elif step_config['name'] == 'scaler':
-            step = StepScaler(step_config)
-            return step()
-        elif step_config['name'] == 'columnscaler':
-            step = StepColumnScaler(step_config)
-            return step()
-        elif step_config['name'] == 'normeitv':
-            step = StepNormEITV(step_config)
-            return step()
-        elif step_config['name'] == 'colpattern':
-            step = StepColPattern(step_config)
-            return step()
-        
-        # Model Steps
-        elif step_config['name'] == 'bayesianridge':
-            step = StepBayesianRidge(step_config)
-            return step()
-        elif step_config['name'] == 'ardregression':
-            step = StepARDRegression(step_config)
-            return step()
-        elif step_config['name'] == 'lingpr':
-            step = StepLinGPR(step_config)
-            return step()
-        elif step_config['name'] == 'rbfgpr':
-            step = StepRBFGPR(step_config)
-            return step()
-        elif step_config['name'] == 'linearsvr':
-            step = StepLinearSVR(step_config)
-            return step()
-        elif step_config['name'] == 'xgbregressor':
-            step = StepXGBRegressor(step_config)
-            return step()
-        elif step_config['name'] == 'dummyregressor':
-            step = StepDummyRegressor(step_config)
-            return step()
-        elif step_config['name'] == 'pyment':
-            step = StepPyment(step_config)
-            return step()
-        
-        # Ensemble Steps
-        elif step_config['name'] == 'ens_bridge':
-            model = StepBayesianRidge(step_config)
-            step = StepEnsemble(step_config, model)
-            return step()
-        elif step_config['name'] == 'ens_rvm':
-            model = StepARDRegression(step_config)
-            step = StepEnsemble(step_config, model)
-            return step()        
-        elif step_config['name'] == 'ens_lingpr':
-            model = StepLinGPR(step_config)
-            step = StepEnsemble(step_config, model)
-            return step()        
-        elif step_config['name'] == 'ens_rbfgpr':
-            model = StepRBFGPR(step_config)
-            step = StepEnsemble(step_config, model)
-            return step()        
-        elif step_config['name'] == 'ens_lsvr':
-            model = StepLinearSVR(step_config)
-            step = StepEnsemble(step_config, model)
-            return step()
-        elif step_config['name'] == 'ens_xgb':
-            model = StepXGBRegressor(step_config)
-            step = StepEnsemble(step_config, model)
-            return step()
-        
-        # Ensemble Py Steps
-        elif step_config['name'] == 'ens_py_bridge':
-            model = StepBayesianRidge(step_config)
-            step = StepPyEnsemble(step_config, model)
-            return step()
-        elif step_config['name'] == 'ens_py_rvm':
-            model = StepARDRegression(step_config)
-            step = StepPyEnsemble(step_config, model)
-            return step()
-        elif step_config['name'] == 'ens_py_lingpr':
-            model = StepLinGPR(step_config)
-            step = StepPyEnsemble(step_config, model)
-            return step()
-        elif step_config['name'] == 'ens_py_rbfgpr':
-            model = StepRBFGPR(step_config)
-            step = StepPyEnsemble(step_config, model)
-            return step()
-        elif step_config['name'] == 'ens_py_lsvr':
-            model = StepLinearSVR(step_config)
-            step = StepPyEnsemble(step_config, model)
-            return step()
-        elif step_config['name'] == 'ens_py_xgb':
-            model = StepXGBRegressor(step_config)
-            step = StepPyEnsemble(step_config, model)
-            return step()
-
+        name = step_config['name']
+        if name in STEP_REGISTRY:
+            step = STEP_REGISTRY[name](step_config)
+        elif name in ENSEMBLE_REGISTRY:
+            ensemble, base = ENSEMBLE_REGISTRY[name]
+            step = ensemble(step_config, base(step_config))
         else:
-            raise ValueError("Step type '{}' not recognized".format(step_config['name']))
-        
+            raise ValueError("Step type '{}' not recognized".format(name))
+        return step()
@@ -49,6 +49,7 @@ def supported_steps():
         'normeitv',
         'colpattern',
         'bayesianridge',
+        'ridge',
         'ardregression',
         'lingpr',
         'rbfgpr',
@@ -0,0 +1,72 @@
+import os
+from contextlib import contextmanager
+
+from joblib import parallel_backend
+from threadpoolctl import threadpool_limits
+
+
+def available_cores() -> int:
+    """Number of cores this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def resolve_n_jobs(n_jobs: int, n_cores: int) -> int:
+    """Number of workers of a joblib n_jobs value on n_cores cores (None is 1, -1 all cores, -2 all
+    but one, ...)."""
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max(1, n_cores + 1 + n_jobs)
+    return n_jobs
+
+
+class ThreadBudget():
+    """
+    Split of a total core budget between process-level parallelism (fold_jobs processes, each with
+    n_jobs inner CV workers) and the native (BLAS/OpenMP) threads of every worker.
+
+    Attributes:
+    -----------
+    n_cores : int
+        The total core budget.
+    n_workers : int
+        The number of worker processes (fold_jobs * n_jobs).
+    threads_per_job : int
+        The number of native threads per worker.
+    """
+    def __init__(self, n_jobs: int = 1, fold_jobs: int = 1, n_cores: int = None, threads_per_job: int = None):
+        """
+        Parameters:
+        -----------
+        n_jobs : int, optional
+            The number of inner CV workers per outer fold, negative values as in joblib (-1 for all
+            n_cores). Default is 1.
+        fold_jobs : int, optional
+            The number of processes the outer folds are spread over. Default is 1.
+        n_cores : int, optional
+            The total core budget. Default is None (all available cores).
+        threads_per_job : int, optional
+            The number of native threads per worker. Default is None (n_cores // workers, at least 1).
+        """
+        self.n_cores = n_cores if n_cores is not None else available_cores()
+        self.n_workers = resolve_n_jobs(n_jobs, self.n_cores) * max(1, fold_jobs)
+        if threads_per_job is None:
+            threads_per_job = max(1, self.n_cores // self.n_workers)
+        self.threads_per_job = threads_per_job
+
+    def __str__(self) -> str:
+        total = self.n_workers * self.threads_per_job
+        text = f"Threads: {self.n_workers} workers x {self.threads_per_job} threads on {self.n_cores} cores"
+        if total > self.n_cores:
+            text += f" (oversubscribed: {total} threads)"
+        return text
+
+    @contextmanager
+    def limit(self):
+        """Limit native threads of this process and of joblib (inner CV) workers started inside."""
+        with threadpool_limits(limits=self.threads_per_job):
+            with parallel_backend('loky', inner_max_num_threads=self.threads_per_job):
+                yield
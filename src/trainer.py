@@ -1,17 +1,184 @@
+import time
 import numpy as np
 import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from sklearn.model_selection import train_test_split
-from sklearn.model_selection import GridSearchCV
+from sklearn.model_selection import GridSearchCV, ParameterGrid
+from sklearn.base import clone
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
-from sklearn.inspection import permutation_importance
 
 from src.workflow import WorkflowResults, WorkflowRepresentation
 from src.weights import get_feature_weights
+from src.checkpoint import FoldStore
+from src.cv import SplitStore
+from src.search import SearchBuilder, count_fits, get_strategy
+from src.fingerprint import hash_object, hash_frame, hash_arrays
+from src.scheduler import TaskTimings, estimate_cost
+from src.threads import ThreadBudget
+from src.batched import supports_batched, fit_batched
+
+
+class FoldResult():
+    """Results of a single outer fold."""
+    def __init__(self, fold, index, pred, std, true, scores, weights, best_params, n_fits=1, seconds=0.0):
+        self.fold = fold
+        self.index = index
+        self.pred = pred
+        self.std = std
+        self.true = true
+        self.scores = scores
+        self.weights = weights
+        self.best_params = best_params
+        self.n_fits = n_fits
+        self.seconds = seconds
+
+
+class ResultAccumulator():
+    """Preallocated, typed columns for the out-of-fold predictions of all outer folds.
+    Each outer fold writes its test samples into its own slice, in fold order, so the
+    columns are filled in place however the folds are executed."""
+    def __init__(self, test_sizes, index_dtype):
+        """Initialize the columns.
+        Args:
+            test_sizes (list[int]): number of test samples per outer fold (in fold order)
+            index_dtype (np.dtype): dtype of the sample index
+        """
+        self._offsets = np.concatenate([[0], np.cumsum(test_sizes)]).astype(np.int64)
+        n_rows = int(self._offsets[-1])
+        self.index = np.empty(n_rows, dtype=index_dtype)
+        self.fold = np.empty(n_rows, dtype=np.int32)
+        self.pred = np.empty(n_rows, dtype=np.float64)
+        self.std = np.empty(n_rows, dtype=np.float64)
+        self.true = np.empty(n_rows, dtype=np.float64)
+
+    @classmethod
+    def from_splits(cls, splits, index: pd.Index):
+        """Size the columns from the outer splits (n_repeats x n_samples rows for repeated k-fold).
+        Args:
+            splits (list): (train_idx, test_idx) per outer fold
+            index (pd.Index): index of the data
+        Returns:
+            accumulator (ResultAccumulator)
+        """
+        return cls([len(test_idx) for _, test_idx in splits], index.dtype)
+
+    def write(self, result: FoldResult):
+        """Write the predictions of a fold into its slice (predictions of shape (n, 1) are flattened).
+        Args:
+            result (FoldResult): results of the fold (folds start at 1)
+        """
+        rows = slice(self._offsets[result.fold - 1], self._offsets[result.fold])
+        self.index[rows] = np.asarray(result.index).reshape(-1)
+        self.fold[rows] = result.fold
+        self.pred[rows] = np.asarray(result.pred, dtype=np.float64).reshape(-1)
+        self.std[rows] = np.asarray(result.std, dtype=np.float64).reshape(-1)
+        self.true[rows] = np.asarray(result.true, dtype=np.float64).reshape(-1)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Get the columns as dataframe (the arrays are not copied)."""
+        return pd.DataFrame(
+            {"index": self.index, "fold": self.fold, "pred": self.pred, "std": self.std, "true": self.true},
+            copy=False,
+        )
+
+
+def fit_fold(data, label_col, train_idx, test_idx, fold, cv_inner, workflow, n_jobs=1, budget: ThreadBudget = None) -> FoldResult:
+    """Fit and evaluate a workflow on a single outer fold.
+    Args:
+        data (pd.DataFrame): dataframe to train on
+        label_col (str): name of label column
+        train_idx (np.array): positional index of training samples
+        test_idx (np.array): positional index of test samples
+        fold (int): number of the outer fold (starting at 1)
+        cv_inner (sklearn.model_selection._split): inner cross-validation
+        workflow (WorkflowRepresentation): the workflow to run
+        n_jobs (int): number of jobs for the inner grid search (default: 1)
+        budget (ThreadBudget): limit of native threads per worker (default: None, no limit)
+    Returns:
+        result (FoldResult): predictions, scores, weights and best params of the fold
+    """
+    if budget is not None:
+        with budget.limit():
+            return fit_fold(data, label_col, train_idx, test_idx, fold, cv_inner, workflow, n_jobs=n_jobs)
+
+    start = time.perf_counter()
+
+    # get train and test data and index
+    X_train, X_test = data.iloc[train_idx], data.iloc[test_idx]
+    y_train, y_test = (
+        data[label_col].iloc[train_idx],
+        data[label_col].iloc[test_idx],
+    )
+
+    # a single candidate needs no inner CV, fit it directly
+    candidates = ParameterGrid(workflow.paramgrid)
+    if len(candidates) == 1:
+        best_params = candidates[0]
+        best_pipe = clone(workflow.pipeline).set_params(**best_params)
+        best_pipe.fit(X_train, y_train)
+        strategy = 'fixed'
+        n_fits = 1
+    else:
+        # initiate hyperparameter search (inner CV), the best model is refit on the outer fold
+        search = SearchBuilder.build(workflow.search, workflow.pipeline, workflow.paramgrid, cv_inner, n_jobs=n_jobs)
+
+        # fit search
+        search.fit(X_train, y_train)
+
+        # get best model
+        best_pipe = search.best_estimator_
+        best_params = search.best_params_
+        strategy = get_strategy(workflow.search)[0]
+        n_fits = count_fits(search)
+
+    # predict on test data (flattened, e.g. Pyment returns the selected (n, 1) column)
+    y_pred_fold = np.asarray(best_pipe.predict(X_test)).ravel()
+
+    # try to get standard deviation of predictions
+    try:
+        y_pred_std_fold = np.asarray(best_pipe.predict(X_test, return_std=True)[1]).ravel()
+    except:
+        y_pred_std_fold = np.zeros(y_pred_fold.shape)
+
+    return FoldResult(
+        fold=fold,
+        index=X_test.index.values,
+        pred=y_pred_fold,
+        std=y_pred_std_fold,
+        true=y_test.to_numpy(),
+        scores=compute_scores(y_test, y_pred_fold),
+        weights=get_feature_weights(best_pipe['model']),
+        # record how the parameters were found next to the parameters
+        best_params={**best_params, 'search': strategy, 'n_fits': n_fits},
+        n_fits=n_fits,
+        seconds=time.perf_counter() - start,
+    )
+
+
+def _fit_fold_star(args) -> FoldResult:
+    """Unpack arguments for fit_fold (used by the process pool)."""
+    return fit_fold(*args)
+
+
+def compute_scores(true, pred):
+    """Get scores for model.
+    Returns:
+        scores (dict): dictionary with scores
+    """
+    # get scores
+    scores = {
+        "r2": r2_score(true, pred),
+        "mae": mean_absolute_error(true, pred),
+    }
+    return scores
+
 
 class Trainer:
     """Class for training a model with nested CV."""
     def train(
-        self, data: pd.DataFrame, strat_col:str, label_col:str, cv_inner, cv_outer, workflow: WorkflowRepresentation, n_jobs: int = 1
+        self, data: pd.DataFrame, strat_col:str, label_col:str, cv_inner, cv_outer, workflow: WorkflowRepresentation, n_jobs: int = 1,
+        fold_jobs: int = 1, checkpoint_dir: Path = None, resume: bool = False, budget: ThreadBudget = None
     ) -> WorkflowResults:
         """Train model using nested cross-validation.
         Args:
@@ -19,107 +186,206 @@ class Trainer:
             strat_col (str): name of column to stratify on
             label_col (str): name of label column
             cv_inner (sklearn.model_selection._split): inner cross-validation
-            cv_outer (sklearn.model_selection._split): outer cross-validation
+            cv_outer (sklearn.model_selection._split or SplitStore): outer cross-validation, a SplitStore
+                also provides the inner splits of each outer fold (cv_inner is then ignored)
             workflow (WorkflowRepresentation): the workflow to run
             n_jobs (int): number of jobs to run in parallel (default: 1)
+            fold_jobs (int): number of processes to spread the outer folds over (default: 1)
+            checkpoint_dir (Path): directory to append finished folds to (default: None, no checkpoints)
+            resume (bool): reuse folds of a previous run found in checkpoint_dir (default: False)
+            budget (ThreadBudget): split of the cores between workers and native threads
+                (default: None, all available cores)
         Returns:
             results (WorkflowResults): results of training
         """
-        # initialize arrays to store results
-        y_pred = np.array([])
-        y_true = np.array([])
-        y_pred_std = np.array([])
-        y_index = np.array([])
-        y_fold = np.array([])
+        return self.train_many(data, strat_col, label_col, cv_inner, cv_outer, [workflow], n_jobs=n_jobs,
+                               fold_jobs=fold_jobs, checkpoint_dir=checkpoint_dir, resume=resume, budget=budget)[0]
 
-        # store coefficients in array if available
-        coef = []
+    def train_many(
+        self, data: pd.DataFrame, strat_col:str, label_col:str, cv_inner, cv_outer, workflows: list, n_jobs: int = 1,
+        fold_jobs: int = 1, checkpoint_dir: Path = None, resume: bool = False, timings: TaskTimings = None,
+        budget: ThreadBudget = None, batched: bool = False
+    ) -> list:
+        """Train several workflows with nested cross-validation as one pool of (workflow, outer fold)
+        tasks, dispatched longest expected first (see src.scheduler.estimate_cost).
+        Args:
+            data (pd.DataFrame): dataframe to train on
+            strat_col (str): name of column to stratify on
+            label_col (str): name of label column
+            cv_inner (sklearn.model_selection._split): inner cross-validation
+            cv_outer (sklearn.model_selection._split or SplitStore): outer cross-validation, a SplitStore
+                also provides the inner splits of each outer fold (cv_inner is then ignored)
+            workflows (list[WorkflowRepresentation]): the workflows to run
+            n_jobs (int): number of jobs to run in parallel (default: 1)
+            fold_jobs (int): number of processes to spread the tasks over (default: 1)
+            checkpoint_dir (Path): directory to append finished folds to (default: None, no checkpoints)
+            resume (bool): reuse folds of a previous run found in checkpoint_dir (default: False)
+            timings (TaskTimings): seconds per fit of previous runs, updated with this run (default: None)
+            budget (ThreadBudget): split of the cores between workers and native threads
+                (default: None, all available cores)
+            batched (bool): fit all outer folds of workflows with a single linear model candidate
+                in one batch (see src.batched.supports_batched) (default: False)
+        Returns:
+            results (list[WorkflowResults]): results of training per workflow
+        """
+        # limit native threads per worker, so workers x threads fits the cores
+        if budget is None:
+            budget = ThreadBudget(n_jobs=n_jobs, fold_jobs=fold_jobs)
+        print(budget)
 
-        # store best params in array
-        best_params = np.array([])
+        # materialize outer splits so folds keep their order independent of execution
+        splits = list(cv_outer.split(data, data[strat_col]))
 
-        # index for outer CV !! make it pet_id
-        index = np.arange(data.shape[0])
+        stores = []
+        pending = []
+        batch_results = {}
+        for i, workflow in enumerate(workflows):
+            if batched and supports_batched(workflow):
+                with budget.limit():
+                    fold_results = self._fit_batched(workflow, data, label_col, splits)
+                if fold_results is not None:
+                    print(f"{workflow.name}: {len(splits)} folds fit in one batch")
+                    batch_results[i] = fold_results
+                    stores.append(None)
+                    continue
 
-        # k-fold iterator for outer CV
-        k = 1
+            tasks = [
+                (data, label_col, train_idx, test_idx, k, self._inner_cv(cv_outer, cv_inner, k), workflow, n_jobs, budget)
+                for k, (train_idx, test_idx) in enumerate(splits, start=1)
+            ]
 
-        # store scores per fold
-        scores = []
-
-        # loop over outer folds
-        for train_idx, test_idx in cv_outer.split(data, data[strat_col]):
-            # get train and test data and index
-            X_train, X_test = data.iloc[train_idx], data.iloc[test_idx]
-            y_train, y_test = (
-                data[label_col].iloc[train_idx],
-                data[label_col].iloc[test_idx],
-            )
-
-            y_index_train, y_index_test = X_train.index.values, X_test.index.values
-
-            # initiate grid search (inner CV)
-            grid = GridSearchCV(
-                workflow.pipeline,
-                workflow.paramgrid,
-                cv=cv_inner,
-                scoring="neg_mean_absolute_error",
-                n_jobs=n_jobs
-            )
-
-            # fit grid search
-            grid.fit(X_train, y_train)
-            
-            # get best model
-            best_pipe = grid.best_estimator_
-
-            # fit best model on outer fold
-            best_pipe.fit(X_train, y_train)
-
-            # predict on test data
-            y_pred_fold = best_pipe.predict(X_test)
-
-            # try to get standard deviation of predictions
-            try:
-                y_pred_std_fold = best_pipe.predict(X_test, return_std=True)[1]
-            except:
-                y_pred_std_fold = np.zeros(y_pred_fold.shape)
-
-            # TODO generalize this. Should be able to set other estimators then pyment and also to run without
-            # compute scores per fold
-            scores_fold = self._compute_scores(y_test, y_pred_fold)
-            scores.append(scores_fold)
-
-            # append results to arrays
-            y_pred = np.append(y_pred, y_pred_fold)
-            y_true = np.append(y_true, y_test)
-            y_pred_std = np.append(y_pred_std, y_pred_std_fold)
-            y_index = np.append(y_index, y_index_test)
-            y_fold = np.append(y_fold, np.repeat(k, len(y_index_test)))
-            k += 1
-
-            # get coefficients 
-            coef.append(get_feature_weights(best_pipe['model']))
-
-            # append best params
-            best_params = np.append(best_params, grid.best_params_)
+            # reuse finished folds of an interrupted run
+            store = None
+            if checkpoint_dir is not None:
+                key = self._fingerprint(data, strat_col, label_col, splits, [task[5] for task in tasks], workflow)
+                store = FoldStore(Path(checkpoint_dir) / f"{workflow.name}.folds", key, resume=resume)
+                if len(store) > 0:
+                    print(f"{workflow.name}: resuming {len(store)} of {len(tasks)} folds from checkpoint")
+            stores.append(store)
+            pending += [(i, task) for task in tasks if store is None or task[4] not in store]
+
+        # longest expected tasks first, so short ones fill the gaps at the end
+        pending.sort(key=lambda task: estimate_cost(task[1][6], task[1][5], timings), reverse=True)
+        computed = self._run_tasks(pending, fold_jobs, stores)
 
         # print split counts
-        self._print_split_strata(data, X_train, X_test, strat_col)
+        train_idx, test_idx = splits[-1]
+        self._print_split_strata(data, data.iloc[train_idx], data.iloc[test_idx], strat_col)
+
+        results = []
+        for i, workflow in enumerate(workflows):
+            if i in batch_results:
+                fold_results = batch_results[i]
+            else:
+                fold_results = [computed[(i, k)] if (i, k) in computed else stores[i].get(k) for k in range(1, len(splits) + 1)]
+            if timings is not None:
+                done = batch_results.get(i, [result for (j, _), result in computed.items() if j == i])
+                timings.record(workflow.name, sum(r.seconds for r in done), sum(r.n_fits for r in done))
+            print(f"Workflow: {workflow.name}")
+            results.append(self._collect(workflow, fold_results, ResultAccumulator.from_splits(splits, data.index)))
+        return results
+
+    def _run_tasks(self, tasks: list, fold_jobs: int, stores: list = None) -> dict:
+        """Fit the outer folds of tasks (in the given order) and append each finished fold to its store.
+        Args:
+            tasks (list): (workflow index, arguments of fit_fold) per task
+            fold_jobs (int): number of processes to spread the tasks over
+            stores (list[FoldStore]): checkpoint store (or None) per workflow index (default: None)
+        Returns:
+            results (dict): FoldResult per (workflow index, fold number)
+        """
+        results = {}
+
+        def finish(i, result):
+            results[(i, result.fold)] = result
+            if stores is not None and stores[i] is not None:
+                stores[i].append(result.fold, result)
+
+        if fold_jobs == 1:
+            for i, args in tasks:
+                finish(i, _fit_fold_star(args))
+        else:
+            with ProcessPoolExecutor(max_workers=fold_jobs) as executor:
+                # the executor starts tasks in submission order
+                futures = {executor.submit(_fit_fold_star, args): i for i, args in tasks}
+                for future in as_completed(futures):
+                    finish(futures[future], future.result())
+        return results
+
+    def _fit_batched(self, workflow: WorkflowRepresentation, data: pd.DataFrame, label_col: str, splits: list) -> list:
+        """Fit all outer folds of a workflow in one batch (see src.batched.fit_batched).
+        Args:
+            workflow (WorkflowRepresentation): the workflow to run
+            data (pd.DataFrame): dataframe to train on
+            label_col (str): name of label column
+            splits (list): (train_idx, test_idx) per outer fold
+        Returns:
+            results (list[FoldResult]): results per outer fold, None if the folds cannot be batched
+        """
+        start = time.perf_counter()
+        pred, std, weights, params = fit_batched(workflow, data, label_col, splits)
+        if pred is None:
+            return None
+        seconds = (time.perf_counter() - start) / len(splits)
+
+        results = []
+        for k, (_, test_idx) in enumerate(splits, start=1):
+            true = data[label_col].iloc[test_idx].to_numpy()
+            results.append(FoldResult(
+                fold=k,
+                index=data.index.values[test_idx],
+                pred=pred[k - 1],
+                std=std[k - 1],
+                true=true,
+                scores=compute_scores(true, pred[k - 1]),
+                weights=weights.iloc[[k - 1]].reset_index(drop=True),
+                best_params={**params, 'search': 'batched', 'n_fits': 1},
+                n_fits=1,
+                seconds=seconds,
+            ))
+        return results
+
+    def _inner_cv(self, cv_outer, cv_inner, fold: int):
+        """Get the inner CV of an outer fold (stored with the outer splits if cv_outer is a SplitStore)."""
+        if isinstance(cv_outer, SplitStore):
+            return cv_outer.inner_cv(fold)
+        return cv_inner
+
+    def _fingerprint(self, data, strat_col, label_col, splits, cv_inner, workflow) -> str:
+        """Fingerprint of everything that determines the fold results of a workflow."""
+        return hash_object({
+            "data": hash_frame(data),
+            "strat_col": strat_col,
+            "label_col": label_col,
+            "splits": hash_arrays([idx for split in splits for idx in split]),
+            "cv_inner": cv_inner,
+            # the preprocessing cache does not change results
+            "pipeline": clone(workflow.pipeline).set_params(memory=None),
+            "paramgrid": workflow.paramgrid,
+            "search": workflow.search,
+        })
+
+    def _collect(self, workflow: WorkflowRepresentation, fold_results: list, accumulator: ResultAccumulator = None) -> WorkflowResults:
+        """Combine results of the outer folds (in fold order) into WorkflowResults.
+        Args:
+            workflow (WorkflowRepresentation): the workflow that was run
+            fold_results (list[FoldResult]): results per outer fold
+            accumulator (ResultAccumulator): preallocated columns (default: None, sized from fold_results)
+        Returns:
+            results (WorkflowResults): results of training
+        """
+        if accumulator is None:
+            accumulator = ResultAccumulator([len(result.index) for result in fold_results],
+                                            np.asarray(fold_results[0].index).dtype)
+        for result in fold_results:
+            accumulator.write(result)
 
         # store results
-        self._results = pd.DataFrame(
-            {
-                "index": y_index,
-                "fold": y_fold,
-                "pred": y_pred,
-                "std": y_pred_std,
-                "true": y_true,
-            }
-        )
+        self._results = accumulator.to_frame()
+        y_true, y_pred = accumulator.true, accumulator.pred
 
         # store scores per fold
-        self._scores = pd.DataFrame(scores)
+        self._scores = pd.DataFrame([result.scores for result in fold_results])
 
         self._overalscores = self._compute_scores(y_true, y_pred)
 
@@ -128,26 +394,27 @@ class Trainer:
         for score, val in self._overalscores.items():
             print(f"{score}: {val:.3f}")
 
+        # count and print number of model fits
+        self._n_fits = sum(result.n_fits for result in fold_results)
+        print(f"Fits: {self._n_fits}")
+
         # concatenate list of coefficients
-        self._coef = pd.concat(coef).reset_index(drop=True)
+        self._coef = pd.concat([result.weights for result in fold_results]).reset_index(drop=True)
 
         # store best params in dataframe
+        best_params = np.empty(len(fold_results), dtype=object)
+        best_params[:] = [result.best_params for result in fold_results]
         self._best_params = pd.DataFrame(best_params)
 
         # store results
-        return WorkflowResults(workflow.name,self._scores, self._results, self._best_params, self._coef)
+        return WorkflowResults(workflow.name,self._scores, self._results, self._best_params, self._coef, n_fits=self._n_fits)
 
     def _compute_scores(self, true, pred):
         """Get scores for model.
         Returns:
             scores (dict): dictionary with scores
         """
-        # get scores
-        scores = {
-            "r2": r2_score(true, pred),
-            "mae": mean_absolute_error(true, pred),
-        }
-        return scores
+        return compute_scores(true, pred)
 
     def _print_split_strata(self, total, train, test, strat_col="chron_age_group"):
         """Get split strata for train and test data.
@@ -168,4 +435,3 @@ class Trainer:
             index=["total", "train", "test"],
         ).T
         print(df_splits)
-
@@ -1,48 +1,48 @@
+import numpy as np
 import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.compose import ColumnTransformer, make_column_selector
 from src import prep
-from src.nodim import transform_nodim, estimate_params
+from src.nodim import transform_nodim, transform_nodim_analytic, estimate_params
 
 class DiMap(BaseEstimator, TransformerMixin):
     """Distribution Mapping Transformer."""
 
-    def __init__(self, cat_col, sample_col, pattern, match_nsamples=True):
+    def __init__(self, cat_col, sample_col, pattern, match_nsamples=True, method="interp", random_state=None):
         """Initialize the transformer.
         Args:
             cat_col (str): name of categorical column (tracer)
             sample_col (str): name of column to sample (chron_age_group)
             pattern (str): pattern of columns to use
-            match_nsamples (bool): if True, match number of samples in each bin, default True"""
+            match_nsamples (bool): if True, match number of samples in each bin, default True
+            method (str): 'interp' for the interpolated mapping (values within mu +- 5 std) or 'analytic'
+                for the exact closed-form gaussian mapping on all columns at once, default 'interp'
+            random_state (int): seed for matching the number of samples, default None"""
         self.cat_col = cat_col
         self.sample_col = sample_col
         self.pattern = pattern
         self.match_nsamples = match_nsamples
+        self.method = method
+        self.random_state = random_state
 
     def fit(self, X, y=None):
         """Fit the transformer.
         Args:
             X (pd.DataFrame): dataframe to subsample
             y (pd.Series): target variable (not used)"""
-        matched = prep.get_subsample(
+        matched = prep.get_subsample_index(
             df=X,
             cat_col=self.cat_col,
             sample_col=self.sample_col,
             match_nsamples=self.match_nsamples,
+            random_state=self.random_state,
         )
-        X_subset_1 = matched[matched[self.cat_col]==True]
-        X_subset_2 = matched[matched[self.cat_col]==False]
-
-        # get params for all columns
-        self.params1 = {}
-        self.params2 = {}
-        self.columns = [col for col in X.columns if col.startswith(self.pattern)]
-        for col in self.columns:
-            if col in [self.cat_col, self.sample_col]:
-                continue
-            self.params1[col] = estimate_params(X_subset_1[col])
-            self.params2[col] = estimate_params(X_subset_2[col])
-
+        # estimate params of all columns at once (one entry per column)
+        self.columns = [col for col in X.columns if col.startswith(self.pattern) and col not in [self.cat_col, self.sample_col]]
+        mask = X[self.cat_col].to_numpy(dtype=bool)[matched]
+        values = X[self.columns].to_numpy(dtype=float)[matched]
+        self.params1 = estimate_params(values[mask])
+        self.params2 = estimate_params(values[~mask])
 
         return self
 
@@ -52,17 +52,32 @@ class DiMap(BaseEstimator, TransformerMixin):
             X (pd.DataFrame): dataframe to transform
             y (pd.Series): target variable (not used)"""
         X_transformed = X.copy()
-        # transform all columns
-        for col in self.columns:
-            param1 = self.params1[col]
-            param2 = self.params2[col]
-            data = X_transformed[X_transformed[self.cat_col] == True][col]
-            
-            # self._error_checking(data,param1,col)
-            X_transformed.loc[X_transformed[self.cat_col] == True, col] = transform_nodim(param1=param1, param2=param2, values=data)
+        rows = np.flatnonzero(X_transformed[self.cat_col].to_numpy(dtype=bool))
+        cols = X_transformed.columns.get_indexer(self.columns)
+        values = X_transformed.iloc[rows, cols].to_numpy(dtype=float)
 
+        # transform all columns
+        if self.method == "analytic":
+            transformed = transform_nodim_analytic(param1=self.params1, param2=self.params2, values=values)
+        elif self.method == "interp":
+            transformed = np.empty_like(values)
+            for i, col in enumerate(self.columns):
+                param1 = self._column_params(self.params1, i)
+                param2 = self._column_params(self.params2, i)
+                # self._error_checking(values[:, i],param1,col)
+                transformed[:, i] = transform_nodim(param1=param1, param2=param2, values=values[:, i])
+        else:
+            raise ValueError(f"Method '{self.method}' not recognized. Use 'interp' or 'analytic'.")
+
+        # write back the transformed block with a single assignment, keeping the column dtype (e.g. float32)
+        dtype = np.result_type(*X_transformed.dtypes.iloc[cols]) if len(cols) else float
+        X_transformed.iloc[rows, cols] = transformed.astype(dtype, copy=False)
         return X_transformed
 
+    def _column_params(self, params, i):
+        """Get (mu,std) of the i-th column."""
+        return {"mu": params["mu"][i], "std": params["std"][i]}
+
     def _error_checking(self, data, param, col):
         """Check if column values are in the range of mu +- 5* std."""
         n_std = 5
@@ -115,12 +130,13 @@ class SelectCols(BaseEstimator, TransformerMixin):
 class OneHotPD(BaseEstimator, TransformerMixin):
     """One-hot encoding transformer."""
 
-    def __init__(self, columns):
+    def __init__(self, columns, dtype=None):
         """Initialize the transformer.
         Args:
             columns (list): list of columns to one-hot encode
-            drop_first (bool): if True, drop first column, default True"""
+            dtype (np.dtype): dtype of the dummy columns (e.g. np.uint8), default None (pandas default)"""
         self.columns = columns
+        self.dtype = dtype
 
     def fit(self, X, y=None):
         """Fit the transformer.
@@ -136,7 +152,7 @@ class OneHotPD(BaseEstimator, TransformerMixin):
             y (pd.Series): target variable (not used)"""
         X_transformed = X.copy()
         if self.columns:
-            X_transformed = pd.get_dummies(X_transformed, columns=self.columns)
+            X_transformed = pd.get_dummies(X_transformed, columns=self.columns, dtype=self.dtype)
         return X_transformed
 
 
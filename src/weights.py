@@ -1,11 +1,10 @@
 import numpy as np
 import pandas as pd
-from sklearn.inspection import permutation_importance
 
-SUPPORTED_LIN_REG = ['LinearRegression','ARDRegression','BayesianRidge','LinearSVR']
+SUPPORTED_LIN_REG = ['LinearRegression','ARDRegression','BayesianRidge','LinearSVR','Ridge']
 SUPPORTED_TREE_REG = ['XGBRegressor']
 SUPPORTED_DUMMY_REG = ['DummyRegressor', 'Pyment']
-SUPPORTED_STACKING_REG = ['StackingRegressor']
+SUPPORTED_STACKING_REG = ['StackingRegressor', 'CachedStackingRegressor']
 SUPPORTED_GPR_REG = ['GaussianProcessRegressor']
 
 def get_feature_weights(model, X=None, y=None):
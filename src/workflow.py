@@ -1,24 +1,28 @@
 from src.model_builder import ModelBuilder, ModelRepresentation
 from src.pipeline import PipelineBuilder, PipelineRepresentation
+from src.fingerprint import code_version
 
 from sklearn.pipeline import Pipeline
+from joblib import Memory
 import pandas as pd
 from pathlib import Path
+import shutil
 
 
 class WorkFlowSpecs():
-    def __init__(self, pipe_file, model_file, pipe_name, model_name, rois):
+    def __init__(self, pipe_file, model_file, pipe_name, model_name, rois, cache_dir=None):
         self.pipe_file = pipe_file
         self.model_file = model_file
         self.pipe_name = pipe_name
         self.model_name = model_name
         self.rois = rois
+        self.cache_dir = cache_dir
 
     def __str__(self) -> str:
         return f'\t\n Pipeline: {self.pipe_name}, Model: {self.model_name}'
 
 class WorkflowResults():
-    def __init__(self, workflow_name:str, scores: pd.DataFrame, results: pd.DataFrame, best_params: pd.DataFrame, weights: pd.DataFrame):
+    def __init__(self, workflow_name:str, scores: pd.DataFrame, results: pd.DataFrame, best_params: pd.DataFrame, weights: pd.DataFrame, n_fits: int = None):
         self.name = workflow_name
         self.pipe_name = workflow_name.split('_')[0]
         self.model_name = workflow_name.split('_')[1]
@@ -26,6 +30,7 @@ class WorkflowResults():
         self.results = results
         self.best_params = best_params
         self.weights = weights
+        self.n_fits = n_fits
 
     def save(self, path: Path, experiment: str):
         path.mkdir(parents=True, exist_ok=True)
@@ -55,12 +60,21 @@ class WorkflowRepresentation():
         # add model to steps
         steps.append(('model', model))
 
-        pipeline = Pipeline(steps = steps)
+        # cache fitted preprocessing steps, shared by all workflows of the same pipeline,
+        # and base learners of ensembles, shared by all ensembles with the same base learner
+        memory = None
+        if spec.cache_dir is not None:
+            memory = Memory(location=str(versioned_cache_dir(spec.cache_dir)), verbose=0)
+            if 'memory' in model.get_params(deep=False):
+                model.set_params(memory=memory)
+
+        pipeline = Pipeline(steps = steps, memory = memory)
 
         self.name = f'{pipe_spec.name}_{model_spec.name}'    
         self.pipeline = pipeline
         self.rois = spec.rois
         self.paramgrid = model_spec.paramgrid
+        self.search = model_spec.search
 
 
 class WorkflowBuilder():
@@ -96,3 +110,44 @@ class WorkflowBuilder():
 
         return workflows
 
+
+def versioned_cache_dir(cache_dir: Path) -> Path:
+    """
+    The directory of a joblib cache for the current source code. joblib keys fitted steps on their
+    parameters only, so a change of the step code (e.g. DiMap) must not reuse the fits of the old code.
+
+    Parameters:
+    -----------
+    cache_dir : Path
+        The root directory of the cache.
+
+    Returns:
+    --------
+    directory : Path
+        The subdirectory for the current source code (see src.fingerprint.code_version).
+    """
+    return Path(cache_dir) / code_version()[:16]
+
+
+def prune_cache(cache_dir: Path) -> list:
+    """
+    Removes the cached fits of other versions of the source code from a joblib cache.
+
+    Parameters:
+    -----------
+    cache_dir : Path
+        The root directory of the cache.
+
+    Returns:
+    --------
+    removed : list of Path
+        The removed directories.
+    """
+    cache_dir = Path(cache_dir)
+    if not cache_dir.exists():
+        return []
+    current = versioned_cache_dir(cache_dir)
+    removed = [path for path in cache_dir.iterdir() if path.is_dir() and path != current]
+    for path in removed:
+        shutil.rmtree(path, ignore_errors=True)
+    return removed
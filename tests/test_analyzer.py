@@ -0,0 +1,78 @@
+from src.analyzier import StatsAnalyzer, compute_fold_metrics
+from src.statistics import CorrelatedTTest
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, r2_score
+from types import SimpleNamespace
+
+WORKFLOWS = ['pipeline-I_dummy', 'pipeline-IIa_bridge', 'pipeline-IIb_lsvr']
+
+def _predictions(n_subjects=30, n_repeats=2, n_splits=3, seed=0):
+    rng = np.random.default_rng(seed)
+    true = np.tile(rng.uniform(20, 80, n_subjects), n_repeats)
+    predictions = pd.DataFrame({
+        'subject_id': np.tile(np.arange(n_subjects), n_repeats),
+        # folds in order of appearance, not sorted
+        'fold': np.repeat(rng.permutation(n_repeats * n_splits) + 1., n_subjects // n_splits),
+        'true': true,
+    })
+    for i, pipe in enumerate(WORKFLOWS):
+        predictions[pipe] = true + rng.normal(0, 5 * (i + 1), len(true))
+    return predictions
+
+def _loop_scores(predictions):
+    """Scores per fold computed one fold and workflow at a time."""
+    folds = predictions.fold.unique()
+    scores = pd.DataFrame(index=folds)
+    for fold in folds:
+        df_fold = predictions[predictions.fold == fold]
+        for pipe in WORKFLOWS:
+            scores.loc[fold, f'{pipe}_mae'] = mean_absolute_error(df_fold.true, df_fold[pipe])
+            scores.loc[fold, f'{pipe}_r2'] = r2_score(df_fold.true, df_fold[pipe])
+            scores.loc[fold, f'{pipe}_corr'] = df_fold[pipe].corr(df_fold.true)
+            scores.loc[fold, f'{pipe}_corr_pad'] = (df_fold[pipe] - df_fold.true).corr(df_fold.true)
+        scores.loc[fold, 'count'] = len(df_fold)
+    return scores
+
+def test_compute_fold_metrics():
+    predictions = _predictions()
+    metrics = compute_fold_metrics(predictions.fold.to_numpy(), predictions.true.to_numpy(), predictions[WORKFLOWS].to_numpy())
+    expected = _loop_scores(predictions)
+
+    assert metrics['folds'].tolist() == expected.index.tolist()
+    for i, pipe in enumerate(WORKFLOWS):
+        for score in ['mae', 'r2', 'corr', 'corr_pad']:
+            np.testing.assert_allclose(metrics[score][:, i], expected[f'{pipe}_{score}'].to_numpy())
+
+def test_compute_fold_metrics_constant_true():
+    fold = np.array([1, 1, 2, 2])
+    true = np.array([5., 5., 1., 2.])
+    metrics = compute_fold_metrics(fold, true, np.array([[5.], [5.], [1.], [2.]]))
+    assert metrics['r2'][:, 0].tolist() == [1.0, 1.0]
+
+def test_stats_analyzer_scores():
+    predictions = _predictions()
+    results = SimpleNamespace(name='experiment', result_dir=None, data=None, predictions=predictions.copy(),
+                              workflow_names=WORKFLOWS)
+    analyzer = StatsAnalyzer(results)
+    analyzer._compute_pad()
+    analyzer._compute_scores()
+    pd.testing.assert_frame_equal(analyzer.scores, _loop_scores(predictions))
+
+def test_stats_analyzer_stat_test():
+    predictions = _predictions()
+    results = SimpleNamespace(name='experiment', result_dir=None, data=None, predictions=predictions.copy(),
+                              workflow_names=WORKFLOWS)
+    analyzer = StatsAnalyzer(results)
+    analyzer._compute_pad()
+    analyzer._compute_scores()
+    analyzer._average_scores()
+    analyzer._stat_test(reference=WORKFLOWS[0])
+
+    assert len(analyzer.comparisons) == len(WORKFLOWS) * (len(WORKFLOWS) - 1)
+    assert analyzer.result_table['tstat'].isna().tolist() == [True, False, False]
+    for pipe in WORKFLOWS[1:]:
+        ttest = CorrelatedTTest(analyzer.scores[f'{WORKFLOWS[0]}_mae'].to_numpy(), analyzer.scores[f'{pipe}_mae'].to_numpy(), 2)
+        tstat, p, cil, ciu = ttest.ttest()
+        assert analyzer.result_table.loc[pipe, 'tstat'] == round(tstat, 2)
+        assert analyzer.result_table.loc[pipe, 'ci'] == f"({cil:.2f}, {ciu:.2f})"
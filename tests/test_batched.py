@@ -0,0 +1,97 @@
+from src.batched import supports_batched, stack_folds, fit_bayesian_ridge, fit_linear_regression, predict_batched
+from src.trainer import Trainer
+from src.workflow import WorkflowBuilder, WorkFlowSpecs
+from src.test_config import pipe_config, model_config
+from sklearn.linear_model import BayesianRidge, LinearRegression
+from sklearn.dummy import DummyRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.model_selection import KFold
+from sklearn import set_config
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+import tempfile
+import yaml
+
+set_config(transform_output="pandas")
+
+def _folds(n_folds=6, n_features=4):
+    rng = np.random.default_rng(0)
+    X = [rng.normal(size=(30 + b, n_features)) for b in range(n_folds)]
+    y = [x @ rng.normal(size=n_features) + rng.normal(scale=0.5, size=len(x)) + 3 for x in X]
+    X_test = [rng.normal(size=(5 + b % 2, n_features)) for b in range(n_folds)]
+    return X, y, X_test
+
+def test_stack_folds():
+    X, y, mask = stack_folds([np.ones((2, 3)), np.ones((4, 3))], [np.ones(2), np.ones(4)])
+    assert X.shape == (2, 4, 3)
+    assert mask.sum(axis=1).tolist() == [2, 4]
+    assert X[0, 2:].sum() == 0 and y[0, 2:].sum() == 0
+
+@pytest.mark.parametrize('fit_intercept', [True, False])
+def test_fit_bayesian_ridge_matches_sklearn(fit_intercept):
+    X, y, X_test = _folds()
+    model = BayesianRidge(fit_intercept=fit_intercept)
+    fit = fit_bayesian_ridge(*stack_folds(X, y), model)
+    pred, std = predict_batched(fit, *stack_folds(X_test)[::2])
+    for b in range(len(X)):
+        expected = BayesianRidge(fit_intercept=fit_intercept).fit(X[b], y[b])
+        assert np.allclose(fit['coef'][b], expected.coef_)
+        assert np.isclose(fit['intercept'][b], expected.intercept_)
+        assert np.isclose(fit['alpha'][b], expected.alpha_)
+        assert np.isclose(fit['lambda'][b], expected.lambda_)
+        assert fit['n_iter'][b] == expected.n_iter_
+        expected_pred, expected_std = expected.predict(X_test[b], return_std=True)
+        assert np.allclose(pred[b], expected_pred)
+        assert np.allclose(std[b], expected_std)
+
+def test_fit_linear_regression_matches_sklearn():
+    X, y, X_test = _folds()
+    fit = fit_linear_regression(*stack_folds(X, y), LinearRegression())
+    pred, std = predict_batched(fit, *stack_folds(X_test)[::2])
+    for b in range(len(X)):
+        expected = LinearRegression().fit(X[b], y[b])
+        assert np.allclose(fit['coef'][b], expected.coef_)
+        assert np.allclose(pred[b], expected.predict(X_test[b]))
+        assert not std[b].any()
+
+def test_supports_batched():
+    def workflow(model, paramgrid):
+        return SimpleNamespace(pipeline=Pipeline([('model', model)]), paramgrid=paramgrid)
+    assert supports_batched(workflow(BayesianRidge(), {}))
+    assert supports_batched(workflow(LinearRegression(), {}))
+    assert not supports_batched(workflow(BayesianRidge(), {'model__alpha_1': [1e-6, 1e-5]}))
+    assert not supports_batched(workflow(BayesianRidge(compute_score=True), {}))
+    assert not supports_batched(workflow(DummyRegressor(), {}))
+
+def test_trainer_train_many_batched(pipe_config, model_config):
+    model_config['bridge'] = {'name': 'bayesianridge', 'paramgrid': {}}
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        pipe_file = tmpdirname + '/pipe_file.yml'
+        model_file = tmpdirname + '/model_file.yml'
+
+        with open(pipe_file, 'w') as f:
+            yaml.dump(pipe_config, f)
+
+        with open(model_file, 'w') as f:
+            yaml.dump(model_config, f)
+
+        specs = [WorkFlowSpecs(pipe_file, model_file, 'pipeline-test', name, ['rois']) for name in ['dummy', 'bridge']]
+        workflows = WorkflowBuilder.build(specs)
+
+        rng = np.random.default_rng(0)
+        data = pd.DataFrame({'cat1': np.zeros(40), 'pyment': rng.normal(size=40)})
+        data['age'] = 2 * data['pyment'] + rng.normal(scale=0.1, size=40)
+        cv_inner = KFold(n_splits=2, shuffle=True, random_state=42)
+        cv_outer = KFold(n_splits=4, shuffle=True, random_state=42)
+        trainer = Trainer()
+        args = dict(data=data, strat_col="cat1", label_col="age", cv_inner=cv_inner, cv_outer=cv_outer, workflows=workflows)
+        batched = trainer.train_many(**args, batched=True)
+        expected = trainer.train_many(**args)
+
+        for actual, single in zip(batched, expected):
+            pd.testing.assert_frame_equal(actual.results, single.results, check_exact=False)
+            pd.testing.assert_frame_equal(actual.weights, single.weights, check_exact=False)
+        assert batched[1].best_params.iloc[0, 0]['search'] == 'batched'
+        assert batched[0].best_params.iloc[0, 0]['search'] == 'fixed'
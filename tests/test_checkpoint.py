@@ -0,0 +1,51 @@
+from src.checkpoint import FoldStore
+
+from pathlib import Path
+import tempfile
+
+KEY = 'run-key'
+
+def test_foldstore_append_and_resume():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        path = Path(tmpdirname) / 'workflow.folds'
+        store = FoldStore(path, KEY)
+        store.append(1, {'pred': [1.0, 2.0]})
+        store.append(2, {'pred': [3.0]})
+
+        resumed = FoldStore(path, KEY, resume=True)
+        assert len(resumed) == 2
+        assert 1 in resumed and 2 in resumed
+        assert resumed.get(2) == {'pred': [3.0]}
+
+def test_foldstore_no_resume():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        path = Path(tmpdirname) / 'workflow.folds'
+        FoldStore(path, KEY).append(1, 'fold 1')
+
+        store = FoldStore(path, KEY, resume=False)
+        assert len(store) == 0
+        assert len(FoldStore(path, KEY, resume=True)) == 0
+
+def test_foldstore_other_key():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        path = Path(tmpdirname) / 'workflow.folds'
+        FoldStore(path, KEY).append(1, 'fold 1')
+
+        store = FoldStore(path, 'other-key', resume=True)
+        assert len(store) == 0
+
+def test_foldstore_truncated_record():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        path = Path(tmpdirname) / 'workflow.folds'
+        store = FoldStore(path, KEY)
+        store.append(1, 'fold 1')
+        store.append(2, 'fold 2' * 100)
+
+        # cut off the last record as if the job died while writing it
+        content = path.read_bytes()
+        path.write_bytes(content[:-50])
+
+        resumed = FoldStore(path, KEY, resume=True)
+        assert len(resumed) == 1
+        resumed.append(2, 'fold 2')
+        assert FoldStore(path, KEY, resume=True).get(2) == 'fold 2'
@@ -57,6 +57,39 @@ def test_get_entry_error():
     with pytest.raises(KeyError):
         config_handler.get_entry(test_dict, 'Test3')
 
+def test_read_config_cache(monkeypatch):
+    calls = []
+    read_yaml = config_handler.read_yaml
+    monkeypatch.setattr(config_handler, 'read_yaml', lambda f: calls.append(f) or read_yaml(f))
+    config_handler.clear_config_cache()
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        yaml_file = os.path.join(tmpdirname, TEST_NAME_YAML)
+        config_handler.write_yaml(yaml_file, TEST_DICT)
 
+        first = config_handler.read_config(yaml_file)
+        first['PATHS']['Test1'] = 100
+        second = config_handler.read_config(yaml_file)
+        # parsed once, every call gets its own copy
+        assert len(calls) == 1
+        assert second == TEST_DICT
 
-    
\ No newline at end of file
+        # a changed file is parsed again
+        config_handler.write_yaml(yaml_file, {'Test3': 3, 'Test4': 4})
+        os.utime(yaml_file, ns=(0, os.stat(yaml_file).st_mtime_ns + 1))
+        assert config_handler.read_config(yaml_file) == {'Test3': 3, 'Test4': 4}
+        assert len(calls) == 2
+
+def test_read_config_validate():
+    def validate(config, config_file):
+        if 'PATHS' not in config:
+            raise ValueError(f"{config_file} has no PATHS")
+    config_handler.clear_config_cache()
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        yaml_file = os.path.join(tmpdirname, TEST_NAME_YAML)
+        config_handler.write_yaml(yaml_file, TEST_DICT)
+        assert config_handler.read_config(yaml_file, validate=validate) == TEST_DICT
+
+        config_handler.write_yaml(yaml_file, {'Test3': 3})
+        os.utime(yaml_file, ns=(0, os.stat(yaml_file).st_mtime_ns + 1))
+        with pytest.raises(ValueError):
+            config_handler.read_config(yaml_file, validate=validate)
@@ -1,7 +1,11 @@
-from src.cv import CVGenerator, CVSpec
+from src.cv import CVGenerator, CVSpec, SplitStore
 
 from sklearn.model_selection import GridSearchCV
 from sklearn.model_selection import KFold, RepeatedStratifiedKFold
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import tempfile
 
 N_SPLITS = 5
 N_REPEATS = 1
@@ -57,3 +61,42 @@ def test_generate_grid_search():
     assert isinstance(grid_search, GridSearchCV)
 
 
+
+def _generate_data():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'group': rng.integers(0, 3, 50).astype(str), 'x': rng.normal(size=50)})
+
+def test_materialize_matches_generators():
+    data = _generate_data()
+    cv_spec = CVSpec(n_splits=N_SPLITS, n_repeats=3, random_state=RANDOM_STATE, shuffle=SHUFFLE)
+    cv = CVGenerator(cv_spec)
+    split_store = cv.materialize(data, 'group')
+
+    assert isinstance(split_store, SplitStore)
+    assert split_store.outer_fold.dtype == np.int32
+    assert split_store.get_n_splits() == N_SPLITS * 3
+
+    expected = list(cv.generate_outer().split(data, data['group']))
+    actual = list(split_store.split())
+    assert len(expected) == len(actual)
+    for k, ((train, test), (train_actual, test_actual)) in enumerate(zip(expected, actual), start=1):
+        assert np.array_equal(train, train_actual)
+        assert np.array_equal(test, test_actual)
+        # inner splits index the outer training set like GridSearchCV(cv=KFold) does
+        for (inner_train, inner_test), (inner_train_actual, inner_test_actual) in zip(
+                cv.generate_inner().split(train), split_store.inner_cv(k).split()):
+            assert np.array_equal(inner_train, inner_train_actual)
+            assert np.array_equal(inner_test, inner_test_actual)
+
+def test_materialize_load():
+    data = _generate_data()
+    cv = CVGenerator(CVSpec(n_splits=N_SPLITS, n_repeats=2, random_state=RANDOM_STATE, shuffle=SHUFFLE))
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        split_store = cv.materialize(data, 'group', Path(tmpdirname))
+        loaded = cv.materialize(data, 'group', Path(tmpdirname))
+
+        assert len(list(Path(tmpdirname).iterdir())) == 1
+        assert isinstance(loaded.outer_fold, np.memmap)
+        assert loaded.key == split_store.key
+        assert np.array_equal(loaded.outer_fold, split_store.outer_fold)
+        assert np.array_equal(loaded.inner_fold, split_store.inner_fold)
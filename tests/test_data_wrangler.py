@@ -0,0 +1,97 @@
+from src.data_wrangler import DataWrangler, DataSpec, WorklistCache
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import tempfile
+import os
+from pathlib import Path
+import pytest
+
+def _worklist():
+    rng = np.random.default_rng(0)
+    n = 40
+    return pd.DataFrame({
+        'pet_id': [f'p{i}' for i in range(n)],
+        'subject_id': [f's{i // 2}' for i in range(n)],
+        'tracer': rng.choice(['a', 'C'], n),
+        'camera': rng.choice(['GE', 'HRRT'], n),
+        'type': rng.choice(['control', 'patient'], n),
+        'sex': rng.choice(['male', 'female'], n),
+        'chron_age': rng.uniform(20, 80, n),
+        'roi': rng.normal(size=n),
+    })
+
+@pytest.fixture
+def worklist_file():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        path = Path(tmpdirname) / 'database.xlsx'
+        _worklist().to_excel(path, index=False)
+        yield path
+
+def _count_read_excel(monkeypatch):
+    calls = []
+    read_excel = pd.read_excel
+    monkeypatch.setattr(pd, 'read_excel', lambda *args, **kwargs: calls.append(args) or read_excel(*args, **kwargs))
+    return calls
+
+def test_worklist_cache_read(worklist_file, monkeypatch):
+    calls = _count_read_excel(monkeypatch)
+    cache = WorklistCache(worklist_file)
+    expected = pd.read_excel(worklist_file, index_col='pet_id')
+
+    pd.testing.assert_frame_equal(cache.read(), expected)
+    selected = cache.read(ds.field('tracer') == 'C', columns=['chron_age'])
+    pd.testing.assert_frame_equal(selected, expected.loc[expected.tracer == 'C', ['chron_age']])
+    assert cache.count(ds.field('tracer') == 'C') == (expected.tracer == 'C').sum()
+    # the worklist is read once for the cache (and once above for the expectation)
+    assert len(calls) == 2
+
+def test_worklist_cache_invalidation(worklist_file, monkeypatch):
+    calls = _count_read_excel(monkeypatch)
+    cache = WorklistCache(worklist_file)
+    cache.read()
+    assert len(calls) == 1
+
+    # touched but unchanged: cache is kept
+    stat = os.stat(worklist_file)
+    os.utime(worklist_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    cache.read()
+    assert len(calls) == 1
+
+    # changed content: cache is rebuilt
+    _worklist().head(10).to_excel(worklist_file, index=False)
+    assert len(cache.read()) == 10
+    assert len(calls) == 2
+
+@pytest.mark.parametrize('tracer', ['a', 'C', None])
+def test_prepare_data(worklist_file, tracer):
+    spec = DataSpec(worklist_file, ['sex'], ['roi'], tracer, ['control'])
+    wrangler = DataWrangler(spec)
+    wrangler.prepare_data()
+
+    # reference: load everything and filter in memory
+    reference = DataWrangler(spec)
+    reference._load_data(worklist_file)
+    reference._select_tracer(tracer)
+    reference._remove_hrrt_altanserin()
+    reference._remove_second_scan()
+    reference._remove_nan()
+    reference._keep_type(['control'])
+
+    assert wrangler.get_data().index.tolist() == reference.data.index.tolist()
+    assert 'roi' not in wrangler.get_data().columns
+
+def test_prepare_data_compact(worklist_file):
+    default = DataWrangler(DataSpec(worklist_file, ['sex'], [], None, ['control', 'patient']))
+    compact = DataWrangler(DataSpec(worklist_file, ['sex'], [], None, ['control', 'patient'], compact=True))
+    default.prepare_data()
+    compact.prepare_data()
+    data, compact_data = default.get_data(), compact.get_data()
+
+    assert compact_data['roi'].dtype == np.float32
+    assert compact_data['chron_age'].dtype == np.float64
+    assert compact_data['sex_male'].dtype == np.uint8
+    assert compact_data['chron_age_group'].dtype == 'category'
+    assert compact_data['chron_age_group'].astype(str).tolist() == data['chron_age_group'].tolist()
+    np.testing.assert_allclose(compact_data['roi'], data['roi'], rtol=1e-6)
+    assert compact_data['roi'].nbytes == data['roi'].nbytes // 2
@@ -2,7 +2,16 @@
 from src import estimator
 from sklearn.gaussian_process import GaussianProcessRegressor
 from sklearn.gaussian_process.kernels import RBF
+from sklearn.model_selection import GridSearchCV, KFold, LeaveOneOut
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import StackingRegressor
+from sklearn.linear_model import BayesianRidge, Ridge
+from sklearn.compose import ColumnTransformer
 import numpy as np
+import pandas as pd
+import pytest
+import tempfile
 
 def test_estimator_gpr_kernel_none():
     gpr_expected = GaussianProcessRegressor()
@@ -62,4 +71,149 @@ def test_pyment():
     pyment.fit(x)
     y_pred = pyment.predict(x)
     assert np.all(x == y_pred)
-    assert pyment.n_features_in_ == 2
\ No newline at end of file
+    assert pyment.n_features_in_ == 2
+def test_gpr_grid_search_matches_grid_search():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(40, 3)), columns=['a', 'b', 'c'])
+    y = pd.Series(X['a'] * 2 - X['b'] + rng.normal(scale=0.1, size=40))
+    pipe = Pipeline([('scaler', StandardScaler()), ('model', GaussianProcessRegressor(kernel=RBF(), optimizer=None))])
+    paramgrid = {'model__alpha': [0.01, 0.1, 1, 10], 'model__kernel__length_scale': [0.1, 1, 5]}
+    cv = KFold(n_splits=4, shuffle=True, random_state=42)
+
+    expected = GridSearchCV(pipe, paramgrid, cv=cv, scoring='neg_mean_absolute_error').fit(X, y)
+    actual = estimator.GPRGridSearchCV(pipe, paramgrid, cv=cv).fit(X, y)
+
+    assert actual.best_params_ == expected.best_params_
+    assert np.allclose(actual.cv_results_['mean_test_score'], expected.cv_results_['mean_test_score'])
+    assert np.allclose(actual.best_estimator_.predict(X), expected.best_estimator_.predict(X))
+    # one factorization per length scale and fold, plus refit
+    assert actual.n_fits_ == 3 * 4 + 1
+
+def test_gpr_grid_search_requires_fixed_kernel():
+    pipe = Pipeline([('model', GaussianProcessRegressor(kernel=RBF()))])
+    search = estimator.GPRGridSearchCV(pipe, {'model__alpha': [0.1, 1]}, cv=2)
+    with pytest.raises(ValueError):
+        search.fit(np.zeros((4, 1)), np.zeros(4))
+
+def _ridge_data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(40, 5)), columns=list('abcde'))
+    y = pd.Series(X.to_numpy() @ rng.normal(size=5) + rng.normal(size=40) + 4)
+    return X, y
+
+def test_ridge_path_search_matches_grid_search():
+    X, y = _ridge_data()
+    pipe = Pipeline([('model', Ridge())])
+    paramgrid = {'model__alpha': [0.01, 0.1, 1, 10, 100], 'model__fit_intercept': [True, False]}
+    cv = KFold(n_splits=4, shuffle=True, random_state=42)
+
+    expected = GridSearchCV(pipe, paramgrid, cv=cv, scoring='neg_mean_absolute_error').fit(X, y)
+    actual = estimator.RidgePathSearchCV(pipe, paramgrid, cv=cv).fit(X, y)
+
+    assert actual.best_params_ == expected.best_params_
+    assert np.allclose(actual.cv_results_['mean_test_score'], expected.cv_results_['mean_test_score'])
+    assert np.allclose(actual.cv_results_['split3_test_score'], expected.cv_results_['split3_test_score'])
+    assert np.allclose(actual.best_estimator_.predict(X), expected.best_estimator_.predict(X))
+    # one decomposition per fit_intercept value, plus refit
+    assert actual.n_fits_ == 2 + 1
+
+def test_ridge_path_search_with_preprocessing_matches_grid_search():
+    X, y = _ridge_data()
+    X = X * [1, 2, 5, 10, 100]
+    pipe = Pipeline([('scaler', StandardScaler()), ('model', Ridge())])
+    paramgrid = {'model__alpha': [0.01, 0.1, 1, 10, 100], 'model__fit_intercept': [True, False]}
+    cv = KFold(n_splits=4, shuffle=True, random_state=42)
+
+    expected = GridSearchCV(pipe, paramgrid, cv=cv, scoring='neg_mean_absolute_error').fit(X, y)
+    actual = estimator.RidgePathSearchCV(pipe, paramgrid, cv=cv).fit(X, y)
+
+    assert actual.best_params_ == expected.best_params_
+    assert np.allclose(actual.cv_results_['mean_test_score'], expected.cv_results_['mean_test_score'])
+    assert np.allclose(actual.cv_results_['split3_test_score'], expected.cv_results_['split3_test_score'])
+    # the scaler is fit on every inner training set: one decomposition per fit_intercept value and split
+    assert actual.n_fits_ == 2 * 4 + 1
+
+def test_ridge_path_search_loo_requires_no_preprocessing():
+    pipe = Pipeline([('scaler', StandardScaler()), ('model', Ridge())])
+    search = estimator.RidgePathSearchCV(pipe, {'model__alpha': [0.1, 1]}, loo=True)
+    with pytest.raises(ValueError):
+        search.fit(np.arange(20.).reshape(10, 2), np.arange(10.))
+
+def test_ridge_path_search_loo_matches_grid_search():
+    X, y = _ridge_data()
+    pipe = Pipeline([('model', Ridge())])
+    paramgrid = {'model__alpha': [0.01, 0.1, 1, 10, 100]}
+
+    expected = GridSearchCV(pipe, paramgrid, cv=LeaveOneOut(), scoring='neg_mean_absolute_error').fit(X, y)
+    actual = estimator.RidgePathSearchCV(pipe, paramgrid, loo=True).fit(X, y)
+
+    assert actual.best_params_ == expected.best_params_
+    assert np.allclose(actual.cv_results_['mean_test_score'], expected.cv_results_['mean_test_score'])
+    assert actual.n_splits_ == len(X)
+
+def test_ridge_path_search_requires_ridge():
+    search = estimator.RidgePathSearchCV(Pipeline([('model', BayesianRidge())]), {'model__alpha_1': [0.1, 1]})
+    with pytest.raises(ValueError):
+        search.fit(np.zeros((4, 1)), np.zeros(4))
+
+
+class CountingRidge(Ridge):
+    n_fits = 0
+    def fit(self, X, y, sample_weight=None):
+        CountingRidge.n_fits += 1
+        return super().fit(X, y, sample_weight)
+
+def _stacking_data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(50, 4)), columns=['mri_a', 'mri_b', 'pet_a', 'pet_b'])
+    y = pd.Series(X['mri_a'] * 2 - X['pet_b'] + rng.normal(scale=0.1, size=50))
+    return X, y
+
+def _base_learner(pattern, model):
+    ct = ColumnTransformer([(pattern, 'passthrough', [f'{pattern}_a', f'{pattern}_b'])])
+    return Pipeline([('ct', ct), ('model', model)])
+
+def test_cached_stacking_matches_stacking():
+    X, y = _stacking_data()
+    estimators = [('mri', _base_learner('mri', Ridge())), ('pet', _base_learner('pet', Ridge(alpha=10)))]
+    expected = StackingRegressor(estimators, BayesianRidge()).fit(X, y)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        actual = estimator.CachedStackingRegressor(estimators, BayesianRidge(), memory=tmpdirname).fit(X, y)
+        assert np.allclose(actual.predict(X), expected.predict(X))
+        assert np.allclose(actual.predict(X, return_std=True)[1], expected.predict(X, return_std=True)[1])
+        assert list(actual.named_estimators_) == ['mri', 'pet']
+
+def test_cached_stacking_params_match_stacking():
+    X, y = _stacking_data()
+    estimators = [('mri', _base_learner('mri', Ridge())), ('pet', _base_learner('pet', Ridge(alpha=10)))]
+    expected = StackingRegressor(estimators, BayesianRidge())
+    actual = estimator.CachedStackingRegressor(estimators, BayesianRidge())
+    assert set(actual.get_params()) == set(expected.get_params()) | {'memory'}
+
+    expected.set_params(passthrough=True, pet__model__alpha=1).fit(X, y)
+    actual.set_params(passthrough=True, pet__model__alpha=1).fit(X, y)
+    assert actual.estimators[1][1]['model'].alpha == 1
+    assert np.allclose(actual.predict(X), expected.predict(X))
+
+    # a dropped base learner is left out, as in StackingRegressor
+    actual.set_params(mri='drop').fit(X, y)
+    assert list(actual.named_estimators_) == ['pet']
+
+def test_cached_stacking_reuses_base_learners():
+    X, y = _stacking_data()
+    CountingRidge.n_fits = 0
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        ensemble = estimator.CachedStackingRegressor(
+            [('mri', _base_learner('mri', CountingRidge())), ('pet', _base_learner('pet', CountingRidge()))],
+            BayesianRidge(), memory=tmpdirname)
+        ensemble.fit(X, y)
+        # 5 out-of-fold fits and one fit on all data per base learner
+        assert CountingRidge.n_fits == 2 * 6
+
+        # changing one base learner (as a grid candidate does) only refits that learner
+        ensemble.set_params(pet__model__alpha=10).fit(X, y)
+        assert CountingRidge.n_fits == 3 * 6
+
+        # the same base learners in another ensemble are not refit
+        estimator.CachedStackingRegressor(ensemble.estimators, BayesianRidge(alpha_1=1e-3), memory=tmpdirname).fit(X, y)
+        assert CountingRidge.n_fits == 3 * 6
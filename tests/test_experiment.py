@@ -0,0 +1,78 @@
+from src.experiment import ExperimentResults, ExperimentRunner
+from src.result_store import ResultStore
+from src.workflow import WorkflowResults
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+import tempfile
+
+def _workflow_results(name, subjects, folds, pred, true):
+    results = pd.DataFrame({'index': subjects, 'fold': folds, 'pred': pred, 'std': np.zeros(len(pred)), 'true': true})
+    return WorkflowResults(name, pd.DataFrame(), results, pd.DataFrame(), pd.DataFrame())
+
+def _merge_predictions(results):
+    """Predictions matrix by merging the workflow results one after another."""
+    frames = [result.results.rename(columns={'pred': result.name, 'index': 'subject_id'}).drop(columns=['std'])
+              for result in results]
+    merged = frames[0]
+    for frame in frames[1:]:
+        merged = pd.merge(merged, frame, on=['true', 'subject_id', 'fold'])
+    return merged
+
+def test_compress_predictions():
+    subjects = np.array(['a1', 'a2', 'C3', 'C4'] * 2)
+    folds = np.repeat([1., 2.], 4)
+    true = np.tile([20., 30., 40., 50.], 2)
+    # the second workflow has its rows in another order
+    order = np.array([7, 6, 5, 4, 3, 2, 1, 0])
+    results = [
+        _workflow_results('pipeline-I_dummy', subjects, folds, true + 1, true),
+        _workflow_results('pipeline-IIa_bridge', subjects[order], folds[order], (true + 2)[order], true[order]),
+    ]
+    experiment = ExperimentResults('experiment', pd.DataFrame(), results, None)
+
+    expected = _merge_predictions(results)
+    actual = experiment.predictions
+    assert np.shares_memory(actual['pipeline-IIa_bridge'].to_numpy(), experiment.prediction_matrix)
+    assert list(actual.columns) == ['subject_id', 'fold', 'true', 'pipeline-I_dummy', 'pipeline-IIa_bridge']
+    pd.testing.assert_frame_equal(actual[expected.columns], expected)
+    assert experiment.prediction_matrix.shape == (8, 2)
+    np.testing.assert_array_equal(experiment.prediction_matrix[:, 1], true + 2)
+
+def test_compress_predictions_missing_rows():
+    subjects = np.array([0, 1, 2, 3])
+    folds = np.array([1, 1, 2, 2], dtype=np.int32)
+    true = np.array([20., 30., 40., 50.])
+    results = [
+        _workflow_results('pipeline-I_dummy', subjects, folds, true, true),
+        _workflow_results('pipeline-I_bridge', subjects[:3], folds[:3], true[:3], true[:3]),
+    ]
+    experiment = ExperimentResults('experiment', pd.DataFrame(), results, None)
+    assert experiment.predictions['subject_id'].tolist() == [0, 1, 2]
+    assert not experiment.predictions.isna().any().any()
+
+def _runner(resultdir, workflow_names):
+    runner = ExperimentRunner.__new__(ExperimentRunner)
+    runner.name, runner.resultdir = 'experiment', Path(resultdir)
+    runner.workflows = [SimpleNamespace(name=name) for name in workflow_names]
+    return runner
+
+def test_load_falls_back_to_csv_for_workflows_missing_in_store():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        subjects, folds, true = np.arange(4), np.ones(4), np.arange(4.)
+        store = ResultStore(tmpdirname, 'experiment')
+        store.save(_workflow_results('pipeline-I_dummy', subjects, folds, true + 1, true))
+        store.save_data(pd.DataFrame({'age': true}, index=pd.Index(subjects, name='pet_id')))
+        # workflow of a run before the result store existed
+        legacy = _workflow_results('pipeline-IIa_bridge', subjects, folds, true + 2, true)
+        for table in ['scores', 'results', 'best_params', 'weights']:
+            getattr(legacy, table).to_csv(Path(tmpdirname) / f'experiment_pipeline-IIa_bridge_{table}.csv')
+
+        results = _runner(tmpdirname, ['pipeline-I_dummy', 'pipeline-IIa_bridge']).load()
+        assert [result.name for result in results.results] == ['pipeline-I_dummy', 'pipeline-IIa_bridge']
+        assert results.results[1].results['pred'].tolist() == (true + 2).tolist()
+
+        with pytest.raises(FileNotFoundError, match='pipeline-III_rvm'):
+            _runner(tmpdirname, ['pipeline-I_dummy', 'pipeline-III_rvm']).load()
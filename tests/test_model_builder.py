@@ -3,7 +3,7 @@ import tempfile
 import yaml
 from sklearn.dummy import DummyRegressor
 
-from src.model_builder import ModelBuilder, ModelRepresentation
+from src.model_builder import ModelBuilder, ModelRepresentation, validate_model_config
 from src.test_config import model_config
 
 def test_model_representation():
@@ -39,3 +39,11 @@ def test_build_model(model_config):
         assert isinstance(model_rep.model, DummyRegressor)
         assert model_rep.paramgrid == {}
 
+
+def test_validate_model_config(model_config):
+    validate_model_config(model_config)
+    with pytest.raises(ValueError):
+        validate_model_config({'missing': {'name': 'dummyregressor'}})
+    with pytest.raises(ValueError):
+        validate_model_config({'search': {'name': 'dummyregressor', 'paramgrid': {}, 'search': 'unknown'}})
+    validate_model_config({'search': {'name': 'dummyregressor', 'paramgrid': {}, 'search': {'strategy': 'halving'}}})
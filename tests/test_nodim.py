@@ -25,3 +25,23 @@ def test_nodim():
     param2 = nodim.estimate_params(measure2)
     transformed = nodim.transform_nodim(param1,param2,measure1)
     assert np.allclose(transformed,measure2)
+
+def test_nodim_analytic():
+    """ test if the closed-form mapping matches the interpolated one """
+    population = simulation.get_population(20,60,100,seed=42)
+    measure1 = simulation.ageing(population,-0.01,2,noise_level=0.1,seed=1)
+    measure2 = simulation.ageing(population,-0.03,4,noise_level=0.1,seed=2)
+    param1 = nodim.estimate_params(measure1)
+    param2 = nodim.estimate_params(measure2)
+    expected = nodim.transform_nodim(param1,param2,measure1)
+    actual = nodim.transform_nodim_analytic(param1,param2,measure1)
+    assert np.allclose(actual,expected,atol=1e-4)
+
+def test_nodim_analytic_columns():
+    """ test if all columns of a 2-D array are mapped with their own parameters """
+    values = np.array([[0., 10.], [1., 12.], [-20., 100.]])
+    param1 = {'mu': [0., 10.], 'std': [1., 2.]}
+    param2 = {'mu': [5., 0.], 'std': [2., 1.]}
+    transformed = nodim.transform_nodim_analytic(param1,param2,values)
+    expected = np.array([[5., 0.], [7., 1.], [-35., 45.]])
+    assert np.allclose(transformed,expected)
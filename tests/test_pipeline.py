@@ -1,5 +1,5 @@
 import pytest
-from src.pipeline import PipelineBuilder, PipelineRepresentation
+from src.pipeline import PipelineBuilder, PipelineRepresentation, validate_pipeline_config
 from src.transform import SelectCols
 from src.test_config import pipe_config
 from sklearn.preprocessing import StandardScaler
@@ -34,3 +34,10 @@ def test_pipeline_builder(pipe_config):
         assert pipeline.steps[1][0] == 'colselector'
         assert isinstance(pipeline.steps[0][1], StandardScaler)
         assert isinstance(pipeline.steps[1][1], SelectCols)
+
+def test_validate_pipeline_config(pipe_config):
+    validate_pipeline_config(pipe_config)
+    with pytest.raises(ValueError):
+        validate_pipeline_config({'pipeline': {'descr': 'no steps'}})
+    with pytest.raises(ValueError):
+        validate_pipeline_config({'pipeline': {'descr': 'unnamed step', 'steps': [{'kwargs': {}}]}})
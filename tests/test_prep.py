@@ -2,7 +2,7 @@
 import numpy as np
 import pandas as pd
 
-from src.prep import bin_data, get_subsample
+from src.prep import bin_data, get_subsample, get_subsample_index
 
 def _generate_data():
     """ Generate data for testing """
@@ -28,6 +28,15 @@ def _generate_data():
     # combine dataframes and return
     return df
 
+def test_bin_data_categorical():
+    df = pd.DataFrame({'age': np.array([-1., 0., 2.4, 2.5, 4., 99.9, 100., 102.5, 103.])})
+    expected = bin_data(df.copy(), 'age', min_val=0.0, max_val=100.0, step=2.5)
+    actual = bin_data(df.copy(), 'age', min_val=0.0, max_val=100.0, step=2.5, categorical=True)
+    assert actual['age_group'].dtype == 'category'
+    # same labels, missing instead of 'nan' outside of the bins
+    assert actual['age_group'].astype(str).tolist() == expected['age_group'].tolist()
+    assert actual['age_group'].isna().tolist() == (expected['age_group'] == 'nan').tolist()
+
 def test_bin_data():
     """ Test binning data """
     df = _generate_data()
@@ -97,4 +106,26 @@ def test_subsample_matched():
 
     assert np.array_equal(count_a, count_b)
 
-# %%
+def test_subsample_index_seeded():
+    """ Test that the subsample is reproducible with a seed or generator """
+    df = _generate_data()
+    df = bin_data(df, 'age', min_val=0.0, max_val=10.0, step=2)
+
+    index1 = get_subsample_index(df, 'cat_b', 'age_group', match_nsamples=True, random_state=42)
+    index2 = get_subsample_index(df, 'cat_b', 'age_group', match_nsamples=True, random_state=np.random.default_rng(42))
+
+    assert np.array_equal(index1, index2)
+    assert np.all(np.diff(index1) > 0)
+    assert get_subsample(df, 'cat_b', 'age_group', random_state=42).equals(df.iloc[index1])
+
+def test_subsample_index_matched():
+    """ Test that the index subsample matches the number of samples per bin """
+    df = _generate_data()
+    df = bin_data(df, 'age', min_val=0.0, max_val=10.0, step=2)
+
+    df_matched = df.iloc[get_subsample_index(df, 'cat_b', 'age_group', match_nsamples=True, random_state=0)]
+
+    count_a = df_matched[df_matched["cat_a"] == True]["age_group"].value_counts().sort_index()
+    count_b = df_matched[df_matched["cat_b"] == True]["age_group"].value_counts().sort_index()
+
+    assert count_a.equals(count_b)
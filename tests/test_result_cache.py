@@ -0,0 +1,75 @@
+from src.result_cache import ResultCache
+from src.workflow import WorkflowBuilder, WorkFlowSpecs, WorkflowResults
+from src.test_config import pipe_config, model_config
+import numpy as np
+import pandas as pd
+import tempfile
+import yaml
+from pathlib import Path
+
+PIPE_NAME = 'pipeline-test'
+ROIS = ['rois']
+
+def _build_workflows(tmpdirname, pipe_config, model_config, model_names):
+    pipe_file = tmpdirname + '/pipe_file.yml'
+    model_file = tmpdirname + '/model_file.yml'
+    with open(pipe_file, 'w') as f:
+        yaml.dump(pipe_config, f)
+    with open(model_file, 'w') as f:
+        yaml.dump(model_config, f)
+    specs = [WorkFlowSpecs(pipe_file, model_file, PIPE_NAME, name, ROIS) for name in model_names]
+    return WorkflowBuilder.build(specs)
+
+def _results(name):
+    results = pd.DataFrame({'index': [0, 1], 'fold': [1, 1], 'pred': [1., 2.], 'std': [0., 0.], 'true': [1., 1.]})
+    return WorkflowResults(name, pd.DataFrame({'mae': [0.5]}), results, pd.DataFrame({0: [{'search': 'fixed'}]}),
+                           pd.DataFrame({'w': [1.]}), n_fits=1)
+
+def test_result_cache_key(pipe_config, model_config):
+    model_config['median'] = {'name': 'dummyregressor', 'kwargs': {'strategy': 'median'}, 'paramgrid': {}}
+    data = pd.DataFrame(np.zeros((4, 2)), columns=['a', 'b'])
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dummy, median, dummy_again = _build_workflows(tmpdirname, pipe_config, model_config, ['dummy', 'median', 'dummy'])
+
+        key = ResultCache.key(data, 'cv', dummy, 'a', 'b')
+        # same content, same key
+        assert key == ResultCache.key(data.copy(), 'cv', dummy_again, 'a', 'b')
+        # changed model, data or cv change the key
+        assert key != ResultCache.key(data, 'cv', median, 'a', 'b')
+        assert key != ResultCache.key(data + 1, 'cv', dummy, 'a', 'b')
+        assert key != ResultCache.key(data, 'other-cv', dummy, 'a', 'b')
+        # the batched flag only changes the key of workflows that can be batched
+        assert key == ResultCache.key(data, 'cv', dummy, 'a', 'b', batched=True)
+
+def test_result_cache_key_batched_and_code(pipe_config, model_config, monkeypatch):
+    model_config['bridge'] = {'name': 'bayesianridge', 'paramgrid': {}}
+    data = pd.DataFrame(np.zeros((4, 2)), columns=['a', 'b'])
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        bridge, = _build_workflows(tmpdirname, pipe_config, model_config, ['bridge'])
+
+        key = ResultCache.key(data, 'cv', bridge, 'a', 'b')
+        assert key != ResultCache.key(data, 'cv', bridge, 'a', 'b', batched=True)
+        # a change of the source code invalidates cached results
+        monkeypatch.setattr('src.result_cache.code_version', lambda: 'changed')
+        assert key != ResultCache.key(data, 'cv', bridge, 'a', 'b')
+
+def test_result_cache_get_put():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        cache = ResultCache(Path(tmpdirname) / 'results')
+        assert cache.get('key', 'pipe_model') is None
+
+        cache.put('key', _results('pipe_model'))
+        assert 'key' in cache
+
+        cached = cache.get('key', 'other_model')
+        assert cached.name == 'other_model'
+        assert cached.model_name == 'model'
+        assert cached.results.equals(_results('pipe_model').results)
+        assert cached.best_params[0].tolist() == [{'search': 'fixed'}]
+        assert cached.n_fits == 1
+
+def test_result_cache_corrupt_file():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        cache = ResultCache(tmpdirname)
+        (Path(tmpdirname) / 'key.pkl').write_bytes(b'not a pickle')
+        assert cache.get('key', 'pipe_model') is None
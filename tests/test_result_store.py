@@ -0,0 +1,64 @@
+from src.result_store import ResultStore
+from src.workflow import WorkflowResults
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import tempfile
+import pytest
+
+def _results(name, n=6, offset=0.):
+    results = pd.DataFrame({'index': np.arange(n), 'fold': np.repeat(np.arange(1, 4, dtype=np.int32), n // 3),
+                            'pred': np.arange(n) + offset, 'std': np.zeros(n), 'true': np.ones(n)})
+    scores = pd.DataFrame({'r2': [0.1, 0.2, 0.3], 'mae': [1., 2., 3.]})
+    best_params = np.empty(3, dtype=object)
+    best_params[:] = [{'model__C': 1, 'search': 'grid', 'n_fits': 11}] * 3
+    weights = pd.DataFrame(np.arange(6.).reshape(3, 2) + offset, columns=['roi_b', 'roi_a'])
+    return WorkflowResults(name, scores, results, pd.DataFrame(best_params), weights)
+
+def test_result_store_roundtrip():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        store = ResultStore(tmpdirname, 'experiment')
+        assert not store.exists()
+        expected = _results('pipeline-I_lsvr')
+        store.save(expected)
+        assert store.exists()
+
+        actual = store.load('pipeline-I_lsvr')
+        assert actual.name == expected.name
+        pd.testing.assert_frame_equal(actual.results, expected.results)
+        pd.testing.assert_frame_equal(actual.scores, expected.scores)
+        pd.testing.assert_frame_equal(actual.weights, expected.weights)
+        assert actual.best_params[0].tolist() == expected.best_params[0].tolist()
+
+def test_result_store_replaces_workflow():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        store = ResultStore(tmpdirname, 'experiment')
+        store.save(_results('pipeline-I_lsvr'))
+        store.save(_results('pipeline-I_lsvr', offset=1.))
+        assert store.load('pipeline-I_lsvr').results['pred'].tolist() == list(np.arange(6) + 1.)
+
+def test_result_store_read_projection_and_filter():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        store = ResultStore(tmpdirname, 'experiment')
+        store.save(_results('pipeline-I_lsvr'))
+        store.save(_results('pipeline-I_dummy', offset=10.))
+        assert store.workflows() == ['pipeline-I_dummy', 'pipeline-I_lsvr']
+
+        df = store.read('predictions', columns=['pred'], workflows=['pipeline-I_dummy'], filter=ds.field('fold') == 2)
+        assert list(df.columns) == ['pred', 'workflow']
+        assert df['pred'].tolist() == [12., 13.]
+        assert set(df['workflow']) == {'pipeline-I_dummy'}
+
+        weights = store.read('weights', workflows=['pipeline-I_lsvr'])
+        assert weights['feature'].tolist()[:2] == ['roi_b', 'roi_a']
+
+        with pytest.raises(ValueError):
+            store.read('unknown')
+
+def test_result_store_data():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        store = ResultStore(tmpdirname, 'experiment')
+        data = pd.DataFrame({'chron_age': [20., 30.], 'sex_male': [1, 0]}, index=pd.Index(['p1', 'p2'], name='pet_id'))
+        store.save_data(data)
+        pd.testing.assert_frame_equal(store.load_data(), data)
+        assert list(store.load_data(columns=['chron_age']).columns) == ['chron_age']
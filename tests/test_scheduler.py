@@ -0,0 +1,57 @@
+from src.scheduler import TaskTimings, expected_fits, estimate_cost, FAMILY_COST
+from sklearn.pipeline import Pipeline
+from sklearn.dummy import DummyRegressor
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import StandardScaler
+from types import SimpleNamespace
+from pathlib import Path
+import tempfile
+
+def _workflow(name='pipe_model', model=None, paramgrid=None, search='grid'):
+    model = model if model is not None else DummyRegressor()
+    return SimpleNamespace(name=name, pipeline=Pipeline([('model', model)]), paramgrid=paramgrid or {}, search=search)
+
+def test_expected_fits():
+    cv = KFold(n_splits=5)
+    grid = {'model__alpha': [0.1, 1, 10], 'model__kernel': ['a', 'b']}
+    assert expected_fits(_workflow(), cv) == 1
+    assert expected_fits(_workflow(paramgrid=grid), cv) == 6 * 5 + 1
+    assert expected_fits(_workflow(paramgrid=grid, search='gpr'), cv) == 2 * 5 + 1
+    assert expected_fits(_workflow(paramgrid=grid, search={'strategy': 'sequential', 'n_iter': 4}), cv) == 4 * 5 + 1
+    assert expected_fits(_workflow(paramgrid=grid, search='halving'), cv) < 6 * 5 + 1
+    assert expected_fits(_workflow(paramgrid=grid, search='ridgepath'), cv) == 2 + 1
+    scaled = _workflow(paramgrid=grid, search='ridgepath')
+    scaled.pipeline = Pipeline([('scaler', StandardScaler()), ('model', DummyRegressor())])
+    assert expected_fits(scaled, cv) == 2 * 5 + 1
+
+def test_estimate_cost():
+    cv = KFold(n_splits=5)
+    grid = {'model__alpha': [0.1, 1, 10]}
+    dummy = _workflow('pipe_dummy', paramgrid=grid)
+    gpr = _workflow('pipe_gpr', GaussianProcessRegressor(), paramgrid=grid)
+    assert estimate_cost(dummy, cv) == 16 * FAMILY_COST['DummyRegressor']
+    assert estimate_cost(gpr, cv) > estimate_cost(dummy, cv)
+
+    # recorded timings replace the family cost
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        timings = TaskTimings(Path(tmpdirname) / 'timings.json')
+        timings.record('pipe_dummy', seconds=32.0, n_fits=16)
+        assert estimate_cost(dummy, cv, timings) == 16 * 2.0
+        assert estimate_cost(gpr, cv, timings) == estimate_cost(gpr, cv)
+
+def test_task_timings_save_load():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        path = Path(tmpdirname) / 'timings.json'
+        timings = TaskTimings(path)
+        assert timings.get('pipe_model') is None
+        timings.record('pipe_model', seconds=3.0, n_fits=6)
+        timings.record('pipe_resumed', seconds=0.0, n_fits=0)
+        timings.save()
+
+        loaded = TaskTimings(path)
+        assert loaded.get('pipe_model') == 0.5
+        assert loaded.get('pipe_resumed') is None
+
+        path.write_text('not json')
+        assert TaskTimings(path).get('pipe_model') is None
@@ -0,0 +1,80 @@
+from src.search import SearchBuilder, SequentialSearchCV, count_fits
+from src.estimator import GPRGridSearchCV, RidgePathSearchCV
+
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, KFold
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.dummy import DummyRegressor
+import numpy as np
+import pytest
+
+PARAMGRID = {'model__strategy': ['mean', 'median']}
+
+def _pipeline():
+    return Pipeline([('model', DummyRegressor())])
+
+def test_search_builder_grid():
+    search = SearchBuilder.build('grid', _pipeline(), PARAMGRID, cv=KFold(n_splits=2))
+    assert isinstance(search, GridSearchCV)
+
+def test_search_builder_gpr():
+    search = SearchBuilder.build('gpr', _pipeline(), PARAMGRID, cv=KFold(n_splits=2))
+    assert isinstance(search, GPRGridSearchCV)
+
+def test_search_builder_ridgepath():
+    search = SearchBuilder.build({'strategy': 'ridgepath', 'loo': True}, Pipeline([('model', Ridge())]),
+                                 {'model__alpha': [0.1, 1]}, cv=KFold(n_splits=2))
+    assert isinstance(search, RidgePathSearchCV)
+    assert search.loo
+    search.fit(np.arange(20.).reshape(10, 2) ** 0.5, np.arange(10.))
+    # one decomposition and the refit
+    assert count_fits(search) == 2
+
+def test_search_builder_invalid():
+    with pytest.raises(ValueError):
+        SearchBuilder.build('invalid', _pipeline(), PARAMGRID, cv=KFold(n_splits=2))
+
+def test_count_fits_grid():
+    search = SearchBuilder.build('grid', _pipeline(), PARAMGRID, cv=KFold(n_splits=3))
+    search.fit(np.zeros((9, 1)), np.arange(9.))
+    assert count_fits(search) == 2 * 3 + 1
+
+def test_search_builder_halving():
+    search = SearchBuilder.build({'strategy': 'halving', 'factor': 2}, _pipeline(), PARAMGRID, cv=KFold(n_splits=2))
+    assert isinstance(search, HalvingGridSearchCV)
+    assert search.factor == 2
+
+def test_count_fits_halving():
+    search = SearchBuilder.build('halving', _pipeline(), PARAMGRID, cv=KFold(n_splits=3))
+    search.fit(np.zeros((30, 1)), np.arange(30.))
+    assert count_fits(search) == sum(search.n_candidates_) * 3 + 1
+
+def test_sequential_search_budget():
+    paramgrid = {'model__alpha': [0.01, 0.1, 1, 10, 100], 'model__fit_intercept': [True, False]}
+    pipeline = Pipeline([('model', Ridge())])
+    search = SearchBuilder.build({'strategy': 'sequential', 'n_iter': 4, 'n_initial': 2, 'random_state': 0},
+                                 pipeline, paramgrid, cv=KFold(n_splits=3))
+    assert isinstance(search, SequentialSearchCV)
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(30, 3))
+    y = X @ np.array([1., 2., 3.]) + 10
+    search.fit(X, y)
+
+    assert len(search.cv_results_['params']) == 4
+    assert count_fits(search) == 4 * 3 + 1
+    assert search.best_params_ in search.cv_results_['params']
+    assert search.best_score_ == search.cv_results_['mean_test_score'].max()
+
+def test_sequential_search_exhaustive_matches_grid():
+    pipeline = Pipeline([('model', Ridge())])
+    paramgrid = {'model__alpha': [0.01, 1, 100]}
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(30, 3))
+    y = X @ np.array([1., 2., 3.])
+
+    sequential = SearchBuilder.build({'strategy': 'sequential', 'n_iter': 10}, pipeline, paramgrid, cv=KFold(n_splits=3)).fit(X, y)
+    grid = SearchBuilder.build('grid', pipeline, paramgrid, cv=KFold(n_splits=3)).fit(X, y)
+    assert sequential.best_params_ == grid.best_params_
+    assert len(sequential.cv_results_['params']) == 3
@@ -0,0 +1,31 @@
+from src.statistics import CorrelatedTTest, pairwise_correlated_ttest
+import numpy as np
+import pytest
+
+NAMES = ['a', 'b', 'c', 'd']
+
+def _scores(n_folds=20, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(5, 1, (n_folds, len(NAMES))) + np.arange(len(NAMES)) * 0.2
+
+@pytest.mark.parametrize('rope', [None, 0.1])
+def test_pairwise_correlated_ttest(rope):
+    scores = _scores()
+    table = pairwise_correlated_ttest(scores, NAMES, nruns=4, rope=rope)
+    assert len(table) == len(NAMES) * (len(NAMES) - 1)
+    assert not (table.a == table.b).any()
+
+    for row in table.itertuples():
+        ttest = CorrelatedTTest(scores[:, NAMES.index(row.a)], scores[:, NAMES.index(row.b)], 4)
+        tstat, p, zl, zu = ttest.ttest()
+        np.testing.assert_allclose([row.mu, row.var], [ttest.mu, ttest.var])
+        np.testing.assert_allclose([row.tstat, row.p, row.ci_lower, row.ci_upper], [tstat, p, zl, zu])
+        if rope is None:
+            np.testing.assert_allclose([row.p_l, row.p_u], ttest.probabilities())
+        else:
+            np.testing.assert_allclose([row.p_l, row.p_rope, row.p_u], ttest.probabilities(rope))
+
+def test_pairwise_correlated_ttest_antisymmetric():
+    table = pairwise_correlated_ttest(_scores(), NAMES, nruns=4).set_index(['a', 'b'])
+    np.testing.assert_allclose(table.loc[('a', 'c'), 'tstat'], -table.loc[('c', 'a'), 'tstat'])
+    np.testing.assert_allclose(table.loc[('a', 'c'), 'p'], table.loc[('c', 'a'), 'p'])
@@ -1,6 +1,18 @@
-from src.step_factory import Step, StepScaler, StepFactory
+from src.step_factory import Step, StepScaler, StepFactory, STEP_REGISTRY, ENSEMBLE_REGISTRY
 from src.test_config import step_config, supported_steps, get_step_config
 from sklearn.preprocessing import StandardScaler
+from pathlib import Path
+import subprocess
+import sys
+import pytest
+
+ROOT = Path(__file__).parent.parent
+# import time budget (seconds) of the modules scripts/run_experiment.py imports (about 1.0-1.3 s,
+# mostly pandas, scipy and sklearn.base)
+IMPORT_TIME_BUDGET = 1.6
+# modules only needed once a model step or search strategy uses them
+LAZY_MODULES = ('xgboost', 'statsmodels', 'sklearn.gaussian_process', 'sklearn.ensemble', 'sklearn.svm',
+                'sklearn.inspection', 'sklearn.model_selection._search_successive_halving', 'src.estimator')
 
 def test_step(step_config):
     step = Step(step_config)
@@ -34,5 +46,30 @@ def test_supported_steps(supported_steps):
         config = get_step_config(step)
         assert StepFactory.create_step(config) != None
 
+def test_step_factory_invalid():
+    with pytest.raises(ValueError):
+        StepFactory.create_step({'name': 'unknown'})
+
+def test_step_factory_ensemble():
+    name, object = StepFactory.create_step({'name': 'ens_lsvr', 'kwargs': {}})
+    assert name == 'ens_lsvr'
+    assert type(object).__name__ == 'CachedStackingRegressor'
+    assert type(object.estimators[0][1]['model']).__name__ == 'LinearSVR'
+    assert set(STEP_REGISTRY).isdisjoint(ENSEMBLE_REGISTRY)
+
+def _run_import(code):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return result
 
+def test_import_is_lazy():
+    result = _run_import(f"import sys, src.logsetup, src.experiment; print(sorted(m for m in {LAZY_MODULES} if m in sys.modules))")
+    assert result.stdout.strip() == '[]'
 
+def test_import_time_budget():
+    result = _run_import("import src.logsetup, src.experiment")
+    # -X importtime reports the cumulative time (us) of each top-level import
+    cumulative = {line.split('|')[2].strip(): int(line.split('|')[1]) for line in result.stderr.splitlines()
+                  if line.startswith('import time:') and not line.split('|')[2].startswith('  ')
+                  and line.split('|')[1].strip().isdigit()}
+    total = (cumulative['src.logsetup'] + cumulative['src.experiment']) / 1e6
+    assert total < IMPORT_TIME_BUDGET, f"importing run_experiment modules took {total:.2f}s"
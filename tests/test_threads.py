@@ -0,0 +1,37 @@
+from src.threads import ThreadBudget, available_cores, resolve_n_jobs
+from threadpoolctl import threadpool_info
+from joblib import Parallel, delayed
+
+def _max_threads():
+    return max([pool['num_threads'] for pool in threadpool_info()], default=1)
+
+def test_thread_budget_split():
+    budget = ThreadBudget(n_jobs=2, fold_jobs=4, n_cores=32)
+    assert budget.n_workers == 8
+    assert budget.threads_per_job == 4
+    assert 'oversubscribed' not in str(budget)
+    # never less than one thread per worker
+    assert ThreadBudget(n_jobs=8, fold_jobs=8, n_cores=16).threads_per_job == 1
+    assert ThreadBudget().n_cores == available_cores()
+
+def test_thread_budget_negative_n_jobs():
+    # n_jobs=-1 runs a worker per core, so each gets one native thread
+    budget = ThreadBudget(n_jobs=-1, fold_jobs=1, n_cores=16)
+    assert budget.n_workers == 16
+    assert budget.threads_per_job == 1
+    assert ThreadBudget(n_jobs=-2, fold_jobs=2, n_cores=16).n_workers == 30
+    assert resolve_n_jobs(None, 16) == 1
+    assert resolve_n_jobs(-32, 16) == 1
+
+def test_thread_budget_override():
+    budget = ThreadBudget(n_jobs=4, fold_jobs=1, n_cores=8, threads_per_job=4)
+    assert budget.threads_per_job == 4
+    assert 'oversubscribed: 16 threads' in str(budget)
+
+def test_thread_budget_limit():
+    budget = ThreadBudget(n_cores=1)
+    with budget.limit():
+        assert _max_threads() == 1
+        # joblib workers started inside inherit the limit
+        limits = Parallel(n_jobs=2)(delayed(_max_threads)() for _ in range(2))
+        assert limits == [1, 1]
@@ -1,5 +1,8 @@
 #%%
-from src.trainer import Trainer
+from src.trainer import Trainer, ResultAccumulator, FoldResult
+from src.scheduler import TaskTimings
+from src.checkpoint import FoldStore
+from src.cv import CVGenerator, CVSpec
 from src.workflow import WorkflowBuilder, WorkFlowSpecs, WorkflowResults
 import numpy as np
 import pandas as pd
@@ -8,6 +11,7 @@ from sklearn import set_config
 from src.test_config import pipe_config, model_config
 import yaml
 import tempfile
+from pathlib import Path
 import pytest
 
 set_config(transform_output="pandas")
@@ -56,3 +60,237 @@ def test_trainer(_generate_data, pipe_config, model_config):
         assert isinstance(workflow_results, WorkflowResults)
 
 # %%
+
+def test_trainer_fold_jobs(pipe_config, model_config):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        pipe_file = tmpdirname + f'/{PIPE_FILE}.yml'
+        model_file = tmpdirname + f'/{MODEL_FILE}.yml'
+
+        with open(pipe_file, 'w') as f:
+            yaml.dump(pipe_config, f)
+
+        with open(model_file, 'w') as f:
+            yaml.dump(model_config, f)
+
+        specs = WorkFlowSpecs(pipe_file, model_file, PIPE_NAME, MODEL_NAME, ROIS)
+        workflow = WorkflowBuilder.build([specs])[0]
+
+        rng = np.random.default_rng(42)
+        data = pd.DataFrame({'cat1': np.zeros(20), 'pyment': rng.normal(size=20), 'age': rng.normal(size=20)})
+
+        cv_inner = KFold(n_splits=2, shuffle=True, random_state=42)
+        cv_outer = KFold(n_splits=4, shuffle=True, random_state=42)
+        trainer = Trainer()
+
+        serial = trainer.train(data=data, strat_col="cat1", label_col="age", cv_inner=cv_inner,
+                               cv_outer=cv_outer, workflow=workflow)
+        parallel = trainer.train(data=data, strat_col="cat1", label_col="age", cv_inner=cv_inner,
+                                 cv_outer=cv_outer, workflow=workflow, fold_jobs=2)
+
+        pd.testing.assert_frame_equal(serial.results, parallel.results)
+        pd.testing.assert_frame_equal(serial.scores, parallel.scores)
+        pd.testing.assert_frame_equal(serial.weights, parallel.weights)
+        assert serial.best_params.equals(parallel.best_params)
+
+def test_trainer_pyment(model_config):
+    # pyment predicts the selected (n, 1) column, as in pipeline-I of every experiment
+    pipe_config = {'pipeline-I': {'descr': 'Pyment only', 'steps': [{'name': 'colselector', 'kwargs': {'keep': ['pyment']}}]}}
+    model_config['pyment'] = {'name': 'pyment', 'paramgrid': {}}
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        pipe_file = tmpdirname + f'/{PIPE_FILE}.yml'
+        model_file = tmpdirname + f'/{MODEL_FILE}.yml'
+
+        with open(pipe_file, 'w') as f:
+            yaml.dump(pipe_config, f)
+
+        with open(model_file, 'w') as f:
+            yaml.dump(model_config, f)
+
+        specs = WorkFlowSpecs(pipe_file, model_file, 'pipeline-I', 'pyment', ROIS)
+        workflow = WorkflowBuilder.build([specs])[0]
+
+        rng = np.random.default_rng(42)
+        data = pd.DataFrame({'cat1': np.zeros(20), 'pyment': rng.normal(size=20), 'age': rng.normal(size=20)})
+
+        cv_inner = KFold(n_splits=2, shuffle=True, random_state=42)
+        cv_outer = KFold(n_splits=4, shuffle=True, random_state=42)
+        trainer = Trainer()
+
+        serial = trainer.train(data=data, strat_col="cat1", label_col="age", cv_inner=cv_inner,
+                               cv_outer=cv_outer, workflow=workflow)
+        parallel = trainer.train(data=data, strat_col="cat1", label_col="age", cv_inner=cv_inner,
+                                 cv_outer=cv_outer, workflow=workflow, fold_jobs=2)
+
+        expected = data['pyment'].to_numpy()[serial.results['index'].to_numpy()]
+        np.testing.assert_array_equal(serial.results['pred'].to_numpy(), expected)
+        pd.testing.assert_frame_equal(serial.results, parallel.results)
+        pd.testing.assert_frame_equal(serial.scores, parallel.scores)
+
+def test_trainer_n_fits(_generate_data, pipe_config, model_config):
+    model_config['grid'] = {'name': 'dummyregressor', 'paramgrid': {'model__strategy': ['mean', 'median']}}
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        pipe_file = tmpdirname + f'/{PIPE_FILE}.yml'
+        model_file = tmpdirname + f'/{MODEL_FILE}.yml'
+
+        with open(pipe_file, 'w') as f:
+            yaml.dump(pipe_config, f)
+
+        with open(model_file, 'w') as f:
+            yaml.dump(model_config, f)
+
+        specs = [WorkFlowSpecs(pipe_file, model_file, PIPE_NAME, name, ROIS) for name in ['dummy', 'grid']]
+        single, grid = WorkflowBuilder.build(specs)
+
+        cv_inner = KFold(n_splits=2, shuffle=True, random_state=42)
+        cv_outer = KFold(n_splits=2, shuffle=True, random_state=42)
+        trainer = Trainer()
+
+        single_results = trainer.train(data=_generate_data, strat_col="cat1", label_col="age", cv_inner=cv_inner,
+                                       cv_outer=cv_outer, workflow=single)
+        grid_results = trainer.train(data=_generate_data, strat_col="cat1", label_col="age", cv_inner=cv_inner,
+                                     cv_outer=cv_outer, workflow=grid)
+
+        # one fit per outer fold without inner CV, (candidates x inner folds + refit) per outer fold otherwise
+        assert single_results.n_fits == 2
+        assert grid_results.n_fits == 2 * (2 * 2 + 1)
+        assert single_results.best_params[0].tolist() == [{'search': 'fixed', 'n_fits': 1}] * 2
+
+def test_trainer_resume(pipe_config, model_config):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        pipe_file = tmpdirname + f'/{PIPE_FILE}.yml'
+        model_file = tmpdirname + f'/{MODEL_FILE}.yml'
+        checkpoint_dir = Path(tmpdirname) / 'checkpoints'
+
+        with open(pipe_file, 'w') as f:
+            yaml.dump(pipe_config, f)
+
+        with open(model_file, 'w') as f:
+            yaml.dump(model_config, f)
+
+        specs = WorkFlowSpecs(pipe_file, model_file, PIPE_NAME, MODEL_NAME, ROIS)
+        workflow = WorkflowBuilder.build([specs])[0]
+
+        rng = np.random.default_rng(42)
+        data = pd.DataFrame({'cat1': np.zeros(20), 'pyment': rng.normal(size=20), 'age': rng.normal(size=20)})
+
+        cv_inner = KFold(n_splits=2, shuffle=True, random_state=42)
+        cv_outer = KFold(n_splits=4, shuffle=True, random_state=42)
+        trainer = Trainer()
+
+        full = trainer.train(data=data, strat_col="cat1", label_col="age", cv_inner=cv_inner,
+                             cv_outer=cv_outer, workflow=workflow, checkpoint_dir=checkpoint_dir)
+
+        # keep only the first two folds of the checkpoint
+        key = trainer._fingerprint(data, "cat1", "age", list(cv_outer.split(data)), [cv_inner] * 4, workflow)
+        complete = FoldStore(checkpoint_dir / f'{workflow.name}.folds', key, resume=True)
+        assert len(complete) == 4
+        partial = FoldStore(checkpoint_dir / f'{workflow.name}.folds', key, resume=False)
+        partial.append(1, complete.get(1))
+        partial.append(2, complete.get(2))
+
+        resumed = trainer.train(data=data, strat_col="cat1", label_col="age", cv_inner=cv_inner,
+                                cv_outer=cv_outer, workflow=workflow, checkpoint_dir=checkpoint_dir, resume=True)
+
+        pd.testing.assert_frame_equal(full.results, resumed.results)
+        pd.testing.assert_frame_equal(full.scores, resumed.scores)
+        assert resumed.n_fits == full.n_fits
+
+def test_trainer_split_store(pipe_config, model_config):
+    model_config['grid'] = {'name': 'dummyregressor', 'paramgrid': {'model__strategy': ['mean', 'median']}}
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        pipe_file = tmpdirname + f'/{PIPE_FILE}.yml'
+        model_file = tmpdirname + f'/{MODEL_FILE}.yml'
+
+        with open(pipe_file, 'w') as f:
+            yaml.dump(pipe_config, f)
+
+        with open(model_file, 'w') as f:
+            yaml.dump(model_config, f)
+
+        specs = WorkFlowSpecs(pipe_file, model_file, PIPE_NAME, 'grid', ROIS)
+        workflow = WorkflowBuilder.build([specs])[0]
+
+        rng = np.random.default_rng(42)
+        data = pd.DataFrame({'cat1': rng.integers(0, 2, 30), 'pyment': rng.normal(size=30), 'age': rng.normal(size=30)})
+
+        cv = CVGenerator(CVSpec(n_splits=3, n_repeats=2))
+        trainer = Trainer()
+
+        expected = trainer.train(data=data, strat_col="cat1", label_col="age", cv_inner=cv.generate_inner(),
+                                 cv_outer=cv.generate_outer(), workflow=workflow)
+        actual = trainer.train(data=data, strat_col="cat1", label_col="age", cv_inner=None,
+                               cv_outer=cv.materialize(data, "cat1"), workflow=workflow)
+
+        pd.testing.assert_frame_equal(expected.results, actual.results)
+        assert expected.best_params.equals(actual.best_params)
+
+def test_result_accumulator():
+    splits = [(None, np.array([2, 0])), (None, np.array([1])), (None, np.array([3, 4, 5]))]
+    accumulator = ResultAccumulator.from_splits(splits, pd.Index(np.arange(6), dtype='int64'))
+    # folds finish out of order
+    for fold in [3, 1, 2]:
+        test_idx = splits[fold - 1][1]
+        n = len(test_idx)
+        accumulator.write(FoldResult(fold, test_idx, np.full(n, 1.5), np.zeros(n), np.ones(n), {}, None, {}))
+
+    results = accumulator.to_frame()
+    assert results['index'].tolist() == [2, 0, 1, 3, 4, 5]
+    assert results['fold'].tolist() == [1, 1, 2, 3, 3, 3]
+    assert results['index'].dtype == np.int64
+    assert results['fold'].dtype == np.int32
+    assert results['pred'].dtype == np.float64
+    assert np.shares_memory(results['pred'].to_numpy(), accumulator.pred)
+
+def test_result_accumulator_flattens_column_predictions():
+    splits = [(None, np.array([0, 1])), (None, np.array([2, 3, 4]))]
+    accumulator = ResultAccumulator.from_splits(splits, pd.Index(np.arange(5), dtype='int64'))
+    for fold, (_, test_idx) in enumerate(splits, start=1):
+        n = len(test_idx)
+        # pyment predicts a (n, 1) dataframe
+        pred = pd.DataFrame({'pyment': test_idx + 0.5})
+        accumulator.write(FoldResult(fold, test_idx, pred, np.zeros((n, 1)), test_idx.astype(int), {}, None, {}))
+
+    results = accumulator.to_frame()
+    assert results['pred'].tolist() == [0.5, 1.5, 2.5, 3.5, 4.5]
+    assert results['std'].tolist() == [0.] * 5
+    assert results['true'].tolist() == [0., 1., 2., 3., 4.]
+
+def test_trainer_train_many(pipe_config, model_config, monkeypatch):
+    model_config['grid'] = {'name': 'dummyregressor', 'paramgrid': {'model__strategy': ['mean', 'median']}}
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        pipe_file = tmpdirname + f'/{PIPE_FILE}.yml'
+        model_file = tmpdirname + f'/{MODEL_FILE}.yml'
+
+        with open(pipe_file, 'w') as f:
+            yaml.dump(pipe_config, f)
+
+        with open(model_file, 'w') as f:
+            yaml.dump(model_config, f)
+
+        specs = [WorkFlowSpecs(pipe_file, model_file, PIPE_NAME, name, ROIS) for name in ['dummy', 'grid']]
+        workflows = WorkflowBuilder.build(specs)
+
+        rng = np.random.default_rng(0)
+        data = pd.DataFrame({'cat1': np.zeros(20), 'pyment': rng.normal(size=20), 'age': rng.normal(size=20)})
+        cv_inner = KFold(n_splits=2, shuffle=True, random_state=42)
+        cv_outer = KFold(n_splits=4, shuffle=True, random_state=42)
+        trainer = Trainer()
+        timings = TaskTimings(Path(tmpdirname) / 'timings.json')
+
+        # record the dispatch order
+        order = []
+        run_tasks = trainer._run_tasks
+        monkeypatch.setattr(trainer, '_run_tasks', lambda tasks, *args: order.extend(i for i, _ in tasks) or run_tasks(tasks, *args))
+        many = trainer.train_many(data=data, strat_col="cat1", label_col="age", cv_inner=cv_inner, cv_outer=cv_outer,
+                                  workflows=workflows, fold_jobs=2, timings=timings)
+
+        # the grid workflow (5 fits per fold) is dispatched before the single fit workflow
+        assert order == [1] * 4 + [0] * 4
+        assert timings.get(workflows[0].name) is not None
+
+        for workflow, results in zip(workflows, many):
+            single = trainer.train(data=data, strat_col="cat1", label_col="age", cv_inner=cv_inner,
+                                   cv_outer=cv_outer, workflow=workflow)
+            assert results.name == workflow.name
+            pd.testing.assert_frame_equal(single.results, results.results)
+            assert single.best_params.equals(results.best_params)
@@ -7,6 +7,7 @@ import pandas as pd
 import numpy as np
 import pytest
 from sklearn.compose import ColumnTransformer
+from scipy.stats import norm
 # %% generate dataset with two columns and two categories
 
 def _generate_data():
@@ -68,6 +69,40 @@ def test_dimap_raise_value_error():
     with pytest.raises(ValueError):
         X = dimap.transform(df)
 
+def test_dimap_params_per_column():
+    df = _generate_data()
+    df = OneHotPD(columns=['cat']).fit_transform(df)
+    df['col2'] = df['col2'] * 2
+
+    dimap = DiMap(cat_col='cat_a', sample_col='age_group', pattern='col', match_nsamples=False)
+    dimap.fit(df)
+
+    assert dimap.columns == ['col1', 'col2']
+    for i, col in enumerate(dimap.columns):
+        expected = norm.fit(df[df['cat_a']==True][col])
+        assert np.allclose([dimap.params1['mu'][i], dimap.params1['std'][i]], expected)
+
+def test_dimap_analytic():
+    df = _generate_data()
+    df = OneHotPD(columns=['cat']).fit_transform(df)
+
+    dimap = DiMap(cat_col='cat_a', sample_col='age_group', pattern='col', match_nsamples=False)
+    dimap_analytic = DiMap(cat_col='cat_a', sample_col='age_group', pattern='col', match_nsamples=False, method='analytic')
+    X = dimap.fit(df).transform(df)
+    X_analytic = dimap_analytic.fit(df).transform(df)
+
+    assert np.allclose(X[['col1', 'col2']], X_analytic[['col1', 'col2']], atol=1e-4)
+
+def test_dimap_analytic_outside_range():
+    df = _generate_data()
+    df = OneHotPD(columns=['cat']).fit_transform(df)
+
+    dimap = DiMap(cat_col='cat_a', sample_col='age_group', pattern='col', match_nsamples=False, method='analytic')
+    dimap.fit(df)
+    df.loc[0,'col2'] = -20
+    X = dimap.transform(df)
+    assert np.all(np.isfinite(X['col2']))
+
 def test_selectcols_keep_shape():
     df = _generate_data()
     select = SelectCols(keep=['col1'])
@@ -136,3 +171,17 @@ def test_get_column_transformer_transform():
 
 
 
+
+def test_dimap_compact_dtypes():
+    df = _generate_data()
+    df = bin_data(df, 'age', min_val=20.0, max_val=60.0, step=2.5, categorical=True)
+    df = OneHotPD(columns=['cat'], dtype=np.uint8).fit_transform(df)
+    df = df.astype({'col1': np.float32, 'col2': np.float32})
+
+    dimap = DiMap(cat_col='cat_a', sample_col='age_group', pattern='col', match_nsamples=False, method='analytic')
+    X = dimap.fit(df).transform(df)
+
+    assert X['cat_a'].dtype == np.uint8
+    assert X['col1'].dtype == np.float32
+    error = np.mean(X[X['cat_a']==1]['col1'] - X[X['cat_b']==1]['col1'])
+    assert error < 0.0001
@@ -1,8 +1,9 @@
-from src.workflow import WorkflowRepresentation, WorkFlowSpecs, WorkflowResults, WorkflowBuilder
+from src.workflow import WorkflowRepresentation, WorkFlowSpecs, WorkflowResults, WorkflowBuilder, versioned_cache_dir, prune_cache
 from src.test_config import pipe_config, model_config
 
 from sklearn.pipeline import Pipeline
 from sklearn.dummy import DummyRegressor
+from sklearn.preprocessing import StandardScaler
 import pandas as pd
 
 from pathlib import Path
@@ -142,4 +143,79 @@ def test_workflowresults_attributes(example_workflow_results):
     assert isinstance(example_workflow_results.scores, pd.DataFrame)
     assert isinstance(example_workflow_results.results, pd.DataFrame)
     assert isinstance(example_workflow_results.best_params, pd.DataFrame)
-    assert isinstance(example_workflow_results.weights, pd.DataFrame)
\ No newline at end of file
+    assert isinstance(example_workflow_results.weights, pd.DataFrame)
+
+
+class CountingScaler(StandardScaler):
+    """ StandardScaler that counts how often it is fitted """
+    n_fits = 0
+
+    def fit(self, X, y=None, sample_weight=None):
+        CountingScaler.n_fits += 1
+        return super().fit(X, y, sample_weight)
+
+@pytest.fixture
+def counting_scaler():
+    """ CountingScaler with the fit counter reset """
+    CountingScaler.n_fits = 0
+    yield CountingScaler
+    CountingScaler.n_fits = 0
+
+def test_workflowrepresentation_preprocessing_cache(pipe_config, model_config, counting_scaler):
+    model_config['median'] = {'name': 'dummyregressor', 'kwargs': {'strategy': 'median'}, 'paramgrid': {}}
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        pipe_file = tmpdirname + f'/{PIPE_FILE}.yml'
+        model_file = tmpdirname + f'/{MODEL_FILE}.yml'
+        cache_dir = Path(tmpdirname) / 'cache'
+
+        with open(pipe_file, 'w') as f:
+            yaml.dump(pipe_config, f)
+
+        with open(model_file, 'w') as f:
+            yaml.dump(model_config, f)
+
+        specs = [WorkFlowSpecs(pipe_file, model_file, PIPE_NAME, name, ROIS, cache_dir=cache_dir) for name in ['dummy', 'median']]
+        workflows = WorkflowBuilder.build(specs)
+
+        X = pd.DataFrame({'a': [1., 2., 3., 4.], 'b': [2., 0., 1., 5.]})
+        y = pd.Series([1., 2., 3., 5.])
+        for workflow in workflows:
+            workflow.pipeline.steps[0] = ('scaler', counting_scaler().set_output(transform='pandas'))
+            workflow.pipeline.fit(X, y)
+
+        # preprocessing is fitted once and loaded from the cache for the second model
+        assert counting_scaler.n_fits == 1
+        assert workflows[0].pipeline.predict(X).mean() == y.mean()
+        assert workflows[1].pipeline.predict(X).mean() == y.median()
+
+def test_workflowrepresentation_ensemble_cache(pipe_config, model_config):
+    model_config['ens'] = {'name': 'ens_bridge', 'paramgrid': {}}
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        pipe_file = tmpdirname + f'/{PIPE_FILE}.yml'
+        model_file = tmpdirname + f'/{MODEL_FILE}.yml'
+        cache_dir = Path(tmpdirname) / 'cache'
+
+        with open(pipe_file, 'w') as f:
+            yaml.dump(pipe_config, f)
+
+        with open(model_file, 'w') as f:
+            yaml.dump(model_config, f)
+
+        workflow = WorkflowBuilder.build([WorkFlowSpecs(pipe_file, model_file, PIPE_NAME, 'ens', ROIS, cache_dir=cache_dir)])[0]
+        # the ensemble caches its base learners next to the preprocessing
+        assert workflow.pipeline['model'].memory is workflow.pipeline.memory
+        # fits of other code versions are not reused
+        assert Path(workflow.pipeline.memory.location) == versioned_cache_dir(cache_dir)
+        assert versioned_cache_dir(cache_dir).parent == cache_dir
+
+def test_prune_cache():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        cache_dir = Path(tmpdirname) / 'cache'
+        assert prune_cache(cache_dir) == []
+        stale = cache_dir / 'old-version'
+        (stale / 'joblib').mkdir(parents=True)
+        versioned_cache_dir(cache_dir).mkdir()
+
+        assert prune_cache(cache_dir) == [stale]
+        assert not stale.exists()
+        assert versioned_cache_dir(cache_dir).exists()